@@ -0,0 +1,119 @@
+import os
+import time
+import atexit
+import threading
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class BalanceWriteBuffer:
+    # Coalesces /addToBalance increments per accNo in memory and writes them
+    # out with one ledger.increment_many() call. balance() reads the ledger
+    # and adds the not-yet-flushed amount without a flush landing in
+    # between, which would count a flushed increment twice or not at all.
+    # `on_flush` is called with the addresses of every flushed batch.
+
+    def __init__(
+        self,
+        ledger,
+        flush_interval=0.2,
+        max_entries=500,
+        max_pending_value=10000,
+        on_flush=None,
+    ):
+        self.ledger = ledger
+        self.on_flush = on_flush
+        self.flush_interval = flush_interval
+        self.max_entries = max_entries
+        self.max_pending_value = max_pending_value
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._pending = {}
+        self._inflight = {}
+        self._pending_value = 0
+        self._pid = None
+        self._thread = None
+        self._stopped = False
+        self.stats = {"flushes": 0, "rows_flushed": 0, "failed_flushes": 0}
+        atexit.register(self.close)
+
+    def _ensure_worker(self):
+        if self._pid == os.getpid() and self._thread and self._thread.is_alive():
+            return
+        self._pid = os.getpid()
+        self._thread = threading.Thread(
+            target=self._run, name="balance-flusher", daemon=True
+        )
+        self._thread.start()
+
+    def add(self, address, points):
+        self._ensure_worker()
+        with self._lock:
+            self._pending[address] = self._pending.get(address, 0) + points
+            self._pending_value += points
+            pending = self._pending[address] + self._inflight.get(address, 0)
+            over_value = self._pending_value >= self.max_pending_value
+            over_entries = len(self._pending) >= self.max_entries
+        if over_value:
+            # Bound the amount of unflushed value: push back on the caller
+            # instead of letting the buffer grow without limit.
+            self.flush()
+        elif over_entries:
+            self._wake.set()
+        return pending
+
+    def pending(self, address):
+        with self._lock:
+            return self._pending.get(address, 0) + self._inflight.get(address, 0)
+
+    def balance(self, address):
+        with self._flush_lock:
+            return self.ledger.get_or_create(address) + self.pending(address)
+
+    def flush(self):
+        with self._flush_lock:
+            with self._lock:
+                if not self._pending:
+                    return 0
+                self._inflight, self._pending = self._pending, {}
+                self._pending_value = 0
+                batch = list(self._inflight.items())
+            try:
+                self.ledger.increment_many(batch)
+            except Exception as e:
+                logger.error("Balance flush of %s rows failed: %s", len(batch), e)
+                self.stats["failed_flushes"] += 1
+                with self._lock:
+                    for address, points in batch:
+                        self._pending[address] = self._pending.get(address, 0) + points
+                        self._pending_value += points
+                    self._inflight = {}
+                raise
+            with self._lock:
+                self._inflight = {}
+            if self.on_flush:
+                self.on_flush([address for address, _ in batch])
+            self.stats["flushes"] += 1
+            self.stats["rows_flushed"] += len(batch)
+            return len(batch)
+
+    def _run(self):
+        while not self._stopped:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception:
+                time.sleep(self.flush_interval)
+
+    def close(self):
+        self._stopped = True
+        self._wake.set()
+        try:
+            flushed = self.flush()
+            if flushed:
+                logger.info("Flushed %s buffered balances on shutdown", flushed)
+        except Exception as e:
+            logger.error("Final balance flush failed: %s", e)
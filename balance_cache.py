@@ -0,0 +1,106 @@
+import time
+import threading
+import logging
+from collections import OrderedDict
+
+try:
+    import redis
+except ImportError:
+    redis = None
+
+logger = logging.getLogger(__name__)
+
+_INCR_IF_EXISTS = """
+if redis.call('EXISTS', KEYS[1]) == 1 then
+    return redis.call('INCRBY', KEYS[1], ARGV[1])
+end
+return nil
+"""
+
+
+class BalanceCache:
+    # Read-through cache of the balance a player sees (stored balance plus
+    # anything still in the write-behind buffer). In-process it is a bounded
+    # LRU with a TTL; with a redis_url the entries live in Redis instead so
+    # every gunicorn worker reads and updates the same copy.
+
+    def __init__(self, max_entries=10000, ttl=30.0, redis_url=None, prefix="balance:"):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.prefix = prefix
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._redis = None
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0}
+        if redis_url:
+            if redis is None:
+                raise RuntimeError(
+                    "BALANCE_CACHE_REDIS_URL is set but redis is not installed"
+                )
+            self._redis = redis.Redis.from_url(redis_url)
+            self._incr_script = self._redis.register_script(_INCR_IF_EXISTS)
+            logger.info("Balance cache shared through Redis")
+
+    @property
+    def shared(self):
+        return self._redis is not None
+
+    def get(self, address):
+        if self._redis is not None:
+            value = self._redis.get(self.prefix + address)
+            balance = int(value) if value is not None else None
+        else:
+            with self._lock:
+                entry = self._entries.get(address)
+                balance = None
+                if entry and entry[1] > time.monotonic():
+                    self._entries.move_to_end(address)
+                    balance = entry[0]
+                elif entry:
+                    del self._entries[address]
+        self.stats["hits" if balance is not None else "misses"] += 1
+        return balance
+
+    def set(self, address, balance):
+        if self._redis is not None:
+            self._redis.set(self.prefix + address, balance, ex=max(1, int(self.ttl)))
+            return
+        with self._lock:
+            self._entries[address] = (balance, time.monotonic() + self.ttl)
+            self._entries.move_to_end(address)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.stats["evictions"] += 1
+
+    def incr(self, address, delta):
+        # Atomically add to a cached balance; returns None when the address
+        # isn't cached so the caller can fall back to the database.
+        if self._redis is not None:
+            value = self._incr_script(keys=[self.prefix + address], args=[delta])
+            return int(value) if value is not None else None
+        with self._lock:
+            entry = self._entries.get(address)
+            if not entry or entry[1] <= time.monotonic():
+                return None
+            balance = entry[0] + delta
+            self._entries[address] = (balance, entry[1])
+            self._entries.move_to_end(address)
+            return balance
+
+    def invalidate(self, address):
+        if self._redis is not None:
+            self._redis.delete(self.prefix + address)
+            return
+        with self._lock:
+            self._entries.pop(address, None)
+
+    def snapshot(self):
+        lookups = self.stats["hits"] + self.stats["misses"]
+        with self._lock:
+            size = len(self._entries)
+        return {
+            **self.stats,
+            "shared": self.shared,
+            "entries": size,
+            "hit_ratio": self.stats["hits"] / lookups if lookups else 0.0,
+        }
@@ -0,0 +1,108 @@
+import sys
+import time
+import json
+import argparse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+from bench.rpc_stub import RPCStub
+from bench.servers import app_env, start_app, stop_app
+
+# The Flask app under gunicorn and the Quart app under uvicorn, each in one
+# worker process, driven with the same concurrent requests against the local
+# JSON-RPC stand-in. No database is needed: /transfer pays small amounts in
+# Ether (ALLOW_CLIENT_POINTS=1) and /grid only touches the puzzle pool.
+#
+#   python -m bench.async_compare --latency-ms 50 --requests 200 --concurrency 50
+
+
+def post(url, body, timeout=120):
+    request = urllib.request.Request(
+        url, json.dumps(body).encode(), {"Content-Type": "application/json"}
+    )
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            return response.status
+    except urllib.error.HTTPError as e:
+        return e.code
+
+
+def get(url, timeout=120):
+    try:
+        with urllib.request.urlopen(url, timeout=timeout) as response:
+            return response.status
+    except urllib.error.HTTPError as e:
+        return e.code
+
+
+def drive(call, requests, concurrency):
+    latencies = []
+    statuses = {}
+
+    def one(i):
+        start = time.perf_counter()
+        status = call(i)
+        latencies.append(time.perf_counter() - start)
+        statuses[status] = statuses.get(status, 0) + 1
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as pool:
+        list(pool.map(one, range(requests)))
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    return {
+        "rps": requests / elapsed,
+        "p50_ms": latencies[len(latencies) // 2] * 1000,
+        "p99_ms": latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000,
+        "statuses": statuses,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--latency-ms", type=float, default=50.0)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--sync-threads", type=int, default=8)
+    args = parser.parse_args(argv)
+
+    stub = RPCStub(latency=args.latency_ms / 1000)
+    stub.start()
+    recipients = stub.accounts[1:]
+    env = app_env(stub, ALLOW_CLIENT_POINTS=1)
+    scenarios = {
+        "grid": lambda base: lambda i: get(f"{base}/grid?category={i % 9}"),
+        "transfer": lambda base: lambda i: post(
+            f"{base}/transfer",
+            {"address": recipients[i % len(recipients)], "points": 3},
+        ),
+    }
+    results = {}
+    try:
+        for name in ("sync", "async"):
+            process, base = start_app(name, env, threads=args.sync_threads)
+            try:
+                for scenario, make_call in scenarios.items():
+                    results[(name, scenario)] = drive(
+                        make_call(base), args.requests, args.concurrency
+                    )
+            finally:
+                stop_app(process)
+    finally:
+        stub.stop()
+
+    print(
+        f"{args.requests} requests, concurrency {args.concurrency}, "
+        f"RPC latency {args.latency_ms:.0f} ms"
+    )
+    for (name, scenario), result in results.items():
+        print(
+            f"{name:<6} {scenario:<9} {result['rps']:8.1f} req/s "
+            f"p50 {result['p50_ms']:8.1f} ms p99 {result['p99_ms']:8.1f} ms "
+            f"{result['statuses']}"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
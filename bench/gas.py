@@ -0,0 +1,187 @@
+import sys
+import json
+import argparse
+
+from web3 import Web3, EthereumTesterProvider
+
+from bench.indexer import deploy
+from contract_artifacts import load as load_artifacts
+
+# Gas used per completion award on a local eth-tester chain, for every mint
+# mode the built contracts offer: awardCompletion with a per-token URI (what
+# NFT_MINT_MODE=uri sends), awardCompletionShared with and without a variant
+# (NFT_MINT_MODE=shared), the batch forms per player, and the bare mints.
+# Every award goes to a fresh address, as a first completion would. Modes
+# missing from the artifacts (built before contract.sol gained them) are
+# skipped. The "empty URI" rows run the per-token-URI functions with "",
+# which any build has: what is left once the URI string isn't stored. A
+# shared mint costs a little less still, since it also skips the empty
+# URI's storage write and MetadataUpdate event. With --out the results are
+# written as JSON; --baseline prints the change against an earlier results
+# file, e.g. one taken before a rebuild.
+#
+#   python -m bench.gas --awards 20 --out gas.json
+#   python -m bench.gas --baseline gas.json
+
+TOKEN_URI = "https://ipfs.io/ipfs/QmActualHash"
+BASE_URI = "https://ipfs.io/ipfs/QmSharedHash/"
+
+
+def has_function(contract, name):
+    return any(
+        item.get("type") == "function" and item.get("name") == name
+        for item in contract.abi
+    )
+
+
+def fresh_addresses(count, offset):
+    return [
+        Web3.to_checksum_address((offset + i + 1).to_bytes(20, "big"))
+        for i in range(count)
+    ]
+
+
+def gas_used(w3, call):
+    tx_hash = call.transact({"from": w3.eth.accounts[0]})
+    receipt = w3.eth.wait_for_transaction_receipt(tx_hash)
+    assert receipt.status == 1, f"{call.fn_name} reverted"
+    return receipt.gasUsed
+
+
+def measure(w3, nft, transfer, awards, batch_size):
+    # {mode: mean gas per award (per player for batches)}
+    addresses = iter(fresh_addresses(awards * 20 + batch_size * 20, 0x1000))
+    modes = [
+        (
+            "awardCompletion",
+            "awardCompletion",
+            lambda player: transfer.functions.awardCompletion(player, 10, TOKEN_URI),
+        ),
+        (
+            "awardCompletion (empty URI)",
+            "awardCompletion",
+            lambda player: transfer.functions.awardCompletion(player, 10, ""),
+        ),
+        (
+            "awardCompletionShared",
+            "awardCompletionShared",
+            lambda player: transfer.functions.awardCompletionShared(player, 10, 0),
+        ),
+        (
+            "awardCompletionShared (variant)",
+            "awardCompletionShared",
+            lambda player: transfer.functions.awardCompletionShared(player, 10, 7),
+        ),
+        (
+            "mintNFT",
+            "mintNFT",
+            lambda player: nft.functions.mintNFT(player, TOKEN_URI),
+        ),
+        (
+            "mintNFT (empty URI)",
+            "mintNFT",
+            lambda player: nft.functions.mintNFT(player, ""),
+        ),
+        (
+            "mintShared",
+            "mintShared",
+            lambda player: nft.functions.mintShared(player, 0),
+        ),
+    ]
+    batches = [
+        (
+            "awardCompletionBatch",
+            lambda players: transfer.functions.awardCompletionBatch(players, TOKEN_URI),
+        ),
+        (
+            "awardCompletionBatchShared",
+            lambda players: transfer.functions.awardCompletionBatchShared(players, 0),
+        ),
+    ]
+    results = {}
+    for label, name, call in modes:
+        contract = nft if name.startswith("mint") else transfer
+        if not has_function(contract, name):
+            continue
+        total = sum(gas_used(w3, call(next(addresses))) for _ in range(awards))
+        results[label] = total / awards
+    for name, call in batches:
+        if not has_function(transfer, name):
+            continue
+        total = 0
+        for _ in range(max(awards // batch_size, 1)):
+            players = [next(addresses) for _ in range(batch_size)]
+            total += gas_used(w3, call(players))
+        results[f"{name} (per player)"] = total / (
+            max(awards // batch_size, 1) * batch_size
+        )
+    return results
+
+
+def check_shared_uri(w3, nft, transfer):
+    # A shared mint's tokenURI is the base URI, plus the variant if any.
+    plain, variant = fresh_addresses(2, 0x9000)
+    transfer.functions.awardCompletionShared(plain, 10, 0).transact(
+        {"from": w3.eth.accounts[0]}
+    )
+    transfer.functions.awardCompletionShared(variant, 10, 7).transact(
+        {"from": w3.eth.accounts[0]}
+    )
+    last = nft.events.Transfer.create_filter(fromBlock=0).get_all_entries()[-2:]
+    uris = [nft.functions.tokenURI(event.args.tokenId).call() for event in last]
+    assert uris == [BASE_URI, BASE_URI + "7"], uris
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--awards", type=int, default=20)
+    parser.add_argument("--batch-size", type=int, default=10)
+    parser.add_argument("--out")
+    parser.add_argument("--baseline")
+    args = parser.parse_args(argv)
+
+    data = load_artifacts()
+    w3 = Web3(EthereumTesterProvider())
+    owner = w3.eth.accounts[0]
+    nft = deploy(w3, data, "WordHuntNFT")
+    transfer = deploy(w3, data, "transfer", nft.address)
+    transfer.functions.deposit().transact({"from": owner, "value": 10**20})
+    if has_function(nft, "setMinter"):
+        nft.functions.setMinter(transfer.address).transact({"from": owner})
+    shared = has_function(transfer, "awardCompletionShared")
+    if shared:
+        nft.functions.setSharedBaseURI(BASE_URI).transact({"from": owner})
+
+    results = measure(w3, nft, transfer, args.awards, args.batch_size)
+    if shared:
+        check_shared_uri(w3, nft, transfer)
+
+    baseline = results.get("awardCompletion")
+    print(f"{'mode':<42}{'gas':>10}{'vs awardCompletion':>20}")
+    for label, gas in results.items():
+        delta = f"{(gas - baseline) / baseline * 100:+.1f}%" if baseline else ""
+        print(f"{label:<42}{gas:>10.0f}{delta:>20}")
+    if not shared:
+        print(
+            "shared-URI modes missing from the artifacts; run "
+            "`python contract_artifacts.py build`"
+        )
+
+    if args.baseline:
+        with open(args.baseline, "r") as file:
+            before = json.load(file)["gas"]
+        print("\nchange against baseline:")
+        for label, gas in results.items():
+            if label in before:
+                print(
+                    f"  {label:<40}{before[label]:>10.0f} -> {gas:.0f} "
+                    f"({(gas - before[label]) / before[label] * 100:+.1f}%)"
+                )
+    if args.out:
+        with open(args.out, "w") as file:
+            json.dump({"gas": results}, file, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
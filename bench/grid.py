@@ -0,0 +1,56 @@
+import sys
+import time
+import argparse
+
+from grid_engine import CATEGORIES, GridEngine, PuzzlePool
+
+# Puzzles generated per second by GridEngine, per category and overall, plus
+# the latency of PuzzlePool.take() once the pool is warm.
+#
+#   python -m bench.grid --seconds 2
+
+
+def bench_engine(engine, category, seconds):
+    count = 0
+    start = time.perf_counter()
+    deadline = start + seconds
+    while time.perf_counter() < deadline:
+        engine.generate(category)
+        count += 1
+    return count / (time.perf_counter() - start)
+
+
+def bench_pool(pool, takes):
+    for category in range(len(CATEGORIES)):
+        while len(pool._pools.get(category, ())) < pool.size:
+            pool.take(category)
+            time.sleep(0.01)
+    start = time.perf_counter()
+    for i in range(takes):
+        pool.take(i % len(CATEGORIES))
+    return (time.perf_counter() - start) / takes
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--seconds", type=float, default=1.0)
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--pool-size", type=int, default=16)
+    args = parser.parse_args(argv)
+
+    engine = GridEngine(seed=args.seed)
+    rates = []
+    for category, name in enumerate(CATEGORIES):
+        rate = bench_engine(engine, category, args.seconds)
+        rates.append(rate)
+        print(f"{name:<14} {rate:10.1f} puzzles/s")
+    print(f"{'mean':<14} {sum(rates) / len(rates):10.1f} puzzles/s")
+
+    pool = PuzzlePool(GridEngine(), size=args.pool_size)
+    per_take = bench_pool(pool, args.pool_size)
+    print(f"pool take      {per_take * 1e6:10.1f} us (warm pool)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,181 @@
+import os
+import sys
+import time
+import argparse
+import tempfile
+
+from web3 import Web3
+
+from bench.rpc_stub import RPCStub
+from contract_artifacts import load as load_artifacts
+from event_indexer import EventIndexer
+from rpc_provider import PooledHTTPProvider
+
+# Deploys both contracts from the build artifacts on the local JSON-RPC
+# stand-in, mints NFTs, moves a few between players and spends coins, then
+# checks the event index against the chain: first a full catch-up (with the
+# stand-in refusing long eth_getLogs ranges, so the range has to shrink),
+# then a reorg made by reverting the chain and mining different blocks.
+# Prints catch-up time, RPC calls and lookup latency.
+#
+#   python -m bench.indexer --players 8 --max-log-range 50 --latency-ms 20
+
+
+def deploy(w3, data, name, *args):
+    factory = w3.eth.contract(abi=data[name]["abi"], bytecode=data[name]["bytecode"])
+    receipt = w3.eth.wait_for_transaction_receipt(
+        factory.constructor(*args).transact({"from": w3.eth.accounts[0]})
+    )
+    return w3.eth.contract(address=receipt.contractAddress, abi=data[name]["abi"])
+
+
+def play(w3, nft, transfer, players, rng_offset=0):
+    # Each player gets an NFT and spends once; every third NFT then moves to
+    # the next player. Returns the expected spends per player.
+    owner = w3.eth.accounts[0]
+    first_block = w3.eth.block_number + 1
+    spends = {}
+    for i, player in enumerate(players):
+        transfer.functions.mintNFTOnly(player, f"ipfs://token/{i}").transact(
+            {"from": owner}
+        )
+        amount = 10**15 * (i + 1 + rng_offset)
+        transfer.functions.spendCoins(player, amount, f"item-{i}").transact(
+            {"from": player}
+        )
+        spends.setdefault(player.lower(), []).append(amount)
+        w3.testing.mine(3)
+    minted = nft.events.Transfer.create_filter(fromBlock=first_block).get_all_entries()
+    for event in minted[::3]:
+        token_id, holder = event.args.tokenId, event.args.to
+        if nft.functions.ownerOf(token_id).call() != holder:
+            continue
+        recipient = players[(players.index(holder) + 1) % len(players)]
+        nft.functions.transferFrom(holder, recipient, token_id).transact(
+            {"from": holder}
+        )
+    return spends
+
+
+def expected_nfts(nft):
+    owners = {}
+    for event in nft.events.Transfer.create_filter(fromBlock=0).get_all_entries():
+        token_id = event.args.tokenId
+        owners[token_id] = nft.functions.ownerOf(token_id).call().lower()
+    by_owner = {}
+    for token_id, owner in owners.items():
+        by_owner.setdefault(owner, set()).add(token_id)
+    return by_owner
+
+
+def check(indexer, nft, players, spends):
+    owned = expected_nfts(nft)
+    for player in players:
+        address = player.lower()
+        got = {entry["token_id"] for entry in indexer.nfts(player)}
+        assert got == owned.get(address, set()), (address, got, owned.get(address))
+        entry = indexer.spends(player)
+        got = sorted(spend["amount"] for spend in entry["spends"])
+        assert got == sorted(spends.get(address, [])), (address, got)
+        assert entry["total"] == sum(spends.get(address, []))
+
+
+def catch_up(indexer, limit=10000):
+    steps = 0
+    while not indexer.step():
+        steps += 1
+        assert steps < limit, "indexer did not catch up"
+    return steps + 1
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--players", type=int, default=8)
+    parser.add_argument("--filler-blocks", type=int, default=2000)
+    parser.add_argument("--max-log-range", type=int, default=500)
+    parser.add_argument("--chunk-size", type=int, default=4000)
+    parser.add_argument("--latency-ms", type=float, default=20.0)
+    parser.add_argument("--lookups", type=int, default=1000)
+    args = parser.parse_args(argv)
+
+    data = load_artifacts()
+    stub = RPCStub(latency=args.latency_ms / 1000, max_log_range=args.max_log_range)
+    stub.start()
+    chain = stub.w3
+    players = chain.eth.accounts[1 : 1 + args.players]
+    try:
+        nft = deploy(chain, data, "WordHuntNFT")
+        transfer = deploy(chain, data, "transfer", nft.address)
+        transfer.functions.deposit().transact(
+            {"from": chain.eth.accounts[0], "value": 10**18}
+        )
+        chain.testing.mine(args.filler_blocks)
+        spends = play(chain, nft, transfer, players)
+
+        w3 = Web3(PooledHTTPProvider(stub.url))
+        with tempfile.TemporaryDirectory() as directory:
+            indexer = EventIndexer(
+                w3,
+                w3.eth.contract(address=nft.address, abi=nft.abi),
+                w3.eth.contract(address=transfer.address, abi=transfer.abi),
+                os.path.join(directory, "events.db"),
+                start_block=0,
+                confirmations=0,
+                chunk_size=args.chunk_size,
+                max_chunk=args.chunk_size,
+            )
+            before = stub.snapshot()["http_requests"]
+            start = time.perf_counter()
+            steps = catch_up(indexer)
+            elapsed = time.perf_counter() - start
+            check(indexer, nft, players, spends)
+            snapshot = indexer.snapshot()
+            print(
+                f"catch-up: {snapshot['checkpoint'] + 1} blocks in "
+                f"{elapsed:.2f}s, {steps} steps, "
+                f"{stub.snapshot()['http_requests'] - before} HTTP requests, "
+                f"{snapshot['logs']} logs, range shrunk {snapshot['shrunk']}x "
+                f"to {indexer.chunk_size}"
+            )
+
+            # Reorg: drop the newest blocks, mine a different history.
+            fork_point = chain.eth.block_number
+            snapshot_id = stub.tester.take_snapshot()
+            extra = play(chain, nft, transfer, players[:2], rng_offset=100)
+            for player, amounts in extra.items():
+                spends.setdefault(player, []).extend(amounts)
+            catch_up(indexer)
+            check(indexer, nft, players, spends)
+            stub.tester.revert_to_snapshot(snapshot_id)
+            for player, amounts in extra.items():
+                del spends[player][-len(amounts) :]
+            extra = play(chain, nft, transfer, players[2:4], rng_offset=200)
+            for player, amounts in extra.items():
+                spends.setdefault(player, []).extend(amounts)
+            chain.testing.mine(10)
+            catch_up(indexer)
+            check(indexer, nft, players, spends)
+            snapshot = indexer.snapshot()
+            assert snapshot["reorgs"] >= 1, snapshot
+            print(
+                f"reorg after block {fork_point}: {snapshot['reorgs']} detected, "
+                f"{snapshot['rolled_back']} events rolled back, index matches chain"
+            )
+
+            for name, lookup in (
+                ("nfts", indexer.nfts),
+                ("spends", indexer.spends),
+            ):
+                start = time.perf_counter()
+                for i in range(args.lookups):
+                    lookup(players[i % len(players)])
+                per_call = (time.perf_counter() - start) / args.lookups * 1000
+                print(f"/{name}/<address> lookup: {per_call:.3f} ms")
+    finally:
+        stub.stop()
+    print("all checks passed")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
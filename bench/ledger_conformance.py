@@ -0,0 +1,323 @@
+import os
+import sys
+import time
+import random
+import argparse
+import tempfile
+import threading
+import traceback
+
+from bench.mysql_stub import MySQLStub
+from db_pool import ConnectionPool
+from ledger import MySQLLedger, SQLiteLedger
+
+# Behaviour every ledger backend must share, run against SQLiteLedger on a
+# temporary file and MySQLLedger on the database from HOST/USER/PASSWORD/
+# DATABASE/DB_PORT (--mysql-env). Each check uses fresh random addresses,
+# so it is safe to point at a shared database. Also prints the mean latency
+# of the hot operations.
+#
+# Without --mysql-env MySQLLedger runs on the MySQL stand-in instead. That
+# only shows the SQL and the client protocol work: the stand-in runs every
+# statement on its own, without transactions or row locks, so the checks
+# that depend on them are skipped and the run is no evidence about MySQL.
+#
+# server_async.py sends its own SQL through aiomysql rather than going
+# through ledger.py, so none of this covers it; bench.load --app async
+# exercises those statements end to end.
+#
+#   python -m bench.ledger_conformance
+#   python -m bench.ledger_conformance --backend sqlite
+
+CHECKS = []
+
+
+def check(fn=None, transactional=False):
+    # transactional: relies on transactions or row locks, so it is skipped
+    # on the stand-in.
+    def register(fn):
+        fn.transactional = transactional
+        CHECKS.append(fn)
+        return fn
+
+    return register(fn) if fn else register
+
+
+def new_address(rng):
+    return "0x%040x" % rng.getrandbits(160)
+
+
+@check
+def get_or_create_starts_at_zero(ledger, rng):
+    address = new_address(rng)
+    assert ledger.get_or_create(address) == 0
+    assert ledger.get_or_create(address) == 0
+
+
+@check
+def increment_creates_missing_rows(ledger, rng):
+    address = new_address(rng)
+    assert ledger.increment(address, 7) == 7
+    assert ledger.get_or_create(address) == 7
+
+
+@check
+def increment_returns_running_total(ledger, rng):
+    address = new_address(rng)
+    ledger.get_or_create(address)
+    totals = [ledger.increment(address, points) for points in (1, 2, 3, 0)]
+    assert totals == [1, 3, 6, 6], totals
+
+
+@check
+def concurrent_increments_are_not_lost(ledger, rng):
+    address = new_address(rng)
+    threads, per_thread = 8, 25
+    errors = []
+
+    def work():
+        try:
+            for _ in range(per_thread):
+                ledger.increment(address, 1)
+        except Exception as e:
+            errors.append(e)
+
+    workers = [threading.Thread(target=work) for _ in range(threads)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    assert not errors, errors
+    assert ledger.get_or_create(address) == threads * per_thread
+
+
+@check
+def increment_many_applies_every_row(ledger, rng):
+    existing, fresh = new_address(rng), new_address(rng)
+    ledger.increment(existing, 5)
+    ledger.increment_many([(existing, 10), (fresh, 4)])
+    ledger.increment_many([])
+    assert ledger.get_or_create(existing) == 15
+    assert ledger.get_or_create(fresh) == 4
+
+
+@check
+def reset_zeroes_the_balance(ledger, rng):
+    address = new_address(rng)
+    ledger.increment(address, 42)
+    ledger.reset(address)
+    assert ledger.get_or_create(address) == 0
+    assert ledger.increment(address, 3) == 3
+    ledger.reset(new_address(rng))
+
+
+@check
+def take_returns_and_zeroes_the_balance(ledger, rng):
+    address = new_address(rng)
+    ledger.increment(address, 12)
+    assert ledger.take(address) == 12
+    assert ledger.get_or_create(address) == 0
+    assert ledger.take(address) == 0
+    assert ledger.increment(address, 2) == 2
+
+
+@check
+def take_of_missing_or_empty_rows_is_zero(ledger, rng):
+    empty = new_address(rng)
+    ledger.get_or_create(empty)
+    assert ledger.take(empty) == 0
+    assert ledger.take(new_address(rng)) == 0
+
+
+@check(transactional=True)
+def concurrent_takes_pay_once(ledger, rng):
+    address = new_address(rng)
+    ledger.increment(address, 50)
+    taken = []
+    errors = []
+
+    def work():
+        try:
+            taken.append(ledger.take(address))
+        except Exception as e:
+            errors.append(e)
+
+    workers = [threading.Thread(target=work) for _ in range(8)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    assert not errors, errors
+    assert sorted(taken) == [0] * 7 + [50], taken
+
+
+@check(transactional=True)
+def takes_and_increments_lose_nothing(ledger, rng):
+    # Every point credited is either taken or still in the balance.
+    address = new_address(rng)
+    ledger.get_or_create(address)
+    taken = []
+    errors = []
+
+    def credit():
+        try:
+            for _ in range(50):
+                ledger.increment(address, 1)
+        except Exception as e:
+            errors.append(e)
+
+    def debit():
+        try:
+            for _ in range(20):
+                taken.append(ledger.take(address))
+        except Exception as e:
+            errors.append(e)
+
+    workers = [threading.Thread(target=credit) for _ in range(4)]
+    workers += [threading.Thread(target=debit) for _ in range(2)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    assert not errors, errors
+    assert sum(taken) + ledger.get_or_create(address) == 200, taken
+
+
+@check
+def games_are_claimed_once(ledger, rng):
+    session_id = "%016x" % rng.getrandbits(64)
+    expires = int(time.time()) + 60
+    assert ledger.claim_game(session_id, expires) is True
+    assert ledger.claim_game(session_id, expires) is False
+    ledger.release_game(session_id)
+    assert ledger.claim_game(session_id, expires) is True
+
+
+@check
+def concurrent_claims_pay_once(ledger, rng):
+    session_id = "%016x" % rng.getrandbits(64)
+    expires = int(time.time()) + 60
+    results = []
+    workers = [
+        threading.Thread(
+            target=lambda: results.append(ledger.claim_game(session_id, expires))
+        )
+        for _ in range(8)
+    ]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    assert sorted(results) == [False] * 7 + [True], results
+
+
+@check
+def large_balances_round_trip(ledger, rng):
+    address = new_address(rng)
+    assert ledger.increment(address, 2**40) == 2**40
+    assert ledger.increment(address, 2**40) == 2**41
+
+
+@check
+def balances_lists_positive_rows(ledger, rng):
+    positive, empty = new_address(rng), new_address(rng)
+    ledger.increment(positive, 9)
+    ledger.get_or_create(empty)
+    rows = dict(ledger.balances())
+    assert rows.get(positive) == 9
+    assert empty not in rows
+
+
+@check
+def ping_and_stats(ledger, rng):
+    assert ledger.ping() is True
+    assert isinstance(ledger.stats(), dict)
+
+
+def latency(ledger, rng, rounds):
+    addresses = [new_address(rng) for _ in range(rounds)]
+    results = {}
+    for name, call in (
+        ("get_or_create", lambda address: ledger.get_or_create(address)),
+        ("increment", lambda address: ledger.increment(address, 1)),
+    ):
+        start = time.perf_counter()
+        for address in addresses:
+            call(address)
+        results[name] = (time.perf_counter() - start) / rounds * 1000
+    return results
+
+
+def run(name, ledger, rng, rounds, transactions=True):
+    failures = skipped = 0
+    for fn in CHECKS:
+        if fn.transactional and not transactions:
+            skipped += 1
+            print(f"  SKIP {fn.__name__} (no transactions)")
+            continue
+        try:
+            fn(ledger, rng)
+            print(f"  PASS {fn.__name__}")
+        except Exception:
+            failures += 1
+            print(f"  FAIL {fn.__name__}")
+            traceback.print_exc()
+    timings = latency(ledger, rng, rounds)
+    print(f"  {name}: " + ", ".join(f"{op} {ms:.3f} ms" for op, ms in timings.items()))
+    return failures, skipped
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--backend", choices=("sqlite", "mysql"), action="append")
+    parser.add_argument(
+        "--mysql-env",
+        action="store_true",
+        help="use the database from HOST/USER/PASSWORD/DATABASE/DB_PORT",
+    )
+    parser.add_argument("--rounds", type=int, default=500)
+    parser.add_argument("--seed", type=int)
+    args = parser.parse_args(argv)
+    rng = random.Random(args.seed)
+
+    failures = skipped = 0
+    for backend in args.backend or ("sqlite", "mysql"):
+        if backend == "sqlite":
+            print(backend)
+            with tempfile.TemporaryDirectory() as directory:
+                ledger = SQLiteLedger(os.path.join(directory, "ledger.db"))
+                failures += run(backend, ledger, rng, args.rounds)[0]
+            continue
+        stub = None
+        if args.mysql_env:
+            config = {
+                "host": os.getenv("HOST"),
+                "user": os.getenv("USER"),
+                "password": os.getenv("PASSWORD"),
+                "database": os.getenv("DATABASE"),
+                "port": int(os.getenv("DB_PORT", 4000)),
+            }
+        else:
+            stub = MySQLStub()
+            stub.start()
+            config = {"host": stub.host, "port": stub.port, "user": "bench"}
+            backend = "mysql stand-in"
+        print(backend)
+        pool = ConnectionPool(config, size=8)
+        try:
+            result = run(backend, MySQLLedger(pool), rng, args.rounds, stub is None)
+            failures += result[0]
+            skipped += result[1]
+        finally:
+            pool.close_all()
+            if stub is not None:
+                stub.stop()
+    if failures:
+        print(f"{failures} check(s) failed")
+    else:
+        print("all checks passed" + (f", {skipped} skipped" if skipped else ""))
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
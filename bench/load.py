@@ -0,0 +1,333 @@
+import sys
+import json
+import time
+import random
+import argparse
+import platform
+import threading
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from bench.rpc_stub import RPCStub
+from bench.mysql_stub import MySQLStub
+from bench.servers import app_env, start_app, stop_app, ROOT
+from grid_engine import CATEGORIES, DIRECTIONS
+
+# Replays game traffic against the app running on the local chain and
+# database stand-ins. Each simulated player connects a wallet
+# (/verifyAddress), loads its balance (/balance), plays --games games
+# (/grid, one /submitWord per word, /addToBalance for the session) and
+# then cashes out: /walletTransfer of the balance, or one more game paid
+# through /transfer. Per-route throughput and p50/p95/p99 latency are
+# printed and, with --out, written as JSON; --baseline prints the change
+# against an earlier results file.
+#
+#   python -m bench.load --players 40 --concurrency 20 --out run.json
+#   python -m bench.load --app async --baseline run.json
+
+PERCENTILES = (50, 95, 99)
+
+
+def percentile(ordered, q):
+    if not ordered:
+        return 0.0
+    index = max(0, min(len(ordered) - 1, int(round(q / 100 * len(ordered))) - 1))
+    return ordered[index]
+
+
+def solve(grid, words):
+    # The word search a player does by eye: every straight run in the six
+    # directions the generator uses, read from each start cell.
+    rows, cols = len(grid), len(grid[0])
+    found = {}
+    for word in words:
+        for row in range(rows):
+            for col in range(cols):
+                if grid[row][col] != word[0]:
+                    continue
+                for dr, dc in DIRECTIONS:
+                    path = [(row + dr * i, col + dc * i) for i in range(len(word))]
+                    if all(
+                        0 <= r < rows and 0 <= c < cols and grid[r][c] == letter
+                        for (r, c), letter in zip(path, word)
+                    ):
+                        found.setdefault(word, [list(cell) for cell in path])
+    return found
+
+
+class Recorder:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.samples = {}
+        self.statuses = {}
+
+    def add(self, route, seconds, status):
+        with self._lock:
+            self.samples.setdefault(route, []).append(seconds)
+            counts = self.statuses.setdefault(route, {})
+            counts[str(status)] = counts.get(str(status), 0) + 1
+
+    def summary(self, elapsed):
+        routes = {}
+        for route, samples in sorted(self.samples.items()):
+            ordered = sorted(samples)
+            statuses = self.statuses[route]
+            routes[route] = {
+                "requests": len(ordered),
+                "errors": sum(
+                    count
+                    for status, count in statuses.items()
+                    if not status.startswith("2")
+                ),
+                "statuses": statuses,
+                "rps": len(ordered) / elapsed,
+                "mean_ms": sum(ordered) / len(ordered) * 1000,
+                **{f"p{q}_ms": percentile(ordered, q) * 1000 for q in PERCENTILES},
+            }
+        return routes
+
+
+class Player:
+    def __init__(self, base, recorder, rng, games, wallet_ratio, timeout):
+        self.base = base
+        self.recorder = recorder
+        self.rng = rng
+        self.games = games
+        self.wallet_ratio = wallet_ratio
+        self.timeout = timeout
+        self.address = "0x%040x" % rng.getrandbits(160)
+        self.session = requests.Session()
+
+    def call(self, method, path, route=None, **kwargs):
+        start = time.perf_counter()
+        try:
+            response = self.session.request(
+                method, self.base + path, timeout=self.timeout, **kwargs
+            )
+            status = response.status_code
+        except requests.RequestException as e:
+            response, status = None, type(e).__name__
+        self.recorder.add(
+            route or f"{method} {path}", time.perf_counter() - start, status
+        )
+        if response is None or not response.ok:
+            return None
+        return response.json()
+
+    def play_game(self):
+        category = self.rng.randrange(len(CATEGORIES))
+        # The claim to send for the game: its session and the found paths.
+        puzzle = self.call("GET", f"/grid?category={category}", "GET /grid")
+        if puzzle is None:
+            return None
+        paths = []
+        for path in solve(puzzle["grid"], puzzle["words"]).values():
+            result = self.call(
+                "POST",
+                "/submitWord",
+                json={"session_id": puzzle["session_id"], "path": path},
+            )
+            if result and result["found"]:
+                paths.append(path)
+        return {"session_id": puzzle["session_id"], "paths": paths}
+
+    def run(self):
+        self.call("POST", "/verifyAddress", json={"address": self.address})
+        self.call("POST", "/balance", json={"address": self.address})
+        balance = 0
+        for _ in range(self.games):
+            game = self.play_game()
+            if game is None:
+                continue
+            result = self.call(
+                "POST",
+                "/addToBalance",
+                json={"address": self.address, **game},
+            )
+            if result:
+                balance = result["balance"]
+        if self.rng.random() < self.wallet_ratio:
+            if balance > 0:
+                self.call(
+                    "POST",
+                    "/walletTransfer",
+                    json={"address": self.address},
+                )
+            return
+        game = self.play_game()
+        if game is not None:
+            self.call(
+                "POST",
+                "/transfer",
+                json={"address": self.address, **game},
+            )
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=ROOT,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(args):
+    rpc_stub = RPCStub(latency=args.rpc_latency_ms / 1000)
+    db_stub = MySQLStub(latency=args.db_latency_ms / 1000)
+    rpc_stub.start()
+    db_stub.start()
+    extra = dict(args.env)
+    if args.signers > 1:
+        extra.setdefault(
+            "SIGNER_KEYS",
+            ",".join(rpc_stub.private_key(i) for i in range(args.signers)),
+        )
+    env = app_env(rpc_stub, db_stub, **extra)
+    recorder = Recorder()
+    try:
+        process, base = start_app(
+            args.app, env, workers=args.workers, threads=args.threads
+        )
+        try:
+            rng = random.Random(args.seed)
+            players = [
+                Player(
+                    base,
+                    recorder,
+                    random.Random(rng.random()),
+                    args.games,
+                    args.wallet_ratio,
+                    args.timeout,
+                )
+                for _ in range(args.players)
+            ]
+            start = time.perf_counter()
+            with ThreadPoolExecutor(args.concurrency) as pool:
+                for future in [pool.submit(player.run) for player in players]:
+                    future.result()
+            elapsed = time.perf_counter() - start
+        finally:
+            stop_app(process)
+        # Transactions each payout signer got mined.
+        signers = {
+            account: rpc_stub.w3.eth.get_transaction_count(account)
+            for account in rpc_stub.accounts[: args.signers]
+        }
+    finally:
+        rpc_stub.stop()
+        db_stub.stop()
+    routes = recorder.summary(elapsed)
+    total = sum(route["requests"] for route in routes.values())
+    return {
+        "started_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "revision": git_revision(),
+        "python": platform.python_version(),
+        "config": {
+            key: value
+            for key, value in vars(args).items()
+            if key not in ("out", "baseline")
+        },
+        "elapsed_s": elapsed,
+        "requests": total,
+        "rps": total / elapsed,
+        "routes": routes,
+        "rpc": rpc_stub.snapshot(),
+        "db": db_stub.snapshot(),
+        "signers": signers,
+    }
+
+
+def report(result, baseline=None):
+    config = result["config"]
+    print(
+        f"{config['app']} app, {config['players']} players x {config['games']} games, "
+        f"concurrency {config['concurrency']}, RPC {config['rpc_latency_ms']:.0f} ms, "
+        f"DB {config['db_latency_ms']:.0f} ms"
+    )
+    print(
+        f"{result['requests']} requests in {result['elapsed_s']:.1f}s "
+        f"({result['rps']:.1f} req/s), {result['rpc']['http_requests']} RPC "
+        f"requests, {result['db']['queries']} SQL queries"
+    )
+    print(
+        f"{'route':<22} {'count':>6} {'err':>4} {'req/s':>7} "
+        + " ".join(f"{'p' + str(q):>8}" for q in PERCENTILES)
+    )
+    for route, entry in result["routes"].items():
+        line = (
+            f"{route:<22} {entry['requests']:6d} {entry['errors']:4d} "
+            f"{entry['rps']:7.1f} "
+            + " ".join(f"{entry[f'p{q}_ms']:8.1f}" for q in PERCENTILES)
+        )
+        before = (baseline or {}).get("routes", {}).get(route)
+        if before and before["p95_ms"]:
+            change = (entry["p95_ms"] - before["p95_ms"]) / before["p95_ms"] * 100
+            line += f"  p95 {change:+.0f}%"
+        print(line)
+    if len(result["signers"]) > 1:
+        print(
+            "transactions per signer: "
+            + ", ".join(
+                f"{account[:10]} {count}"
+                for account, count in result["signers"].items()
+            )
+        )
+
+
+def parse_env(value):
+    key, _, item = value.partition("=")
+    if not key or not _:
+        raise argparse.ArgumentTypeError("expected KEY=VALUE")
+    return key, item
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--app", choices=("sync", "async"), default="sync")
+    parser.add_argument("--players", type=int, default=40)
+    parser.add_argument("--games", type=int, default=10)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--wallet-ratio", type=float, default=0.5)
+    parser.add_argument("--rpc-latency-ms", type=float, default=50.0)
+    parser.add_argument("--db-latency-ms", type=float, default=5.0)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--timeout", type=float, default=120.0)
+    parser.add_argument(
+        "--signers", type=int, default=1, help="payout signers (stand-in accounts)"
+    )
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument(
+        "--env",
+        type=parse_env,
+        action="append",
+        default=[],
+        help="extra KEY=VALUE for the app, e.g. --env BALANCE_WRITE_BEHIND=1",
+    )
+    parser.add_argument("--out", help="write the results as JSON to this file")
+    parser.add_argument("--baseline", help="earlier results file to compare with")
+    args = parser.parse_args(argv)
+    if args.signers > 1 and args.app == "async":
+        parser.error("--signers needs the sync app; server_async has one payout key")
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as file:
+            baseline = json.load(file)
+    result = run(args)
+    report(result, baseline)
+    if args.out:
+        with open(args.out, "w") as file:
+            json.dump(result, file, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
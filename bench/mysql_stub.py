@@ -0,0 +1,303 @@
+import re
+import sys
+import time
+import struct
+import sqlite3
+import argparse
+import threading
+import socketserver
+
+# A local stand-in for the TiDB/MySQL ledger: speaks enough of the MySQL
+# client/server protocol (handshake, COM_QUERY with text result sets,
+# COM_PING, COM_QUIT) for mysql-connector and aiomysql, and runs each
+# statement on one in-memory SQLite database after rewriting the MySQL-only
+# syntax the app uses. Any user/password is accepted. Every statement runs
+# on its own (COMMIT and ROLLBACK are no-ops), with a configurable delay per
+# query to stand in for the network round trip.
+#
+#   python -m bench.mysql_stub --port 4000 --latency-ms 5
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS token (
+    accNo VARCHAR(42) PRIMARY KEY,
+    balance BIGINT NOT NULL DEFAULT 0
+)
+"""
+
+CAPABILITIES = (
+    0x00000001  # CLIENT_LONG_PASSWORD
+    | 0x00000002  # CLIENT_FOUND_ROWS
+    | 0x00000004  # CLIENT_LONG_FLAG
+    | 0x00000008  # CLIENT_CONNECT_WITH_DB
+    | 0x00000200  # CLIENT_PROTOCOL_41
+    | 0x00002000  # CLIENT_TRANSACTIONS
+    | 0x00008000  # CLIENT_SECURE_CONNECTION
+    | 0x00010000  # CLIENT_MULTI_STATEMENTS
+    | 0x00020000  # CLIENT_MULTI_RESULTS
+    | 0x00080000  # CLIENT_PLUGIN_AUTH
+)
+STATUS_AUTOCOMMIT = 0x0002
+TYPE_DOUBLE = 0x05
+TYPE_LONGLONG = 0x08
+TYPE_VAR_STRING = 0xFD
+CHARSET_UTF8MB4 = 45
+CHARSET_BINARY = 63
+
+COM_QUIT = 0x01
+COM_INIT_DB = 0x02
+COM_QUERY = 0x03
+COM_PING = 0x0E
+COM_RESET_CONNECTION = 0x1F
+
+# Statements that only set session state in MySQL.
+NO_OP = re.compile(
+    r"^\s*(SET|USE|BEGIN|START\s+TRANSACTION|COMMIT|ROLLBACK)\b", re.IGNORECASE
+)
+SYSTEM_VARIABLE = re.compile(r"@@(?:session\.|global\.)?(\w+)", re.IGNORECASE)
+SYSTEM_VARIABLES = {
+    "autocommit": 1,
+    "version_comment": "bench stand-in",
+    "max_allowed_packet": 67108864,
+    "sql_mode": "",
+    "transaction_isolation": "REPEATABLE-READ",
+    "tx_isolation": "REPEATABLE-READ",
+    "lower_case_table_names": 0,
+}
+
+
+def translate(sql):
+    # The MySQL dialect used by the app, rewritten for SQLite.
+    sql = re.sub(r"^\s*INSERT\s+IGNORE\b", "INSERT OR IGNORE", sql, flags=re.I)
+    parts = re.split(r"\bON\s+DUPLICATE\s+KEY\s+UPDATE\b", sql, 1, flags=re.I)
+    if len(parts) == 2:
+        head, update = parts
+        update = re.sub(
+            r"\bVALUES\s*\(\s*(\w+)\s*\)", r"excluded.\1", update, flags=re.I
+        )
+        sql = head + "ON CONFLICT DO UPDATE SET" + update
+    return re.sub(r"\bFOR\s+UPDATE\b", "", sql, flags=re.I)
+
+
+def lenenc_int(value):
+    if value < 251:
+        return bytes([value])
+    if value < 2**16:
+        return b"\xfc" + struct.pack("<H", value)
+    if value < 2**24:
+        return b"\xfd" + struct.pack("<I", value)[:3]
+    return b"\xfe" + struct.pack("<Q", value)
+
+
+def lenenc_str(value):
+    if isinstance(value, str):
+        value = value.encode()
+    return lenenc_int(len(value)) + value
+
+
+def ok_packet(affected=0, last_id=0):
+    return (
+        b"\x00"
+        + lenenc_int(affected)
+        + lenenc_int(last_id or 0)
+        + struct.pack("<HH", STATUS_AUTOCOMMIT, 0)
+    )
+
+
+def eof_packet():
+    return b"\xfe" + struct.pack("<HH", 0, STATUS_AUTOCOMMIT)
+
+
+def err_packet(code, message, state="HY000"):
+    return b"\xff" + struct.pack("<H", code) + b"#" + state.encode() + message.encode()
+
+
+def column_type(value):
+    if isinstance(value, bool) or isinstance(value, int):
+        return TYPE_LONGLONG, CHARSET_BINARY
+    if isinstance(value, float):
+        return TYPE_DOUBLE, CHARSET_BINARY
+    return TYPE_VAR_STRING, CHARSET_UTF8MB4
+
+
+def column_packet(name, value):
+    kind, charset = column_type(value)
+    return (
+        lenenc_str("def")
+        + lenenc_str("")
+        + lenenc_str("")
+        + lenenc_str("")
+        + lenenc_str(name)
+        + lenenc_str(name)
+        + b"\x0c"
+        + struct.pack("<HIBHB", charset, 255, kind, 0, 0)
+        + b"\x00\x00"
+    )
+
+
+def row_packet(row):
+    out = b""
+    for value in row:
+        if value is None:
+            out += b"\xfb"
+        elif isinstance(value, bytes):
+            out += lenenc_str(value)
+        else:
+            out += lenenc_str(str(value))
+    return out
+
+
+class MySQLStub:
+    def __init__(self, latency=0.0, host="127.0.0.1", port=0):
+        self.latency = latency
+        self.db = sqlite3.connect(":memory:", check_same_thread=False)
+        self.db.isolation_level = None
+        self.db.execute(SCHEMA)
+        self._lock = threading.Lock()
+        self._ids = iter(range(1, 2**31))
+        self.connections = 0
+        self.queries = 0
+        self.errors = 0
+        stub = self
+
+        class Handler(socketserver.BaseRequestHandler):
+            def handle(self):
+                stub.serve(self.request)
+
+        self.server = socketserver.ThreadingTCPServer(
+            (host, port), Handler, bind_and_activate=False
+        )
+        self.server.daemon_threads = True
+        self.server.allow_reuse_address = True
+        self.server.server_bind()
+        self.server.server_activate()
+        self.host, self.port = host, self.server.server_address[1]
+
+    def start(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self.port
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def serve(self, sock):
+        with self._lock:
+            self.connections += 1
+            connection_id = next(self._ids)
+        reader = sock.makefile("rb")
+
+        def read_packet():
+            header = reader.read(4)
+            if len(header) < 4:
+                return None, None
+            length = header[0] | header[1] << 8 | header[2] << 16
+            return header[3], reader.read(length)
+
+        def send(seq, *payloads):
+            data = b""
+            for payload in payloads:
+                data += struct.pack("<I", len(payload))[:3] + bytes([seq & 0xFF])
+                data += payload
+                seq += 1
+            sock.sendall(data)
+
+        salt = b"abcdefghijklmnopqrst"
+        send(
+            0,
+            b"\x0a"
+            + b"8.0.11-bench\x00"
+            + struct.pack("<I", connection_id)
+            + salt[:8]
+            + b"\x00"
+            + struct.pack("<H", CAPABILITIES & 0xFFFF)
+            + bytes([CHARSET_UTF8MB4])
+            + struct.pack("<H", STATUS_AUTOCOMMIT)
+            + struct.pack("<H", CAPABILITIES >> 16)
+            + bytes([len(salt) + 1])
+            + b"\x00" * 10
+            + salt[8:]
+            + b"\x00"
+            + b"mysql_native_password\x00",
+        )
+        seq, _ = read_packet()
+        if seq is None:
+            return
+        send(seq + 1, ok_packet())
+        try:
+            while True:
+                seq, payload = read_packet()
+                if not payload or payload[0] == COM_QUIT:
+                    return
+                if payload[0] == COM_QUERY:
+                    send(seq + 1, *self.query(payload[1:].decode()))
+                elif payload[0] in (COM_PING, COM_INIT_DB, COM_RESET_CONNECTION):
+                    send(seq + 1, ok_packet())
+                else:
+                    send(seq + 1, err_packet(1047, "Unknown command", "08S01"))
+        except (ConnectionError, OSError):
+            return
+
+    def query(self, sql):
+        if self.latency:
+            time.sleep(self.latency)
+        with self._lock:
+            self.queries += 1
+            if NO_OP.match(sql):
+                return [ok_packet()]
+            if "@@" in sql:
+                names = SYSTEM_VARIABLE.findall(sql)
+                return self.result(
+                    [f"@@{name}" for name in names],
+                    [[SYSTEM_VARIABLES.get(name.lower(), "") for name in names]],
+                )
+            try:
+                cursor = self.db.execute(translate(sql))
+                if cursor.description is None:
+                    return [ok_packet(max(cursor.rowcount, 0), cursor.lastrowid)]
+                names = [column[0] for column in cursor.description]
+                return self.result(names, cursor.fetchall())
+            except sqlite3.IntegrityError as e:
+                self.errors += 1
+                return [err_packet(1062, str(e), "23000")]
+            except sqlite3.Error as e:
+                self.errors += 1
+                return [err_packet(1064, f"{e}: {sql}", "42000")]
+
+    def result(self, names, rows):
+        sample = rows[0] if rows else [None] * len(names)
+        return (
+            [lenenc_int(len(names))]
+            + [column_packet(name, value) for name, value in zip(names, sample)]
+            + [eof_packet()]
+            + [row_packet(row) for row in rows]
+            + [eof_packet()]
+        )
+
+    def snapshot(self):
+        with self._lock:
+            rows = self.db.execute("SELECT COUNT(*) FROM token").fetchone()[0]
+            return {
+                "connections": self.connections,
+                "queries": self.queries,
+                "errors": self.errors,
+                "token_rows": rows,
+            }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=4000)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    args = parser.parse_args(argv)
+    stub = MySQLStub(args.latency_ms / 1000, args.host, args.port)
+    print(f"MySQL stand-in on {stub.host}:{stub.port}")
+    try:
+        stub.server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
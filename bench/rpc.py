@@ -0,0 +1,68 @@
+import sys
+import time
+import argparse
+
+from web3 import Web3
+
+from bench.rpc_stub import RPCStub
+from fee_oracle import FeeOracle
+from rpc_provider import PooledHTTPProvider, batch
+
+# Cold payout lookups (pending nonce, fee history, gas estimate) made one
+# request at a time versus as one JSON-RPC batch, against the local
+# stand-in with a simulated network delay.
+#
+#   python -m bench.rpc --latency-ms 50 --rounds 20
+
+
+def payout_calls(stub):
+    sender, recipient = stub.accounts[0], stub.accounts[1]
+    return [
+        ("eth_getTransactionCount", [sender, "pending"]),
+        ("eth_feeHistory", FeeOracle(None).history_params()),
+        ("eth_estimateGas", [{"from": sender, "to": recipient, "value": "0x1"}]),
+    ]
+
+
+def run(w3, calls, rounds, batched):
+    start = time.perf_counter()
+    for _ in range(rounds):
+        if batched:
+            results = batch(w3, calls)
+        else:
+            results = [w3.provider.make_request(m, p)["result"] for m, p in calls]
+        assert not any(isinstance(result, Exception) for result in results), results
+    return (time.perf_counter() - start) / rounds
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--latency-ms", type=float, default=50.0)
+    parser.add_argument("--rounds", type=int, default=20)
+    args = parser.parse_args(argv)
+
+    stub = RPCStub(latency=args.latency_ms / 1000)
+    stub.start()
+    try:
+        w3 = Web3(PooledHTTPProvider(stub.url))
+        calls = payout_calls(stub)
+        for name, batched in (("sequential", False), ("batched", True)):
+            before = stub.snapshot()["http_requests"]
+            per_round = run(w3, calls, args.rounds, batched)
+            requests = (stub.snapshot()["http_requests"] - before) / args.rounds
+            print(
+                f"{name:<11} {per_round * 1000:8.1f} ms/round "
+                f"{requests:4.1f} HTTP requests/round"
+            )
+        for method, entry in sorted(w3.provider.stats()["methods"].items()):
+            print(
+                f"  {method:<24} calls {entry['calls']:4d} "
+                f"batched {entry['batched']:4d} avg {entry['avg_ms']:7.1f} ms"
+            )
+    finally:
+        stub.stop()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
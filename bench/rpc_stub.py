@@ -0,0 +1,191 @@
+import sys
+import json
+import time
+import argparse
+import threading
+from collections.abc import Mapping
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import rlp
+from eth_account import Account
+from eth_account.typed_transactions import TypedTransaction
+from eth_utils import keccak
+from hexbytes import HexBytes
+from web3 import Web3, EthereumTesterProvider
+
+# A local JSON-RPC endpoint backed by eth-tester, with a configurable delay
+# per HTTP request to stand in for a remote node. Supports JSON-RPC batches,
+# and fills in eth_feeHistory and eth_getBlockReceipts, which eth-tester
+# lacks. Transactions are mined as soon as they are sent; like a real node's
+# mempool, ones sent ahead of a nonce gap wait until the gap is filled
+# (eth-tester on its own rejects them). max_log_range makes eth_getLogs
+# refuse long block ranges the way hosted nodes do.
+#
+#   python -m bench.rpc_stub --port 8545 --latency-ms 50
+
+
+def to_wire(value):
+    # eth-tester hands back Python values; nodes send hex quantities.
+    if isinstance(value, bool) or value is None:
+        return value
+    if isinstance(value, int):
+        return hex(value)
+    if isinstance(value, (bytes, bytearray)):
+        return "0x" + bytes(value).hex()
+    if isinstance(value, Mapping):
+        return {key: to_wire(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [to_wire(item) for item in value]
+    return value
+
+
+def tx_nonce(raw):
+    if raw[0] >= 0xC0:
+        return int.from_bytes(rlp.decode(raw)[0], "big")
+    return TypedTransaction.from_bytes(raw).as_dict()["nonce"]
+
+
+class RPCStub:
+    def __init__(self, latency=0.0, host="127.0.0.1", port=0, max_log_range=None):
+        self.latency = latency
+        # eth_getLogs ranges longer than this are refused, as hosted nodes do.
+        self.max_log_range = max_log_range
+        self.w3 = Web3(EthereumTesterProvider())
+        self.accounts = self.w3.eth.accounts
+        self.tester = self.w3.provider.ethereum_tester
+        self._lock = threading.Lock()
+        self.http_requests = 0
+        self.calls = {}
+        self.queued = {}
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                body = stub.handle(json.loads(self.rfile.read(length)))
+                data = json.dumps(body).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.server.daemon_threads = True
+        self.url = f"http://{host}:{self.server.server_address[1]}"
+
+    def private_key(self, index=0):
+        return self.tester.backend.account_keys[index].to_hex()
+
+    def start(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self.url
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def handle(self, payload):
+        with self._lock:
+            self.http_requests += 1
+        if self.latency:
+            time.sleep(self.latency)
+        if isinstance(payload, list):
+            return [self.call(request) for request in payload]
+        return self.call(payload)
+
+    def call(self, request):
+        method, params = request.get("method"), request.get("params") or []
+        with self._lock:
+            self.calls[method] = self.calls.get(method, 0) + 1
+            try:
+                result = self.dispatch(method, params)
+            except Exception as e:
+                return {
+                    "jsonrpc": "2.0",
+                    "id": request.get("id"),
+                    "error": {"code": -32000, "message": str(e)},
+                }
+        return {"jsonrpc": "2.0", "id": request.get("id"), "result": to_wire(result)}
+
+    def send_raw(self, raw_hex):
+        raw = HexBytes(raw_hex)
+        sender = Account.recover_transaction(raw)
+        nonce = tx_nonce(raw)
+        expected = self.w3.eth.get_transaction_count(sender)
+        if nonce > expected:
+            self.queued.setdefault(sender, {})[nonce] = raw
+            return keccak(raw)
+        tx_hash = self.raw_call("eth_sendRawTransaction", [raw_hex])
+        queued = self.queued.get(sender, {})
+        while nonce + 1 in queued:
+            nonce += 1
+            self.raw_call("eth_sendRawTransaction", ["0x" + queued.pop(nonce).hex()])
+        return tx_hash
+
+    def raw_call(self, method, params):
+        response = self.w3.manager._make_request(method, params)
+        if "error" in response:
+            raise ValueError(response["error"])
+        return response["result"]
+
+    def dispatch(self, method, params):
+        if method == "eth_sendRawTransaction":
+            return self.send_raw(params[0])
+        if method == "eth_feeHistory":
+            count = int(params[0], 16) if isinstance(params[0], str) else params[0]
+            base_fee = self.w3.eth.get_block("latest")["baseFeePerGas"]
+            return {
+                "oldestBlock": max(self.w3.eth.block_number - count + 1, 0),
+                "baseFeePerGas": [base_fee] * (count + 1),
+                "gasUsedRatio": [0.5] * count,
+                "reward": [[10**9 for _ in params[2]] for _ in range(count)],
+            }
+        if method == "eth_getLogs" and self.max_log_range:
+            query = params[0]
+            first, last = (
+                int(query.get(key, "0x0"), 16) for key in ("fromBlock", "toBlock")
+            )
+            if last - first + 1 > self.max_log_range:
+                raise ValueError(
+                    f"Log response size exceeded. Query a range of at most "
+                    f"{self.max_log_range} blocks"
+                )
+        if method == "eth_getBlockReceipts":
+            block = self.w3.eth.get_block(params[0])
+            return [
+                self.w3.manager._make_request("eth_getTransactionReceipt", [tx_hash])[
+                    "result"
+                ]
+                for tx_hash in block["transactions"]
+            ]
+        return self.raw_call(method, params)
+
+    def snapshot(self):
+        with self._lock:
+            return {"http_requests": self.http_requests, "calls": dict(self.calls)}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8545)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    args = parser.parse_args(argv)
+    stub = RPCStub(args.latency_ms / 1000, args.host, args.port)
+    print(f"JSON-RPC stand-in on {stub.url}")
+    print(f"Funded account {stub.accounts[0]} key {stub.private_key(0)}")
+    try:
+        stub.server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,120 @@
+import os
+import sys
+import time
+import socket
+import subprocess
+import urllib.error
+import urllib.request
+
+# Starting the app under gunicorn (server:app) or uvicorn (server_async:app)
+# as a subprocess wired to the local stand-ins.
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def app_command(app, port, workers=1, threads=8):
+    if app == "sync":
+        return [
+            sys.executable,
+            "-m",
+            "gunicorn",
+            "--bind",
+            f"127.0.0.1:{port}",
+            "--workers",
+            str(workers),
+            "--threads",
+            str(threads),
+            "server:app",
+        ]
+    if app == "async":
+        return [
+            sys.executable,
+            "-m",
+            "uvicorn",
+            "--host",
+            "127.0.0.1",
+            "--port",
+            str(port),
+            "--workers",
+            str(workers),
+            "--log-level",
+            "warning",
+            "server_async:app",
+        ]
+    raise ValueError(f"Unknown app {app!r}")
+
+
+def app_env(rpc_stub, db_stub=None, **extra):
+    # The first stand-in account pays out; the contract addresses only need
+    # to be valid, since the bench traffic pays in Ether.
+    env = {
+        **os.environ,
+        "ALCHEMY_URL": rpc_stub.url,
+        "CHAIN_ID": str(rpc_stub.w3.eth.chain_id),
+        "MY_ADDRESS": rpc_stub.accounts[0],
+        "PRIVATE_KEY": rpc_stub.private_key(0),
+        "NFT_CONTRACT_ADDRESS": rpc_stub.accounts[1],
+        "TRANSFER_CONTRACT_ADDRESS": rpc_stub.accounts[1],
+        "RECEIPT_POLL_INTERVAL": "0.05",
+        "LOG_LEVEL": "WARNING",
+        "HOST": "127.0.0.1",
+    }
+    if db_stub is not None:
+        env.update(
+            {
+                "DB_PORT": str(db_stub.port),
+                "USER": "bench",
+                "PASSWORD": "bench",
+                "DATABASE": "bench",
+            }
+        )
+    env.update({key: str(value) for key, value in extra.items()})
+    return env
+
+
+def wait_for(url, timeout=30.0, process=None):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process is not None and process.poll() is not None:
+            raise RuntimeError(f"Server exited with {process.returncode}")
+        try:
+            with urllib.request.urlopen(url, timeout=1) as response:
+                return response.status
+        except urllib.error.HTTPError as e:
+            return e.code
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError(f"{url} did not answer within {timeout}s")
+
+
+def start_app(app, env, port=None, workers=1, threads=8, log=None):
+    port = port or free_port()
+    process = subprocess.Popen(
+        app_command(app, port, workers, threads),
+        cwd=ROOT,
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=log or subprocess.DEVNULL,
+    )
+    try:
+        wait_for(f"http://127.0.0.1:{port}/api", process=process)
+    except Exception:
+        process.terminate()
+        process.wait()
+        raise
+    return process, f"http://127.0.0.1:{port}"
+
+
+def stop_app(process):
+    process.terminate()
+    try:
+        process.wait(10)
+    except subprocess.TimeoutExpired:
+        process.kill()
+        process.wait()
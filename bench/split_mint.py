@@ -0,0 +1,104 @@
+import sys
+import random
+import argparse
+
+from bench.load import Player, Recorder
+from bench.rpc_stub import RPCStub
+from bench.mysql_stub import MySQLStub
+from bench.servers import app_env, start_app, stop_app
+from contract_artifacts import deploy, load as load_artifacts
+
+# Pays one completed game through the split path (Ether from the hot
+# wallet, then a separate mint) with NFT_MINT_MODE=shared, on the local
+# chain stand-in with both contracts deployed from the artifacts. The
+# transfer contract is left unfunded so the server can't use
+# awardCompletion, and the only payout signer is an operator rather than
+# the owner, as in production (builds without operators pay from the
+# owner). Checks the player got the Ether and an NFT whose tokenURI is the
+# shared base URI. Builds without the shared-mint functions run the same
+# path with per-token URIs. Only server.py has the shared mint mode, so
+# only it is run.
+#
+#   python -m bench.split_mint
+
+BASE_URI = "https://ipfs.io/ipfs/QmSharedHash/"
+
+
+def has_function(abi, name):
+    return any(
+        item.get("type") == "function" and item.get("name") == name for item in abi
+    )
+
+
+def run(args):
+    contracts = load_artifacts()
+    shared = has_function(contracts["transfer"]["abi"], "mintSharedOnly")
+    # Builds from before operators existed only let the owner pay out.
+    operators = has_function(contracts["transfer"]["abi"], "setOperator")
+    rpc_stub = RPCStub()
+    db_stub = MySQLStub()
+    rpc_stub.start()
+    db_stub.start()
+    try:
+        w3 = rpc_stub.w3
+        signer = 2 if operators else 0
+        addresses = deploy(
+            w3,
+            rpc_stub.private_key(0),
+            w3.eth.chain_id,
+            contracts,
+            operators=[rpc_stub.accounts[signer]] if operators else [],
+            base_uri=BASE_URI if shared else None,
+        )
+        addresses.pop("EVENT_INDEX_START_BLOCK")
+        env = app_env(
+            rpc_stub,
+            db_stub,
+            **addresses,
+            SIGNER_KEYS=rpc_stub.private_key(signer),
+            NFT_MINT_MODE="shared",
+        )
+        process, base = start_app("sync", env)
+        try:
+            player = Player(base, Recorder(), random.Random(args.seed), 0, 0, 60)
+            result = player.call(
+                "POST",
+                "/transfer",
+                json={"address": player.address, **player.play_game()},
+            )
+        finally:
+            stop_app(process)
+        assert result and result["valid"], result
+        recipient = w3.to_checksum_address(player.address)
+        assert w3.eth.get_balance(recipient) == 10 * 10**15
+        nft = w3.eth.contract(
+            address=addresses["NFT_CONTRACT_ADDRESS"],
+            abi=contracts["WordHuntNFT"]["abi"],
+        )
+        minted = [
+            event
+            for event in nft.events.Transfer.create_filter(
+                fromBlock=0, argument_filters={"to": recipient}
+            ).get_all_entries()
+        ]
+        assert len(minted) == 1, minted
+        uri = nft.functions.tokenURI(minted[0].args.tokenId).call()
+        if shared:
+            assert uri == BASE_URI, uri
+    finally:
+        rpc_stub.stop()
+        db_stub.stop()
+    mode = "shared" if shared else "per-token URI (artifacts lack mintSharedOnly)"
+    print(f"Split payout paid {player.address} and minted, {mode}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args(argv)
+    run(args)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -4,18 +4,47 @@ pragma solidity ^0.8.20;
 import "@openzeppelin/contracts/token/ERC721/ERC721.sol";
 import "@openzeppelin/contracts/token/ERC721/extensions/ERC721URIStorage.sol";
 import "@openzeppelin/contracts/access/Ownable.sol";
+import "@openzeppelin/contracts/utils/Strings.sol";
+
+contract WordHuntNFT is ERC721, ERC721URIStorage, Ownable {
+    using Strings for uint256;
 
-contract WordHuntNFT is ERC721, ERC721URIStorage {
     uint256 private _tokenIds;
+    // Tokens minted with mintShared store no URI: tokenURI is the shared
+    // base URI, or the base URI followed by the variant when one is given.
+    string private _sharedBaseURI;
+    mapping(uint256 => uint256) private _variants;
+    // The transfer contract: may call mintShared besides the owner.
+    address public minter;
+
+    event MinterSet(address indexed minter);
 
-    constructor() ERC721("WordHuntNFT", "WHNFT") {
+    constructor() ERC721("WordHuntNFT", "WHNFT") Ownable(msg.sender) {
         _tokenIds = 0;
     }
 
+    function setMinter(address minter_) public onlyOwner {
+        minter = minter_;
+        emit MinterSet(minter_);
+    }
+
+    function setSharedBaseURI(string memory baseURI_) public onlyOwner {
+        _sharedBaseURI = baseURI_;
+        emit BatchMetadataUpdate(1, _tokenIds);
+    }
+
     function tokenURI(
         uint256 tokenId
     ) public view override(ERC721, ERC721URIStorage) returns (string memory) {
-        return super.tokenURI(tokenId);
+        string memory stored = super.tokenURI(tokenId);
+        if (bytes(stored).length > 0) {
+            return stored;
+        }
+        uint256 variant = _variants[tokenId];
+        if (variant == 0) {
+            return _sharedBaseURI;
+        }
+        return string.concat(_sharedBaseURI, variant.toString());
     }
 
     function supportsInterface(
@@ -34,6 +63,23 @@ contract WordHuntNFT is ERC721, ERC721URIStorage {
         _setTokenURI(newItemId, tokenURI_);
         return newItemId;
     }
+
+    function mintShared(
+        address player,
+        uint256 variant
+    ) public returns (uint256) {
+        require(
+            msg.sender == minter || msg.sender == owner(),
+            "Caller is not the minter"
+        );
+        _tokenIds += 1;
+        uint256 newItemId = _tokenIds;
+        _mint(player, newItemId);
+        if (variant != 0) {
+            _variants[newItemId] = variant;
+        }
+        return newItemId;
+    }
 }
 
 contract transfer is Ownable {
@@ -42,16 +88,47 @@ contract transfer is Ownable {
     address from;
     address to;
     WordHuntNFT public nftContract;
+    // Hot-wallet signers allowed to pay out besides the owner.
+    mapping(address => bool) public operators;
+
+    event OperatorSet(address indexed operator, bool allowed);
 
     constructor(address _nftContractAddress) Ownable(msg.sender) {
         nftContract = WordHuntNFT(_nftContractAddress);
     }
 
+    modifier onlyOperator() {
+        require(
+            msg.sender == owner() || operators[msg.sender],
+            "Caller is not an operator"
+        );
+        _;
+    }
+
+    function setOperator(address operator, bool allowed) public onlyOwner {
+        operators[operator] = allowed;
+        emit OperatorSet(operator, allowed);
+    }
+
     function awardCompletion(
         address player,
         uint256 points,
         string memory tokenURI_
-    ) public payable onlyOwner {
+    ) public payable onlyOperator {
+        _payCompletion(player, points);
+        nftContract.mintNFT(player, tokenURI_);
+    }
+
+    function awardCompletionShared(
+        address player,
+        uint256 points,
+        uint256 variant
+    ) public payable onlyOperator {
+        _payCompletion(player, points);
+        nftContract.mintShared(player, variant);
+    }
+
+    function _payCompletion(address player, uint256 points) private {
         require(points == 10, "Must complete game (10 points)");
         uint256 transferEth = points * perCorrect;
         require(
@@ -59,13 +136,60 @@ contract transfer is Ownable {
             "Insufficient contract balance"
         );
         payable(player).transfer(transferEth);
-        nftContract.mintNFT(player, tokenURI_);
+    }
+
+    event CompletionAwarded(
+        uint256 indexed index,
+        address indexed player,
+        uint256 tokenId
+    );
+    event CompletionFailed(uint256 indexed index, address indexed player);
+
+    function awardCompletionBatch(
+        address[] memory players,
+        string memory tokenURI_
+    ) public onlyOperator {
+        _awardBatch(players, tokenURI_, false, 0);
+    }
+
+    function awardCompletionBatchShared(
+        address[] memory players,
+        uint256 variant
+    ) public onlyOperator {
+        _awardBatch(players, "", true, variant);
+    }
+
+    function _awardBatch(
+        address[] memory players,
+        string memory tokenURI_,
+        bool shared,
+        uint256 variant
+    ) private {
+        uint256 transferEth = 10 * perCorrect;
+        require(
+            address(this).balance >= transferEth * players.length,
+            "Insufficient contract balance"
+        );
+        for (uint256 i = 0; i < players.length; i++) {
+            (bool sent, ) = payable(players[i]).call{
+                value: transferEth,
+                gas: 2300
+            }("");
+            if (!sent) {
+                emit CompletionFailed(i, players[i]);
+                continue;
+            }
+            uint256 tokenId = shared
+                ? nftContract.mintShared(players[i], variant)
+                : nftContract.mintNFT(players[i], tokenURI_);
+            emit CompletionAwarded(i, players[i], tokenId);
+        }
     }
 
     function transferEtherOnly(
         address player,
         uint256 points
-    ) public onlyOwner {
+    ) public onlyOperator {
         require(points == 10, "Must complete game (10 points)");
         uint256 transferEth = points * perCorrect;
         require(
@@ -78,10 +202,19 @@ contract transfer is Ownable {
     function mintNFTOnly(
         address player,
         string memory tokenURI_
-    ) public onlyOwner {
+    ) public onlyOperator {
         nftContract.mintNFT(player, tokenURI_);
     }
 
+    // Shared mints are restricted to the minter (this contract), so
+    // operators mint them through here when paying Ether separately.
+    function mintSharedOnly(
+        address player,
+        uint256 variant
+    ) public onlyOperator {
+        nftContract.mintShared(player, variant);
+    }
+
     function spendCoins(
         address player,
         uint256 amount,
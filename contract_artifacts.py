@@ -0,0 +1,286 @@
+import os
+import sys
+import json
+import time
+import shutil
+import hashlib
+import argparse
+import subprocess
+import logging
+
+logger = logging.getLogger(__name__)
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+SOURCE = "contract.sol"
+ARTIFACTS_DIR = "artifacts"
+# Written by compile.js before content-addressed builds existed; only read
+# when the artifacts directory has no build at all.
+LEGACY_FILE = "contract_data.json"
+SETTINGS = {
+    "outputSelection": {"*": {"*": ["abi", "evm.bytecode.object"]}},
+    "remappings": ["@openzeppelin/contracts/=node_modules/@openzeppelin/contracts/"],
+}
+
+# Compiled contracts live in artifacts/<key>/<Contract>.json, holding just
+# the ABI and bytecode. The key hashes contract.sol, the solc and
+# OpenZeppelin versions pinned in package-lock.json and SETTINGS, so it
+# can be worked out without node_modules. `build` compiles (through
+# compile.js and solc-js) only when no directory exists for the current
+# key. artifacts/index.json records every build and the latest one.
+#
+#   python contract_artifacts.py build
+#   python contract_artifacts.py deploy --deposit-eth 0.1
+
+
+class ArtifactsMissing(RuntimeError):
+    pass
+
+
+def _path(root, *parts):
+    return os.path.join(root, *parts)
+
+
+def locked_versions(root=ROOT):
+    with open(_path(root, "package-lock.json"), "r") as file:
+        packages = json.load(file)["packages"]
+    return {
+        "solc": packages["node_modules/solc"]["version"],
+        "openzeppelin": packages["node_modules/@openzeppelin/contracts"]["version"],
+    }
+
+
+def build_inputs(root=ROOT):
+    with open(_path(root, SOURCE), "rb") as file:
+        source = file.read()
+    return {
+        "source": SOURCE,
+        "source_sha256": hashlib.sha256(source).hexdigest(),
+        **locked_versions(root),
+        "settings": SETTINGS,
+    }
+
+
+def build_key(root=ROOT):
+    inputs = json.dumps(build_inputs(root), sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(inputs.encode()).hexdigest()[:16]
+
+
+def _read_index(root):
+    try:
+        with open(_path(root, ARTIFACTS_DIR, "index.json"), "r") as file:
+            return json.load(file)
+    except FileNotFoundError:
+        return {"latest": None, "builds": {}}
+
+
+def _read_build(directory):
+    contracts = {}
+    for name in sorted(os.listdir(directory)):
+        if name.endswith(".json"):
+            with open(os.path.join(directory, name), "r") as file:
+                artifact = json.load(file)
+            contracts[artifact["contractName"]] = {
+                "abi": artifact["abi"],
+                "bytecode": artifact["bytecode"],
+            }
+    return contracts
+
+
+def compile_source(root=ROOT):
+    with open(_path(root, SOURCE), "r") as file:
+        source = file.read()
+    request = {
+        "language": "Solidity",
+        "sources": {SOURCE: {"content": source}},
+        "settings": SETTINGS,
+    }
+    result = subprocess.run(
+        ["node", _path(root, "compile.js")],
+        input=json.dumps(request),
+        capture_output=True,
+        text=True,
+        cwd=root,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"compile.js failed: {result.stderr.strip()}")
+    output = json.loads(result.stdout)
+    errors = [
+        error for error in output.get("errors", []) if error["severity"] == "error"
+    ]
+    if errors:
+        raise RuntimeError(
+            "Compilation failed:\n"
+            + "\n".join(
+                error.get("formattedMessage", error["message"]) for error in errors
+            )
+        )
+    return {
+        name: {
+            "abi": contract["abi"],
+            "bytecode": contract["evm"]["bytecode"]["object"],
+        }
+        for name, contract in output["contracts"][SOURCE].items()
+    }
+
+
+def build(root=ROOT, force=False):
+    # Returns (key, compiled): compiled is False on a cache hit.
+    key = build_key(root)
+    directory = _path(root, ARTIFACTS_DIR, key)
+    if os.path.isdir(directory) and not force:
+        return key, False
+    contracts = compile_source(root)
+    staging = directory + ".tmp"
+    shutil.rmtree(staging, ignore_errors=True)
+    os.makedirs(staging)
+    for name, contract in contracts.items():
+        with open(os.path.join(staging, name + ".json"), "w") as file:
+            json.dump({"contractName": name, **contract}, file, separators=(",", ":"))
+    shutil.rmtree(directory, ignore_errors=True)
+    os.rename(staging, directory)
+    index = _read_index(root)
+    index["builds"][key] = {
+        **build_inputs(root),
+        "contracts": sorted(contracts),
+        "built_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+    }
+    index["latest"] = key
+    with open(_path(root, ARTIFACTS_DIR, "index.json"), "w") as file:
+        json.dump(index, file, indent=2, sort_keys=True)
+    return key, True
+
+
+def load(root=ROOT, strict=False):
+    # {name: {"abi": [...], "bytecode": "..."}} for contract.sol as it is
+    # now. Without a build for it, strict raises; otherwise the latest build
+    # (or the legacy contract_data.json) is used and a warning logged.
+    key = build_key(root)
+    directory = _path(root, ARTIFACTS_DIR, key)
+    if os.path.isdir(directory):
+        return _read_build(directory)
+    if strict:
+        raise ArtifactsMissing(
+            f"No artifacts for {SOURCE} (key {key}); run "
+            f"`python contract_artifacts.py build`"
+        )
+    latest = _read_index(root).get("latest")
+    if latest and os.path.isdir(_path(root, ARTIFACTS_DIR, latest)):
+        logger.warning(
+            "%s changed since the last build; using artifacts %s", SOURCE, latest
+        )
+        return _read_build(_path(root, ARTIFACTS_DIR, latest))
+    logger.warning("No contract artifacts built yet; using %s", LEGACY_FILE)
+    with open(_path(root, LEGACY_FILE), "r") as file:
+        return json.load(file)
+
+
+def deploy(
+    w3, private_key, chain_id, contracts, deposit=0, operators=(), base_uri=None
+):
+    # WordHuntNFT, then transfer pointing at it and allowed to mint shared
+    # tokens; optionally sets the shared base URI, authorises operators and
+    # funds the contract. Returns the addresses and the first block, for
+    # NFT_/TRANSFER_CONTRACT_ADDRESS and EVENT_INDEX_START_BLOCK.
+    account = w3.eth.account.from_key(private_key)
+    nonce = w3.eth.get_transaction_count(account.address, "pending")
+    first_block = None
+
+    def transact(call, value=0):
+        nonlocal nonce, first_block
+        tx = call.build_transaction(
+            {
+                "from": account.address,
+                "nonce": nonce,
+                "chainId": chain_id,
+                "value": value,
+            }
+        )
+        signed = w3.eth.account.sign_transaction(tx, private_key=private_key)
+        tx_hash = w3.eth.send_raw_transaction(signed.raw_transaction)
+        nonce += 1
+        receipt = w3.eth.wait_for_transaction_receipt(tx_hash, timeout=600)
+        if receipt.status == 0:
+            raise RuntimeError(f"Transaction {tx_hash.hex()} failed")
+        if first_block is None:
+            first_block = receipt.blockNumber
+        return receipt
+
+    def create(name, *args):
+        factory = w3.eth.contract(
+            abi=contracts[name]["abi"], bytecode=contracts[name]["bytecode"]
+        )
+        receipt = transact(factory.constructor(*args))
+        logger.info("Deployed %s at %s", name, receipt.contractAddress)
+        return w3.eth.contract(
+            address=receipt.contractAddress, abi=contracts[name]["abi"]
+        )
+
+    nft = create("WordHuntNFT")
+    transfer = create("transfer", nft.address)
+    if any(item.get("name") == "setMinter" for item in nft.abi):
+        transact(nft.functions.setMinter(transfer.address))
+    if base_uri:
+        transact(nft.functions.setSharedBaseURI(base_uri))
+    for operator in operators:
+        transact(transfer.functions.setOperator(w3.to_checksum_address(operator), True))
+    if deposit:
+        transact(transfer.functions.deposit(), value=deposit)
+    return {
+        "NFT_CONTRACT_ADDRESS": nft.address,
+        "TRANSFER_CONTRACT_ADDRESS": transfer.address,
+        "EVENT_INDEX_START_BLOCK": first_block,
+    }
+
+
+def main(argv=None):
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    parser = argparse.ArgumentParser()
+    commands = parser.add_subparsers(dest="command", required=True)
+    build_parser = commands.add_parser("build", help="compile unless already built")
+    build_parser.add_argument("--force", action="store_true")
+    commands.add_parser("key", help="print the build key of contract.sol")
+    deploy_parser = commands.add_parser(
+        "deploy", help="deploy both contracts from the artifacts"
+    )
+    deploy_parser.add_argument("--deposit-eth", default="0")
+    deploy_parser.add_argument(
+        "--operators", default="", help="comma-separated payout signer addresses"
+    )
+    deploy_parser.add_argument(
+        "--base-uri", help="tokenURI of NFTs minted with NFT_MINT_MODE=shared"
+    )
+    args = parser.parse_args(argv)
+
+    if args.command == "key":
+        print(build_key())
+        return 0
+    try:
+        key, compiled = build(force=getattr(args, "force", False))
+    except RuntimeError as e:
+        print(e, file=sys.stderr)
+        return 1
+    print(f"{'Compiled' if compiled else 'Up to date'}: {ARTIFACTS_DIR}/{key}")
+    if args.command == "build":
+        return 0
+
+    from dotenv import load_dotenv
+    from web3 import Web3
+
+    load_dotenv()
+    w3 = Web3(Web3.HTTPProvider(os.getenv("ALCHEMY_URL")))
+    addresses = deploy(
+        w3,
+        os.getenv("PRIVATE_KEY"),
+        int(os.getenv("CHAIN_ID", 11155111)),
+        load(strict=True),
+        deposit=w3.to_wei(args.deposit_eth, "ether"),
+        operators=[item.strip() for item in args.operators.split(",") if item.strip()],
+        base_uri=args.base_uri,
+    )
+    for name, value in addresses.items():
+        print(f"{name}={value}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,221 @@
+import os
+import time
+import fcntl
+import threading
+import logging
+
+from rpc_provider import to_int
+
+logger = logging.getLogger(__name__)
+
+
+class ContractFunds:
+    # The transfer contract's Ether balance, refreshed on a background
+    # thread, minus what in-flight payouts have already committed. A payout
+    # reserves its amount before sending anything: when the reservation
+    # fails, the route goes straight to the split path (Ether from the hot
+    # wallet plus a separate mint) instead of mining an awardCompletion
+    # that reverts with "Insufficient contract balance".
+    #
+    # When headroom drops below low_water an error is logged (at most once
+    # per alert_interval) and, if a top_up callback is set, the same alert
+    # asks it on its own thread to deposit top_up_amount. With lock_path
+    # set, only the process holding that lock file alerts and tops up, so
+    # gunicorn workers don't all deposit at once.
+    #
+    # Reservations are per process: with several workers each one only
+    # sees its own in-flight payouts, so together they can commit up to
+    # (workers - 1) times their concurrent payouts more than the contract
+    # holds. Those payouts still revert cleanly on-chain, and a low_water
+    # of at least workers x threads x payout keeps that from happening.
+
+    def __init__(
+        self,
+        w3,
+        address,
+        refresh_interval=30.0,
+        low_water=0,
+        top_up=None,
+        top_up_amount=0,
+        alert_interval=300.0,
+        lock_path=None,
+    ):
+        self.w3 = w3
+        self.address = address
+        self.refresh_interval = refresh_interval
+        self.low_water = low_water
+        self.top_up = top_up
+        self.top_up_amount = top_up_amount
+        self.alert_interval = alert_interval
+        self.lock_path = lock_path
+        self.owner = lock_path is None
+        self._lock_file = None
+        self._lock = threading.Lock()
+        self._balance = None
+        self._committed = 0
+        self._updated_at = 0.0
+        self._alerted_at = None
+        self._topping_up = False
+        self._pid = None
+        self.stats = {
+            "reserved": 0,
+            "refused": 0,
+            "alerts": 0,
+            "top_ups": 0,
+            "failed_top_ups": 0,
+        }
+
+    def _ensure_worker(self):
+        if self._pid == os.getpid():
+            return
+        self._pid = os.getpid()
+        self._committed = 0
+        if self.lock_path is not None:
+            self.owner = False
+            try:
+                lock_file = open(self.lock_path, "w")
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                logger.info("Contract top-ups handled by another process")
+            else:
+                self._lock_file = lock_file
+                self.owner = True
+        threading.Thread(target=self._run, name="contract-funds", daemon=True).start()
+
+    def _run(self):
+        while True:
+            time.sleep(self.refresh_interval)
+            try:
+                self.refresh()
+            except Exception as e:
+                logger.error("Contract balance refresh failed: %s", e)
+
+    def is_cold(self):
+        with self._lock:
+            return self._balance is None
+
+    def balance_params(self):
+        # eth_getBalance params, for callers that batch the request.
+        return [self.address, "latest"]
+
+    def refresh(self, balance=None):
+        # `balance` is an eth_getBalance result fetched elsewhere (a raw hex
+        # string is fine); without it the cache asks the node itself.
+        if balance is None:
+            balance = self.w3.eth.get_balance(self.address)
+        with self._lock:
+            self._balance = to_int(balance)
+            self._updated_at = time.time()
+        self._check_headroom()
+
+    def headroom(self):
+        with self._lock:
+            if self._balance is None:
+                return None
+            return self._balance - self._committed
+
+    def reserve(self, amount):
+        # True when the contract can cover `amount` on top of every payout
+        # already in flight; the caller must release() it afterwards. An
+        # unknown balance (first refresh failed) is given the benefit of
+        # the doubt, as before this cache existed.
+        self._ensure_worker()
+        if self.is_cold():
+            try:
+                self.refresh()
+            except Exception as e:
+                logger.info("Contract balance unknown: %s", e)
+        with self._lock:
+            if self._balance is not None and self._balance - self._committed < amount:
+                self.stats["refused"] += 1
+                refused = True
+            else:
+                self._committed += amount
+                self.stats["reserved"] += 1
+                refused = False
+        self._check_headroom()
+        return not refused
+
+    def release(self, amount, spent=False):
+        # `spent`: the payout was mined, so the contract holds that much
+        # less until the next refresh reads the real balance. A refresh that
+        # already saw the payout makes this an underestimate, which only
+        # errs towards the split path.
+        with self._lock:
+            self._committed = max(self._committed - amount, 0)
+            if spent and self._balance is not None:
+                self._balance = max(self._balance - amount, 0)
+
+    def _check_headroom(self):
+        if not (self.owner and self._pid == os.getpid()):
+            return
+        with self._lock:
+            if self._balance is None:
+                return
+            balance, committed = self._balance, self._committed
+            if balance - committed >= self.low_water:
+                self._alerted_at = None
+                return
+            now = time.monotonic()
+            if (
+                self._alerted_at is not None
+                and now - self._alerted_at < self.alert_interval
+            ):
+                return
+            self._alerted_at = now
+            self.stats["alerts"] += 1
+            top_up = (
+                self.top_up is not None
+                and self.top_up_amount > 0
+                and not self._topping_up
+            )
+            if top_up:
+                self._topping_up = True
+        logger.error(
+            "Transfer contract headroom %s wei is below %s wei (balance %s,"
+            " committed %s)%s",
+            balance - committed,
+            self.low_water,
+            balance,
+            committed,
+            ", topping up" if top_up else "",
+        )
+        if top_up:
+            threading.Thread(
+                target=self._top_up, name="contract-top-up", daemon=True
+            ).start()
+
+    def _top_up(self):
+        try:
+            self.top_up(self.top_up_amount)
+            self.stats["top_ups"] += 1
+            logger.info(
+                "Deposited %s wei into the transfer contract", self.top_up_amount
+            )
+        except Exception as e:
+            self.stats["failed_top_ups"] += 1
+            logger.error("Transfer contract top-up failed: %s", e)
+        finally:
+            with self._lock:
+                self._topping_up = False
+        try:
+            self.refresh()
+        except Exception as e:
+            logger.error("Contract balance refresh failed: %s", e)
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                **self.stats,
+                "balance": self._balance,
+                "committed": self._committed,
+                "headroom": (
+                    self._balance - self._committed
+                    if self._balance is not None
+                    else None
+                ),
+                "low_water": self.low_water,
+                "owner": self._pid == os.getpid() and self.owner,
+                "top_up_amount": self.top_up_amount if self.top_up else 0,
+                "updated_at": self._updated_at or None,
+            }
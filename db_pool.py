@@ -0,0 +1,253 @@
+import os
+import time
+import threading
+import logging
+from collections import deque
+
+import mysql.connector
+from mysql.connector import Error
+
+logger = logging.getLogger(__name__)
+
+
+class PoolTimeout(Error):
+    pass
+
+
+class _PoolEntry:
+    __slots__ = ("raw", "created_at", "last_used")
+
+    def __init__(self, raw):
+        self.raw = raw
+        self.created_at = time.monotonic()
+        self.last_used = self.created_at
+
+
+class _TimedCursor:
+    def __init__(self, cursor, observer):
+        self._cursor = cursor
+        self._observer = observer
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def execute(self, operation, params=None, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return self._cursor.execute(operation, params, *args, **kwargs)
+        finally:
+            self._observer(operation, time.perf_counter() - start)
+
+    def executemany(self, operation, seq_params, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return self._cursor.executemany(operation, seq_params, *args, **kwargs)
+        finally:
+            self._observer(operation, time.perf_counter() - start)
+
+
+class PooledConnection:
+    # Thin handle around a pooled mysql connection. close() hands the
+    # connection back to the pool instead of tearing down the socket, so the
+    # existing endpoint code (cursor/commit/close) works unchanged.
+
+    def __init__(self, pool, entry):
+        self._pool = pool
+        self._entry = entry
+
+    def __getattr__(self, name):
+        if self._entry is None:
+            raise Error("Connection already returned to the pool")
+        return getattr(self._entry.raw, name)
+
+    def cursor(self, *args, **kwargs):
+        cursor = self.__getattr__("cursor")(*args, **kwargs)
+        if self._pool.on_query is None:
+            return cursor
+        return _TimedCursor(cursor, self._pool.on_query)
+
+    def is_connected(self):
+        # The pool validated the connection on checkout; avoid the extra
+        # COM_PING that mysql.connector's is_connected() sends.
+        return self._entry is not None
+
+    def close(self):
+        if self._entry is None:
+            return
+        entry, self._entry = self._entry, None
+        self._pool._release(entry)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class ConnectionPool:
+    def __init__(
+        self,
+        config,
+        size=5,
+        max_age=1800,
+        checkout_timeout=5.0,
+        validate_idle=5.0,
+        on_query=None,
+        on_connect=None,
+    ):
+        self._config = dict(config)
+        self.size = size
+        self.max_age = max_age
+        self.checkout_timeout = checkout_timeout
+        self.validate_idle = validate_idle
+        # Optional timing hooks: on_query(sql, seconds), on_connect(seconds).
+        self.on_query = on_query
+        self.on_connect = on_connect
+        self._cond = threading.Condition()
+        self._reset_state()
+
+    def _reset_state(self):
+        self._pid = os.getpid()
+        self._idle = deque()
+        self._total = 0
+        self._in_use = 0
+        self._stats = {
+            "created": 0,
+            "recycled": 0,
+            "invalidated": 0,
+            "checkouts": 0,
+            "waits": 0,
+            "timeouts": 0,
+            "wait_time_total_ms": 0.0,
+            "wait_time_max_ms": 0.0,
+        }
+
+    def _check_fork(self):
+        # Connections inherited from the gunicorn master share sockets with
+        # every other worker; drop them (without COM_QUIT) and start clean.
+        if os.getpid() != self._pid:
+            logger.info("Pool reset after fork in pid %s", os.getpid())
+            self._reset_state()
+
+    def _connect(self):
+        start = time.perf_counter()
+        raw = mysql.connector.connect(**self._config)
+        if self.on_connect is not None:
+            self.on_connect(time.perf_counter() - start)
+        with self._cond:
+            self._stats["created"] += 1
+        return _PoolEntry(raw)
+
+    def _discard(self, entry, reason):
+        # Also called with the lock held; the condition's RLock allows that.
+        with self._cond:
+            self._stats[reason] += 1
+        try:
+            entry.raw.close()
+        except Exception as e:
+            logger.debug("Error closing pooled connection: %s", e)
+
+    def _is_usable(self, entry):
+        now = time.monotonic()
+        if self.max_age and now - entry.created_at > self.max_age:
+            self._discard(entry, "recycled")
+            return False
+        if now - entry.last_used > self.validate_idle:
+            try:
+                entry.raw.ping(reconnect=False)
+            except Exception as e:
+                logger.info("Dropping stale pooled connection: %s", e)
+                self._discard(entry, "invalidated")
+                return False
+        return True
+
+    def get_connection(self):
+        start = time.monotonic()
+        waited = False
+        with self._cond:
+            self._check_fork()
+            while True:
+                if self._idle:
+                    entry = self._idle.pop()
+                    break
+                if self._total < self.size:
+                    self._total += 1
+                    entry = None
+                    break
+                remaining = self.checkout_timeout - (time.monotonic() - start)
+                if remaining <= 0:
+                    self._stats["timeouts"] += 1
+                    raise PoolTimeout(
+                        f"Timed out after {self.checkout_timeout}s waiting for a DB connection"
+                    )
+                waited = True
+                self._cond.wait(remaining)
+            self._in_use += 1
+            self._stats["checkouts"] += 1
+            if waited:
+                wait_ms = (time.monotonic() - start) * 1000
+                self._stats["waits"] += 1
+                self._stats["wait_time_total_ms"] += wait_ms
+                self._stats["wait_time_max_ms"] = max(
+                    self._stats["wait_time_max_ms"], wait_ms
+                )
+
+        # Validation and connecting happen outside the lock so a slow
+        # handshake doesn't stall other checkouts.
+        try:
+            if entry is not None and not self._is_usable(entry):
+                entry = None
+            if entry is None:
+                entry = self._connect()
+        except Exception:
+            with self._cond:
+                self._total -= 1
+                self._in_use -= 1
+                self._cond.notify()
+            raise
+        return PooledConnection(self, entry)
+
+    def _release(self, entry):
+        if os.getpid() != self._pid:
+            return
+        try:
+            if entry.raw.in_transaction:
+                entry.raw.rollback()
+            reusable = True
+        except Exception:
+            reusable = False
+        with self._cond:
+            self._in_use -= 1
+            if reusable:
+                entry.last_used = time.monotonic()
+                self._idle.append(entry)
+            else:
+                self._total -= 1
+                self._discard(entry, "invalidated")
+            self._cond.notify()
+
+    def stats(self):
+        with self._cond:
+            self._check_fork()
+            stats = dict(self._stats)
+            stats.update(
+                {
+                    "size": self.size,
+                    "open": self._total,
+                    "in_use": self._in_use,
+                    "idle": len(self._idle),
+                    "pid": self._pid,
+                }
+            )
+        if stats["waits"]:
+            stats["wait_time_avg_ms"] = stats["wait_time_total_ms"] / stats["waits"]
+        else:
+            stats["wait_time_avg_ms"] = 0.0
+        return stats
+
+    def close_all(self):
+        with self._cond:
+            while self._idle:
+                entry = self._idle.pop()
+                self._total -= 1
+                self._discard(entry, "recycled")
@@ -0,0 +1,435 @@
+import os
+import time
+import fcntl
+import sqlite3
+import threading
+import logging
+
+from hexbytes import HexBytes
+from eth_utils import event_abi_to_log_topic
+from web3.datastructures import AttributeDict
+from web3._utils.method_formatters import log_entry_formatter
+
+from rpc_provider import batch, to_int
+
+logger = logging.getLogger(__name__)
+
+RANGE_ERRORS = ("range", "too many", "limit", "exceed", "timeout", "timed out")
+
+
+def _hash(value):
+    return HexBytes(value).hex().lower().removeprefix("0x")
+
+
+def _topic(contract, event_name):
+    for entry in contract.abi:
+        if entry.get("type") == "event" and entry.get("name") == event_name:
+            return _hash(event_abi_to_log_topic(entry))
+    raise ValueError(f"{event_name} event missing from the contract ABI")
+
+
+class EventIndexer:
+    # Tails Transfer events from WordHuntNFT and CoinSpent events from the
+    # transfer contract into a local SQLite file, so per-address lookups
+    # never scan logs on the node. Each step asks for one block range with
+    # a single eth_getLogs covering both contracts, batched with the hash
+    # of the range's last block. The range doubles while responses come
+    # back and halves when the node refuses it; after a refusal it never
+    # grows past the halved size again. Progress is checkpointed
+    # in the same transaction as the events, so a restart resumes where
+    # the last one stopped.
+    #
+    # Blocks closer than `confirmations` to the head are left alone. The
+    # hash of every range's last block is kept (the most recent `history`
+    # of them); when the checkpoint's hash no longer matches the chain, the
+    # index is rolled back to the newest kept block that still matches and
+    # re-read from there.
+    #
+    # Only one process per file writes: the first to take the lock file
+    # runs the thread, the other gunicorn workers just read.
+
+    SCHEMA = (
+        "CREATE TABLE IF NOT EXISTS indexer_state ("
+        " name TEXT PRIMARY KEY,"
+        " value INTEGER NOT NULL)",
+        "CREATE TABLE IF NOT EXISTS indexed_blocks ("
+        " number INTEGER PRIMARY KEY,"
+        " hash TEXT NOT NULL)",
+        "CREATE TABLE IF NOT EXISTS nft_transfers ("
+        " block INTEGER NOT NULL,"
+        " log_index INTEGER NOT NULL,"
+        " tx_hash TEXT NOT NULL,"
+        " token_id INTEGER NOT NULL,"
+        " from_addr TEXT NOT NULL,"
+        " to_addr TEXT NOT NULL,"
+        " PRIMARY KEY (block, log_index))",
+        "CREATE INDEX IF NOT EXISTS nft_transfers_token"
+        " ON nft_transfers (token_id, block, log_index)",
+        "CREATE INDEX IF NOT EXISTS nft_transfers_to ON nft_transfers (to_addr)",
+        "CREATE TABLE IF NOT EXISTS coin_spends ("
+        " block INTEGER NOT NULL,"
+        " log_index INTEGER NOT NULL,"
+        " tx_hash TEXT NOT NULL,"
+        " player TEXT NOT NULL,"
+        " amount TEXT NOT NULL,"
+        " item TEXT NOT NULL,"
+        " PRIMARY KEY (block, log_index))",
+        "CREATE INDEX IF NOT EXISTS coin_spends_player"
+        " ON coin_spends (player, block, log_index)",
+    )
+
+    def __init__(
+        self,
+        w3,
+        nft_contract,
+        transfer_contract,
+        path,
+        start_block=None,
+        confirmations=3,
+        chunk_size=2000,
+        min_chunk=1,
+        max_chunk=10000,
+        poll_interval=12.0,
+        history=128,
+    ):
+        self.w3 = w3
+        self.nft_contract = nft_contract
+        self.transfer_contract = transfer_contract
+        self.path = path
+        # First block to read when the file has no checkpoint yet (the
+        # deployment block); None starts at the current head.
+        self.start_block = start_block
+        self.confirmations = confirmations
+        self.chunk_size = chunk_size
+        self.min_chunk = min_chunk
+        self.max_chunk = max_chunk
+        self.poll_interval = poll_interval
+        self.history = history
+        self._events = {
+            (
+                nft_contract.address.lower(),
+                _topic(nft_contract, "Transfer"),
+            ): self._nft_transfer,
+            (
+                transfer_contract.address.lower(),
+                _topic(transfer_contract, "CoinSpent"),
+            ): self._coin_spent,
+        }
+        self._local = threading.local()
+        self._pid = None
+        self._lock_file = None
+        self.writer = False
+        self.head = None
+        self.stats = {
+            "ranges": 0,
+            "logs": 0,
+            "shrunk": 0,
+            "reorgs": 0,
+            "rolled_back": 0,
+            "rpc_errors": 0,
+        }
+
+    def _connection(self):
+        connection = getattr(self._local, "connection", None)
+        if connection is not None and self._local.pid == os.getpid():
+            return connection
+        connection = sqlite3.connect(self.path, timeout=5.0, isolation_level=None)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+        for statement in self.SCHEMA:
+            connection.execute(statement)
+        self._local.connection = connection
+        self._local.pid = os.getpid()
+        return connection
+
+    def ensure_started(self):
+        if self._pid == os.getpid():
+            return
+        self._pid = os.getpid()
+        self.writer = False
+        try:
+            lock_file = open(self.path + ".lock", "w")
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            logger.info("Event index %s is written by another process", self.path)
+            return
+        self._lock_file = lock_file
+        self.writer = True
+        threading.Thread(target=self._run, name="event-indexer", daemon=True).start()
+
+    def _run(self):
+        while True:
+            try:
+                caught_up = self.step()
+            except Exception as e:
+                self.stats["rpc_errors"] += 1
+                logger.error("Event indexer step failed: %s", e)
+                caught_up = True
+            if caught_up:
+                time.sleep(self.poll_interval)
+
+    def checkpoint(self):
+        # The last block whose events are all in the index, or None.
+        row = (
+            self._connection()
+            .execute("SELECT value FROM indexer_state WHERE name = 'next_block'")
+            .fetchone()
+        )
+        return row[0] - 1 if row else None
+
+    def step(self):
+        # Reads one block range; returns True when the index has reached
+        # the confirmed head.
+        checkpoint = self.checkpoint()
+        tip = (
+            self._connection()
+            .execute(
+                "SELECT number, hash FROM indexed_blocks ORDER BY number DESC LIMIT 1"
+            )
+            .fetchone()
+        )
+        calls = [("eth_blockNumber", [])]
+        if tip is not None:
+            calls.append(("eth_getBlockByNumber", [hex(tip[0]), False]))
+        results = batch(self.w3, calls)
+        for result in results:
+            if isinstance(result, Exception):
+                raise result
+        self.head = to_int(results[0])
+        if tip is not None and (
+            results[1] is None or _hash(results[1]["hash"]) != tip[1]
+        ):
+            self._rewind()
+            return False
+        safe = self.head - self.confirmations
+        if checkpoint is None:
+            start = self.start_block if self.start_block is not None else safe
+            checkpoint = start - 1
+        if checkpoint >= safe:
+            return True
+        first = checkpoint + 1
+        last = min(first + self.chunk_size - 1, safe)
+        logs, block = batch(
+            self.w3,
+            [
+                (
+                    "eth_getLogs",
+                    [
+                        {
+                            "fromBlock": hex(first),
+                            "toBlock": hex(last),
+                            "address": [
+                                self.nft_contract.address,
+                                self.transfer_contract.address,
+                            ],
+                            "topics": [["0x" + topic for _, topic in self._events]],
+                        }
+                    ],
+                ),
+                ("eth_getBlockByNumber", [hex(last), False]),
+            ],
+        )
+        if isinstance(logs, Exception):
+            if last > first and any(text in str(logs).lower() for text in RANGE_ERRORS):
+                self.chunk_size = max(self.min_chunk, (last - first + 1) // 2)
+                self.max_chunk = min(self.max_chunk, self.chunk_size)
+                self.stats["shrunk"] += 1
+                logger.info(
+                    "eth_getLogs refused %s blocks (%s), trying %s",
+                    last - first + 1,
+                    logs,
+                    self.chunk_size,
+                )
+                return False
+            raise logs
+        if isinstance(block, Exception):
+            raise block
+        last_hash = _hash(block["hash"])
+        for log in logs:
+            # A log from another fork than the block hash was read from;
+            # try the range again.
+            if to_int(log["blockNumber"]) == last and _hash(log["blockHash"]) != (
+                last_hash
+            ):
+                return False
+        self._store(first, last, last_hash, logs)
+        self.stats["ranges"] += 1
+        self.stats["logs"] += len(logs)
+        if last - first + 1 == self.chunk_size:
+            self.chunk_size = min(self.max_chunk, self.chunk_size * 2)
+        return last >= safe
+
+    def _nft_transfer(self, log):
+        event = self.nft_contract.events.Transfer().process_log(log)
+        return (
+            "INSERT OR REPLACE INTO nft_transfers"
+            " (block, log_index, tx_hash, token_id, from_addr, to_addr)"
+            " VALUES (?, ?, ?, ?, ?, ?)",
+            (
+                event.blockNumber,
+                event.logIndex,
+                "0x" + _hash(event.transactionHash),
+                event.args.tokenId,
+                event.args["from"].lower(),
+                event.args.to.lower(),
+            ),
+        )
+
+    def _coin_spent(self, log):
+        event = self.transfer_contract.events.CoinSpent().process_log(log)
+        return (
+            "INSERT OR REPLACE INTO coin_spends"
+            " (block, log_index, tx_hash, player, amount, item)"
+            " VALUES (?, ?, ?, ?, ?, ?)",
+            (
+                event.blockNumber,
+                event.logIndex,
+                "0x" + _hash(event.transactionHash),
+                event.args.player.lower(),
+                str(event.args.amount),
+                event.args.item,
+            ),
+        )
+
+    def _store(self, first, last, last_hash, logs):
+        statements = []
+        for raw in logs:
+            log = AttributeDict.recursive(log_entry_formatter(dict(raw)))
+            handler = self._events.get(
+                (log["address"].lower(), _hash(log["topics"][0]))
+            )
+            if handler is not None:
+                statements.append(handler(log))
+        connection = self._connection()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            for sql, params in statements:
+                connection.execute(sql, params)
+            connection.execute(
+                "INSERT OR REPLACE INTO indexed_blocks (number, hash) VALUES (?, ?)",
+                (last, last_hash),
+            )
+            connection.execute(
+                "DELETE FROM indexed_blocks WHERE number NOT IN"
+                " (SELECT number FROM indexed_blocks ORDER BY number DESC LIMIT ?)",
+                (self.history,),
+            )
+            connection.execute(
+                "INSERT OR REPLACE INTO indexer_state (name, value)"
+                " VALUES ('next_block', ?)",
+                (last + 1,),
+            )
+            connection.execute("COMMIT")
+        except Exception:
+            connection.execute("ROLLBACK")
+            raise
+
+    def _rewind(self):
+        # Compare every kept block hash with the chain in one batch and roll
+        # back to the newest one that still matches.
+        kept = (
+            self._connection()
+            .execute("SELECT number, hash FROM indexed_blocks ORDER BY number DESC")
+            .fetchall()
+        )
+        results = batch(
+            self.w3,
+            [("eth_getBlockByNumber", [hex(number), False]) for number, _ in kept],
+        )
+        keep = None
+        for (number, block_hash), result in zip(kept, results):
+            if isinstance(result, Exception):
+                raise result
+            if result is not None and _hash(result["hash"]) == block_hash:
+                keep = number
+                break
+        if keep is None:
+            # Deeper than the kept history; trust the block before it.
+            keep = kept[-1][0] - 1
+            logger.error("Reorg deeper than %s kept blocks", len(kept))
+        connection = self._connection()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            rolled_back = 0
+            for table in ("nft_transfers", "coin_spends"):
+                rolled_back += connection.execute(
+                    f"DELETE FROM {table} WHERE block > ?", (keep,)
+                ).rowcount
+            connection.execute("DELETE FROM indexed_blocks WHERE number > ?", (keep,))
+            connection.execute(
+                "INSERT OR REPLACE INTO indexer_state (name, value)"
+                " VALUES ('next_block', ?)",
+                (keep + 1,),
+            )
+            connection.execute("COMMIT")
+        except Exception:
+            connection.execute("ROLLBACK")
+            raise
+        self.stats["reorgs"] += 1
+        self.stats["rolled_back"] += rolled_back
+        logger.warning(
+            "Reorg detected, index rolled back to block %s (%s events removed)",
+            keep,
+            rolled_back,
+        )
+
+    def nfts(self, address):
+        # Tokens whose latest Transfer went to this address.
+        rows = (
+            self._connection()
+            .execute(
+                "SELECT t.token_id, t.block, t.tx_hash FROM nft_transfers t"
+                " WHERE t.to_addr = ? AND NOT EXISTS ("
+                " SELECT 1 FROM nft_transfers later"
+                " WHERE later.token_id = t.token_id AND (later.block > t.block"
+                " OR (later.block = t.block AND later.log_index > t.log_index)))"
+                " ORDER BY t.block, t.log_index",
+                (address.lower(),),
+            )
+            .fetchall()
+        )
+        return [
+            {"token_id": token_id, "block": block, "tx_hash": tx_hash}
+            for token_id, block, tx_hash in rows
+        ]
+
+    def spends(self, address, limit=50, offset=0):
+        # Newest first, plus the count and total over all of them.
+        connection = self._connection()
+        address = address.lower()
+        rows = connection.execute(
+            "SELECT block, tx_hash, amount, item FROM coin_spends WHERE player = ?"
+            " ORDER BY block DESC, log_index DESC LIMIT ? OFFSET ?",
+            (address, limit, offset),
+        ).fetchall()
+        amounts = connection.execute(
+            "SELECT amount FROM coin_spends WHERE player = ?", (address,)
+        ).fetchall()
+        return {
+            "count": len(amounts),
+            "total": sum(int(amount) for amount, in amounts),
+            "spends": [
+                {
+                    "block": block,
+                    "tx_hash": tx_hash,
+                    "amount": int(amount),
+                    "item": item,
+                }
+                for block, tx_hash, amount, item in rows
+            ],
+        }
+
+    def snapshot(self):
+        checkpoint = self.checkpoint()
+        return {
+            **self.stats,
+            "writer": self._pid == os.getpid() and self.writer,
+            "checkpoint": checkpoint,
+            "head": self.head,
+            "lag": (
+                self.head - checkpoint
+                if self.head is not None and checkpoint is not None
+                else None
+            ),
+            "chunk_size": self.chunk_size,
+        }
@@ -0,0 +1,124 @@
+import os
+import time
+import threading
+import logging
+
+from rpc_provider import to_int
+
+logger = logging.getLogger(__name__)
+
+# Reward percentile used for each tier's priority fee.
+TIERS = {"slow": 25, "standard": 50, "fast": 90}
+BUMP_FACTOR = 1.125
+
+
+class FeeOracle:
+    # Keeps EIP-1559 fee suggestions for each tier fresh from eth_feeHistory
+    # on a background thread, so building a transaction reads a cached value
+    # instead of making a fee RPC of its own.
+
+    def __init__(
+        self,
+        w3,
+        refresh_interval=12.0,
+        block_count=10,
+        base_fee_multiplier=2,
+        min_priority_fee=10**9,
+    ):
+        self.w3 = w3
+        self.refresh_interval = refresh_interval
+        self.block_count = block_count
+        self.base_fee_multiplier = base_fee_multiplier
+        self.min_priority_fee = min_priority_fee
+        self._lock = threading.Lock()
+        self._fees = None
+        self._updated_at = 0.0
+        self._pid = None
+
+    def _ensure_worker(self):
+        # Without a w3 the owner keeps the oracle fresh by passing
+        # eth_feeHistory results to refresh() itself (see server_async.py).
+        if self.w3 is None or self._pid == os.getpid():
+            return
+        self._pid = os.getpid()
+        threading.Thread(target=self._run, name="fee-oracle", daemon=True).start()
+
+    def _run(self):
+        while True:
+            time.sleep(self.refresh_interval)
+            try:
+                self.refresh()
+            except Exception as e:
+                logger.error("Fee history refresh failed: %s", e)
+
+    def is_cold(self):
+        with self._lock:
+            return self._fees is None
+
+    def history_params(self):
+        # eth_feeHistory params, for callers that batch the request.
+        return [hex(self.block_count), "latest", list(TIERS.values())]
+
+    def refresh(self, history=None):
+        # `history` is an eth_feeHistory result fetched elsewhere (raw hex
+        # strings are fine); without it the oracle asks the node itself.
+        if history is not None:
+            history = {
+                "baseFeePerGas": [to_int(fee) for fee in history["baseFeePerGas"]],
+                "reward": [
+                    [to_int(reward) for reward in rewards]
+                    for rewards in history.get("reward") or []
+                ],
+            }
+            base_fee = history["baseFeePerGas"][-1]
+        else:
+            try:
+                history = self.w3.eth.fee_history(
+                    self.block_count, "latest", list(TIERS.values())
+                )
+                # The last baseFeePerGas entry is the base fee of the next block.
+                base_fee = history["baseFeePerGas"][-1]
+            except ValueError as e:
+                # Node without eth_feeHistory: price off the latest base fee
+                # and the minimum tip.
+                logger.info("eth_feeHistory unavailable (%s), using latest block", e)
+                history = {}
+                base_fee = self.w3.eth.get_block("latest")["baseFeePerGas"]
+        fees = {}
+        for i, tier in enumerate(TIERS):
+            rewards = sorted(
+                block_rewards[i]
+                for block_rewards in history.get("reward") or []
+                if block_rewards[i] > 0
+            )
+            priority = rewards[len(rewards) // 2] if rewards else 0
+            priority = max(priority, self.min_priority_fee)
+            fees[tier] = {
+                "maxPriorityFeePerGas": priority,
+                "maxFeePerGas": base_fee * self.base_fee_multiplier + priority,
+            }
+        with self._lock:
+            self._fees = fees
+            self._updated_at = time.time()
+        return fees
+
+    def fees(self, tier="standard"):
+        self._ensure_worker()
+        with self._lock:
+            fees = self._fees
+        if fees is None:
+            fees = self.refresh()
+        return dict(fees.get(tier) or fees["standard"])
+
+    def bump(self, tx, tier="fast"):
+        # A replacement must raise both fee caps by at least 10% over the
+        # stuck transaction; also never go below the current market rate.
+        current = self.fees(tier)
+        bumped = dict(tx)
+        for field in ("maxPriorityFeePerGas", "maxFeePerGas"):
+            bumped[field] = max(int(tx[field] * BUMP_FACTOR) + 1, current[field])
+        return bumped
+
+    def snapshot(self):
+        with self._lock:
+            return {"fees": self._fees, "updated_at": self._updated_at}
@@ -0,0 +1,166 @@
+import hmac
+import time
+import base64
+import struct
+import hashlib
+import secrets
+import logging
+
+from grid_engine import COLS, ROWS, WORDS
+
+logger = logging.getLogger(__name__)
+
+CELLS = ROWS * COLS
+# Token layout: category, expiry (unix time) and nonce, one digest per
+# word in WORDS order, then the MAC.
+HEADER = struct.Struct(">BI8s")
+DIGEST_SIZE = 8
+MAC_SIZE = 16
+
+
+def cell_index(row, col):
+    return row * COLS + col
+
+
+def path_key(path):
+    # A word occupies a straight run of cells, so once the path is known to
+    # be straight its two end cells identify it. Checking costs one pass over
+    # the path; the key is orientation-free so reversed selections match too.
+    if not isinstance(path, (list, tuple)) or len(path) < 2:
+        return None
+    try:
+        cells = [(int(row), int(col)) for row, col in path]
+    except (TypeError, ValueError):
+        return None
+    dr = cells[1][0] - cells[0][0]
+    dc = cells[1][1] - cells[0][1]
+    if (dr, dc) == (0, 0) or abs(dr) > 1 or abs(dc) > 1:
+        return None
+    for (r0, c0), (r1, c1) in zip(cells, cells[1:]):
+        if (r1 - r0, c1 - c0) != (dr, dc):
+            return None
+    for row, col in (cells[0], cells[-1]):
+        if not (0 <= row < ROWS and 0 <= col < COLS):
+            return None
+    first, last = cell_index(*cells[0]), cell_index(*cells[-1])
+    return min(first, last) * CELLS + max(first, last)
+
+
+def _path_digest(secret, nonce, key):
+    mac = hmac.new(secret, nonce + struct.pack(">I", key), hashlib.sha256)
+    return mac.digest()[:DIGEST_SIZE]
+
+
+def derive_secret(private_key):
+    # A session key every worker can compute from configuration it already
+    # shares, without exposing the payout key it comes from.
+    return hmac.new(
+        private_key.encode(), b"wordhunt-game-sessions", hashlib.sha256
+    ).digest()
+
+
+class GameSession:
+    # One issued grid, as read back from its token. Each word's placement is
+    # only known as a keyed digest of its path key, so the token doesn't
+    # give the answers away.
+    __slots__ = ("id", "category", "expires", "_secret", "_nonce", "_digests")
+
+    def __init__(self, secret, nonce, category, expires, digests):
+        self.id = nonce.hex()
+        self.category = category
+        self.expires = expires
+        self._secret = secret
+        self._nonce = nonce
+        self._digests = digests
+
+    def word_index(self, path):
+        key = path_key(path)
+        if key is None:
+            return None
+        digest = _path_digest(self._secret, self._nonce, key)
+        for index, expected in enumerate(self._digests):
+            if hmac.compare_digest(digest, expected):
+                return index
+        return None
+
+    def points(self, paths):
+        # The number of different words among the paths the player found.
+        if not isinstance(paths, list):
+            return 0
+        found = set()
+        for path in paths[: 2 * len(self._digests)]:
+            index = self.word_index(path)
+            if index is not None:
+                found.add(index)
+        return len(found)
+
+
+class SessionStore:
+    # Issued grids as signed tokens rather than server-side state: the token
+    # holds the category, the expiry and a digest per word placement, with an
+    # HMAC over all of it, so any worker holding the secret can check finds
+    # for a grid another one issued. Nothing is kept per session. Points are
+    # counted when the game is claimed, from the paths the player found;
+    # making sure a session is only paid once is up to the caller, which
+    # records the session id in the shared ledger (claim_game).
+
+    def __init__(self, secret, ttl=900.0):
+        self._secret = secret if isinstance(secret, bytes) else secret.encode()
+        self.ttl = ttl
+        self.stats = {"created": 0, "expired": 0, "rejected": 0}
+
+    def create(self, puzzle):
+        nonce = secrets.token_bytes(8)
+        category = puzzle["category"]
+        expires = int(time.time() + self.ttl)
+        keys = {
+            placement["word"]: path_key(placement["positions"])
+            for placement in puzzle["positions"]
+        }
+        payload = HEADER.pack(category, expires, nonce) + b"".join(
+            _path_digest(self._secret, nonce, keys[word]) for word in WORDS[category]
+        )
+        mac = hmac.new(self._secret, payload, hashlib.sha256).digest()[:MAC_SIZE]
+        self.stats["created"] += 1
+        return base64.urlsafe_b64encode(payload + mac).rstrip(b"=").decode()
+
+    def get(self, session_id):
+        # The session, or None when the token is malformed, forged or expired.
+        if not isinstance(session_id, str):
+            self.stats["rejected"] += 1
+            return None
+        try:
+            raw = base64.urlsafe_b64decode(session_id + "=" * (-len(session_id) % 4))
+        except (TypeError, ValueError):
+            raw = b""
+        payload, mac = raw[:-MAC_SIZE], raw[-MAC_SIZE:]
+        expected = hmac.new(self._secret, payload, hashlib.sha256).digest()[:MAC_SIZE]
+        if len(payload) < HEADER.size or not hmac.compare_digest(mac, expected):
+            self.stats["rejected"] += 1
+            return None
+        category, expires, nonce = HEADER.unpack_from(payload)
+        if expires <= time.time():
+            self.stats["expired"] += 1
+            return None
+        digests = payload[HEADER.size :]
+        return GameSession(
+            self._secret,
+            nonce,
+            category,
+            expires,
+            [digests[i : i + DIGEST_SIZE] for i in range(0, len(digests), DIGEST_SIZE)],
+        )
+
+    def submit(self, session_id, path):
+        # Returns the found word or None; raises KeyError for unknown or
+        # expired sessions.
+        session = self.get(session_id)
+        if session is None:
+            raise KeyError(session_id)
+        word_index = session.word_index(path)
+        if word_index is None:
+            return None
+        return WORDS[session.category][word_index]
+
+    def snapshot(self):
+        return {**self.stats, "ttl": self.ttl}
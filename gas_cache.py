@@ -0,0 +1,81 @@
+import time
+import threading
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def arg_shape(value):
+    # Arguments that encode to the same calldata layout cost (nearly) the
+    # same gas; strings are bucketed by the number of 32-byte words they use.
+    if isinstance(value, str):
+        if value.startswith("0x") and len(value) == 42:
+            return "address"
+        return ("string", (len(value.encode()) + 31) // 32)
+    if isinstance(value, bytes):
+        return ("bytes", (len(value) + 31) // 32)
+    if isinstance(value, (list, tuple)):
+        return ("array", len(value), tuple(arg_shape(item) for item in value[:1]))
+    return type(value).__name__
+
+
+class GasEstimateCache:
+    def __init__(self, ttl=600.0, margin=0.2, max_entries=256):
+        self.ttl = ttl
+        self.margin = margin
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries = {}
+        self.stats = {"hits": 0, "misses": 0, "invalidations": 0}
+
+    def key_for(self, contract_fn):
+        return (
+            contract_fn.address,
+            contract_fn.fn_name,
+            tuple(arg_shape(arg) for arg in contract_fn.args),
+        )
+
+    def lookup(self, contract_fn):
+        # Returns (gas limit or None on a miss, key)
+        key = self.key_for(contract_fn)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and time.monotonic() - entry[1] < self.ttl:
+                self.stats["hits"] += 1
+                return self._with_margin(entry[0]), key
+            self.stats["misses"] += 1
+        return None, key
+
+    def store(self, key, estimate):
+        with self._lock:
+            if key not in self._entries and len(self._entries) >= self.max_entries:
+                oldest = min(self._entries, key=lambda k: self._entries[k][1])
+                del self._entries[oldest]
+            self._entries[key] = (estimate, time.monotonic())
+        return self._with_margin(estimate)
+
+    def _with_margin(self, estimate):
+        return int(estimate * (1 + self.margin))
+
+    def invalidate(self, key):
+        with self._lock:
+            if self._entries.pop(key, None) is not None:
+                self.stats["invalidations"] += 1
+
+    def check_receipt(self, key, gas_limit, receipt):
+        # A failed transaction that burned its whole gas limit ran out of
+        # gas: the cached estimate is too low for these arguments.
+        if receipt.status == 0 and receipt.gasUsed >= gas_limit:
+            logger.error("Out of gas with cached estimate for %s, invalidating", key[1])
+            self.invalidate(key)
+            return True
+        return False
+
+    def snapshot(self):
+        with self._lock:
+            lookups = self.stats["hits"] + self.stats["misses"]
+            return {
+                **self.stats,
+                "entries": len(self._entries),
+                "hit_ratio": self.stats["hits"] / lookups if lookups else 0.0,
+            }
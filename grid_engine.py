@@ -0,0 +1,210 @@
+import os
+import threading
+import logging
+from collections import deque
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+ROWS, COLS = 11, 15
+
+# Same order and contents as the `words` array in script.js; the category
+# index is the id of the matching .choice element in index.html.
+CATEGORIES = [
+    "Animation",
+    "Cricket",
+    "Entertainment",
+    "Fiction",
+    "Movie",
+    "Music",
+    "Nature",
+    "Science",
+    "Technology",
+]
+# fmt: off
+WORDS = [
+    ["TOONIX", "SKETCHY", "FRAMEUP", "ANIMATE", "DOODLES", "CELLART", "MOTION", "PIXEL", "CARTOON", "FLASHIT"],
+    ["BATTING", "BOWLING", "WICKETS", "STUMPED", "RUNOUTS", "FIELD", "SPINNER", "CREASE", "UMPIRE", "GOOGLY"],
+    ["SHOWSIP", "GIGGLES", "DRAMATE", "FUNFEST", "LAUGHING", "PLAYFUL", "STARLIT", "JOKESON", "GLAMOUR", "THRILLER"],
+    ["NOVELS", "STORIES", "FANTASY", "MYSTICS", "LEGENDS", "FABLES", "TALESPIN", "IMAGINE", "MYTHICAL", "DREAMER"],
+    ["CINEMA", "FRAMES", "REELSUP", "SCREEN", "FILMING", "CLAPPER", "POPCORN", "DIRECTS", "SCENES", "TICKET"],
+    ["MELODIC", "RHYTHMS", "TUNESUP", "HARMONI", "BEATS", "LYRICS", "CHORDS", "SINGERS", "NOTATED", "JUKEBOX"],
+    ["FOREST", "RIVERS", "MOUNTAIN", "OCEANS", "WILDIFE", "MEADOW", "SUNSETS", "FLORAL", "BREEZE", "EARTH"],
+    ["ATOMS", "PHYSICS", "CHEMIST", "BIOLOGY", "RESEARCH", "LABWORK", "THEORY", "EXPERIMENT", "SCIENCE", "PROTONS"],
+    ["GADGETS", "CIRCUITS", "SOFTWARE", "HARDWARE", "CODING", "TECHBIT", "INNOVATE", "DIGITAL", "NETWORK", "ROBOTS"],
+]
+# fmt: on
+
+# (row step, column step) for the six directions of `dir` in script.js:
+# left to right, right to left, top down, bottom up, down-right, up-right.
+DIRECTIONS = [(0, 1), (0, -1), (1, 0), (-1, 0), (1, 1), (-1, 1)]
+
+
+def category_index(value):
+    # Accepts the numeric id used by the front end or the category name.
+    if value is None:
+        raise ValueError("category is required")
+    value = str(value).strip()
+    if value.isdigit():
+        index = int(value)
+        if 0 <= index < len(CATEGORIES):
+            return index
+    else:
+        for index, name in enumerate(CATEGORIES):
+            if name.lower() == value.lower():
+                return index
+    raise ValueError(f"Unknown category: {value}")
+
+
+class GridEngine:
+    # Places words by computing, for every direction at once, the mask of
+    # start cells where the whole word lands on free cells, then picking one
+    # of those starts at random. Longest words go first since they have the
+    # fewest legal placements. Nothing is retried blindly; the only restart
+    # is the rare case where an earlier choice leaves no room at all.
+    #
+    # Generators aren't thread-safe, so every thread (request threads and the
+    # pool's refill thread) draws from its own, spawned from one seed.
+
+    def __init__(self, rows=ROWS, cols=COLS, max_restarts=50, seed=None):
+        self.rows = rows
+        self.cols = cols
+        self.max_restarts = max_restarts
+        self.reseed(seed)
+
+    def reseed(self, seed=None):
+        self._seed = np.random.SeedSequence(seed)
+        self._seed_lock = threading.Lock()
+        self._local = threading.local()
+
+    @property
+    def rng(self):
+        rng = getattr(self._local, "rng", None)
+        if rng is None:
+            with self._seed_lock:
+                (child,) = self._seed.spawn(1)
+            rng = self._local.rng = np.random.default_rng(child)
+        return rng
+
+    def _start_masks(self, free, length):
+        # masks[d, r, c] is True when the word fits starting at (r, c) going
+        # in DIRECTIONS[d].
+        masks = np.zeros((len(DIRECTIONS), self.rows, self.cols), dtype=bool)
+        for d, (dr, dc) in enumerate(DIRECTIONS):
+            end_r, end_c = dr * (length - 1), dc * (length - 1)
+            r0, r1 = max(0, -end_r), self.rows - max(0, end_r)
+            c0, c1 = max(0, -end_c), self.cols - max(0, end_c)
+            if r0 >= r1 or c0 >= c1:
+                continue
+            mask = free[r0:r1, c0:c1].copy()
+            for j in range(1, length):
+                mask &= free[
+                    r0 + j * dr : r1 + j * dr,
+                    c0 + j * dc : c1 + j * dc,
+                ]
+            masks[d, r0:r1, c0:c1] = mask
+        return masks
+
+    def _place_all(self, words):
+        letters = np.zeros((self.rows, self.cols), dtype=np.uint8)
+        positions = {}
+        for word in sorted(words, key=len, reverse=True):
+            candidates = np.flatnonzero(self._start_masks(letters == 0, len(word)))
+            if candidates.size == 0:
+                return None, None
+            d, r, c = np.unravel_index(
+                candidates[self.rng.integers(candidates.size)],
+                (len(DIRECTIONS), self.rows, self.cols),
+            )
+            dr, dc = DIRECTIONS[d]
+            steps = np.arange(len(word))
+            rows, cols = r + steps * dr, c + steps * dc
+            letters[rows, cols] = np.frombuffer(word.encode(), dtype=np.uint8)
+            positions[word] = np.stack([rows, cols], axis=1).tolist()
+        return letters, positions
+
+    def generate(self, category):
+        words = WORDS[category]
+        for _ in range(self.max_restarts):
+            letters, positions = self._place_all(words)
+            if letters is not None:
+                break
+        else:
+            raise RuntimeError(f"Could not place words for category {category}")
+        empty = letters == 0
+        letters[empty] = self.rng.integers(65, 91, size=int(empty.sum()))
+        return {
+            "category": category,
+            "name": CATEGORIES[category],
+            "words": list(words),
+            "grid": [row.tobytes().decode() for row in letters],
+            "positions": [
+                {"word": word, "positions": positions[word]} for word in words
+            ],
+        }
+
+
+class PuzzlePool:
+    # Keeps up to `size` ready puzzles per category in a ring buffer that a
+    # background thread tops up; take() is a pop and only generates inline
+    # when the pool for that category is empty.
+
+    def __init__(self, engine, size=16):
+        self.engine = engine
+        self.size = size
+        self._cond = threading.Condition()
+        self._pools = {}
+        self._pid = None
+        self.stats = {"hits": 0, "misses": 0, "generated": 0}
+
+    def _ensure_worker(self):
+        if self._pid == os.getpid():
+            return
+        self._pid = os.getpid()
+        # A forked worker gets its own random stream and its own puzzles.
+        self.engine.reseed()
+        self._pools = {
+            category: deque(maxlen=self.size) for category in range(len(CATEGORIES))
+        }
+        threading.Thread(target=self._run, name="puzzle-pool", daemon=True).start()
+
+    def take(self, category):
+        with self._cond:
+            self._ensure_worker()
+            pool = self._pools[category]
+            puzzle = pool.popleft() if pool else None
+            self._cond.notify()
+        if puzzle is not None:
+            self.stats["hits"] += 1
+            return puzzle
+        self.stats["misses"] += 1
+        return self.engine.generate(category)
+
+    def _next_to_fill(self):
+        with self._cond:
+            while True:
+                category = min(self._pools, key=lambda c: len(self._pools[c]))
+                if len(self._pools[category]) < self.size:
+                    return category
+                self._cond.wait()
+
+    def _run(self):
+        while True:
+            category = self._next_to_fill()
+            try:
+                puzzle = self.engine.generate(category)
+            except Exception as e:
+                logger.error("Puzzle generation failed for %s: %s", category, e)
+                continue
+            with self._cond:
+                self._pools[category].append(puzzle)
+            self.stats["generated"] += 1
+
+    def snapshot(self):
+        with self._cond:
+            ready = {
+                CATEGORIES[category]: len(pool)
+                for category, pool in self._pools.items()
+            }
+        return {**self.stats, "size": self.size, "ready": ready}
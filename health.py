@@ -0,0 +1,72 @@
+import os
+import time
+import threading
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class HealthChecker:
+    # Runs dependency checks (RPC node, database) on a background thread so
+    # neither import nor a request ever blocks on a remote service. The
+    # thread is started lazily in whichever process asks first.
+
+    def __init__(self, checks, interval=30.0):
+        self.checks = checks
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._results = {}
+        self._pid = None
+        self.started_at = time.time()
+
+    def ensure_started(self):
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._results = {}
+        threading.Thread(target=self._run, name="health-checker", daemon=True).start()
+
+    def _run(self):
+        while True:
+            self.run_checks()
+            time.sleep(self.interval)
+
+    def run_checks(self):
+        for name, check in self.checks.items():
+            start = time.perf_counter()
+            try:
+                ok = bool(check())
+                error = None if ok else "check returned false"
+            except Exception as e:
+                ok, error = False, str(e)
+            result = {
+                "ok": ok,
+                "error": error,
+                "latency_ms": round((time.perf_counter() - start) * 1000, 1),
+                "checked_at": time.time(),
+            }
+            with self._lock:
+                previous = self._results.get(name)
+                self._results[name] = result
+            if previous is None or previous["ok"] != ok:
+                if ok:
+                    logger.info("Health check %s passed", name)
+                else:
+                    logger.error("Health check %s failed: %s", name, error)
+
+    def status(self):
+        self.ensure_started()
+        with self._lock:
+            results = dict(self._results)
+        ready = len(results) == len(self.checks) and all(
+            result["ok"] for result in results.values()
+        )
+        return {
+            "ready": ready,
+            "checks": results,
+            "uptime": round(time.time() - self.started_at, 1),
+            "pid": os.getpid(),
+        }
@@ -0,0 +1,136 @@
+import os
+import time
+import threading
+import logging
+
+from sortedcontainers import SortedList
+
+logger = logging.getLogger(__name__)
+
+
+class Leaderboard:
+    # Balances ordered by (-balance, address) in a SortedList, plus an
+    # address -> balance dict, so top-N, rank lookups and updates are all
+    # O(log n). The routes that write balances call update(); the whole
+    # index is rebuilt from the ledger when a worker starts and then every
+    # refresh_interval seconds, which also picks up writes made by other
+    # gunicorn workers. Players with a zero balance are not ranked.
+
+    def __init__(self, loader, refresh_interval=300.0):
+        # loader() returns an iterable of (address, balance) rows.
+        self.loader = loader
+        self.refresh_interval = refresh_interval
+        self._lock = threading.Lock()
+        self._pid = None
+        self._reset()
+
+    def _reset(self):
+        self._order = SortedList()
+        self._balances = {}
+        # Updates made while a rebuild is reading the ledger; they are newer
+        # than the rows it returns.
+        self._loading = None
+        self.loaded_at = None
+        self.stats = {"loads": 0, "failed_loads": 0, "updates": 0}
+
+    def ensure_started(self):
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._reset()
+        threading.Thread(target=self._run, name="leaderboard", daemon=True).start()
+
+    def _run(self):
+        while True:
+            try:
+                self.load()
+            except Exception as e:
+                self.stats["failed_loads"] += 1
+                logger.error("Leaderboard rebuild failed: %s", e)
+            time.sleep(self.refresh_interval)
+
+    def load(self):
+        with self._lock:
+            self._loading = {}
+        try:
+            balances = {}
+            for address, balance in self.loader():
+                if balance > 0:
+                    balances[address.lower()] = balance
+        except Exception:
+            with self._lock:
+                self._loading = None
+            raise
+        # Sorting happens outside the lock; only the updates that arrived
+        # meanwhile are replayed under it.
+        order = SortedList((-balance, address) for address, balance in balances.items())
+        with self._lock:
+            for address, balance in self._loading.items():
+                self._apply(balances, order, address, balance)
+            self._loading = None
+            self._balances, self._order = balances, order
+            self.loaded_at = time.time()
+        self.stats["loads"] += 1
+        logger.info("Leaderboard rebuilt with %s players", len(order))
+        return len(order)
+
+    @property
+    def ready(self):
+        return self.loaded_at is not None
+
+    @staticmethod
+    def _apply(balances, order, address, balance):
+        previous = balances.pop(address, None)
+        if previous is not None:
+            order.remove((-previous, address))
+        if balance > 0:
+            balances[address] = balance
+            order.add((-balance, address))
+
+    def update(self, address, balance):
+        address = address.lower()
+        with self._lock:
+            if self._loading is not None:
+                self._loading[address] = balance
+            self._apply(self._balances, self._order, address, balance)
+            self.stats["updates"] += 1
+
+    def top(self, limit=10, offset=0):
+        with self._lock:
+            entries = self._order.islice(offset, offset + limit)
+            return [
+                {"rank": self._rank_locked(-key), "address": address, "balance": -key}
+                for key, address in entries
+            ]
+
+    def _rank_locked(self, balance):
+        # Competition ranking: players on the same balance share a rank.
+        return self._order.bisect_left((-balance, "")) + 1
+
+    def rank(self, address):
+        address = address.lower()
+        with self._lock:
+            balance = self._balances.get(address)
+            if balance is None:
+                return None
+            return {
+                "rank": self._rank_locked(balance),
+                "address": address,
+                "balance": balance,
+                "players": len(self._order),
+            }
+
+    def __len__(self):
+        return len(self._order)
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                **self.stats,
+                "players": len(self._order),
+                "loaded_at": self.loaded_at,
+                "refresh_interval": self.refresh_interval,
+            }
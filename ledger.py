@@ -0,0 +1,323 @@
+import os
+import time
+import sqlite3
+import threading
+import logging
+
+logger = logging.getLogger(__name__)
+
+# The token table (accNo -> balance) behind one interface:
+#
+#   get_or_create(address)   balance, inserting a 0 row for a new address
+#   increment(address, n)    atomic add (creating the row), new balance
+#   increment_many(items)    [(address, n), ...] applied in one transaction
+#   reset(address)           balance back to 0 after a payout
+#   take(address)            balance, set to 0 in the same transaction
+#   balances()               (address, balance) for every positive balance
+#   claim_game(id, expires)  records a game session as paid; False if it
+#                            already was
+#   release_game(id)         undoes claim_game() after a failed payout
+#   ping()                   health check
+#   stats()                  for /debug/db-pool
+#
+# MySQLLedger runs on the shared ConnectionPool (TiDB in production);
+# SQLiteLedger keeps the table in a local WAL-mode file for single-node
+# deployments and benchmarks.
+#
+# Claimed sessions go in a game_claim table, created on first use. Rows
+# are only needed until the session token expires; each process deletes
+# expired ones at most every CLAIM_PURGE_INTERVAL seconds.
+
+CLAIM_PURGE_INTERVAL = 600
+CLAIM_SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS game_claim ("
+    " session_id VARCHAR(32) PRIMARY KEY,"
+    " expires BIGINT NOT NULL)"
+)
+
+
+class MySQLLedger:
+    def __init__(self, pool):
+        self.pool = pool
+        self._claims_ready = False
+        self._purged_at = 0.0
+
+    def _run(self, statements, fetch=False):
+        # statements: [(sql, params), ...] in one transaction; returns the
+        # first column of the last statement's first row when fetch is set.
+        connection = self.pool.get_connection()
+        try:
+            cursor = connection.cursor()
+            try:
+                for sql, params in statements:
+                    cursor.execute(sql, params)
+                row = cursor.fetchone() if fetch else None
+                connection.commit()
+            finally:
+                cursor.close()
+            return row[0] if row else None
+        finally:
+            connection.close()
+
+    def get_or_create(self, address):
+        balance = self._run(
+            [("SELECT balance FROM token WHERE accNo = %s", (address,))], fetch=True
+        )
+        if balance is not None:
+            return balance
+        self._run(
+            [
+                (
+                    "INSERT IGNORE INTO token (accNo, balance) VALUES (%s, %s)",
+                    (address, 0),
+                )
+            ]
+        )
+        return 0
+
+    def increment(self, address, amount):
+        return self._run(
+            [
+                (
+                    "INSERT INTO token (accNo, balance) VALUES (%s, %s)"
+                    " ON DUPLICATE KEY UPDATE balance = balance + VALUES(balance)",
+                    (address, amount),
+                ),
+                ("SELECT balance FROM token WHERE accNo = %s", (address,)),
+            ],
+            fetch=True,
+        )
+
+    def increment_many(self, items):
+        items = list(items)
+        if not items:
+            return
+        placeholders = ", ".join(["(%s, %s)"] * len(items))
+        self._run(
+            [
+                (
+                    "INSERT INTO token (accNo, balance) VALUES "
+                    + placeholders
+                    + " ON DUPLICATE KEY UPDATE balance = balance + VALUES(balance)",
+                    [value for row in items for value in row],
+                )
+            ]
+        )
+
+    def reset(self, address):
+        self._run([("UPDATE token SET balance = %s WHERE accNo = %s", (0, address))])
+
+    def take(self, address):
+        connection = self.pool.get_connection()
+        try:
+            cursor = connection.cursor()
+            try:
+                cursor.execute(
+                    "SELECT balance FROM token WHERE accNo = %s FOR UPDATE", (address,)
+                )
+                row = cursor.fetchone()
+                balance = row[0] if row else 0
+                if balance:
+                    cursor.execute(
+                        "UPDATE token SET balance = %s WHERE accNo = %s", (0, address)
+                    )
+                connection.commit()
+            finally:
+                cursor.close()
+            return balance
+        finally:
+            connection.close()
+
+    def claim_game(self, session_id, expires):
+        statements = []
+        if not self._claims_ready:
+            statements.append((CLAIM_SCHEMA, ()))
+        now = time.time()
+        purge = now - self._purged_at > CLAIM_PURGE_INTERVAL
+        if purge:
+            statements.append(("DELETE FROM game_claim WHERE expires < %s", (now,)))
+        statements.append(
+            (
+                "INSERT IGNORE INTO game_claim (session_id, expires) VALUES (%s, %s)",
+                (session_id, expires),
+            )
+        )
+        connection = self.pool.get_connection()
+        try:
+            cursor = connection.cursor()
+            try:
+                for sql, params in statements:
+                    cursor.execute(sql, params)
+                claimed = cursor.rowcount == 1
+                connection.commit()
+            finally:
+                cursor.close()
+        finally:
+            connection.close()
+        self._claims_ready = True
+        if purge:
+            self._purged_at = now
+        return claimed
+
+    def release_game(self, session_id):
+        self._run([("DELETE FROM game_claim WHERE session_id = %s", (session_id,))])
+
+    def balances(self):
+        connection = self.pool.get_connection()
+        try:
+            cursor = connection.cursor()
+            try:
+                cursor.execute("SELECT accNo, balance FROM token WHERE balance > 0")
+                return cursor.fetchall()
+            finally:
+                cursor.close()
+        finally:
+            connection.close()
+
+    def ping(self):
+        self._run([("SELECT 1", ())], fetch=True)
+        return True
+
+    def stats(self):
+        return {"backend": "mysql", **self.pool.stats()}
+
+
+class SQLiteLedger:
+    # One connection per thread (reopened after a fork), WAL journal so
+    # readers never wait for the writer, synchronous=NORMAL so a commit is
+    # a WAL append rather than an fsync. Increments are single UPSERT ...
+    # RETURNING statements, so they need no explicit transaction.
+
+    SCHEMA = (
+        "CREATE TABLE IF NOT EXISTS token ("
+        " accNo VARCHAR(42) PRIMARY KEY,"
+        " balance BIGINT NOT NULL DEFAULT 0)"
+    )
+
+    def __init__(self, path, busy_timeout=5.0, on_query=None):
+        self.path = path
+        self.busy_timeout = busy_timeout
+        # Optional timing hook: on_query(sql, seconds).
+        self.on_query = on_query
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._connections = 0
+        self._purged_at = 0.0
+
+    def _connection(self):
+        connection = getattr(self._local, "connection", None)
+        if connection is not None and self._local.pid == os.getpid():
+            return connection
+        connection = sqlite3.connect(
+            self.path, timeout=self.busy_timeout, isolation_level=None
+        )
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+        connection.execute(self.SCHEMA)
+        connection.execute(CLAIM_SCHEMA)
+        self._local.connection = connection
+        self._local.pid = os.getpid()
+        with self._lock:
+            self._connections += 1
+        return connection
+
+    def _execute(self, sql, params=()):
+        start = time.perf_counter()
+        try:
+            return self._connection().execute(sql, params)
+        finally:
+            if self.on_query is not None:
+                self.on_query(sql, time.perf_counter() - start)
+
+    def get_or_create(self, address):
+        row = self._execute(
+            "SELECT balance FROM token WHERE accNo = ?", (address,)
+        ).fetchone()
+        if row is not None:
+            return row[0]
+        self._execute(
+            "INSERT OR IGNORE INTO token (accNo, balance) VALUES (?, ?)", (address, 0)
+        )
+        return 0
+
+    def increment(self, address, amount):
+        return self._execute(
+            "INSERT INTO token (accNo, balance) VALUES (?, ?)"
+            " ON CONFLICT(accNo) DO UPDATE SET balance = balance + excluded.balance"
+            " RETURNING balance",
+            (address, amount),
+        ).fetchall()[0][0]
+
+    def increment_many(self, items):
+        items = list(items)
+        if not items:
+            return
+        connection = self._connection()
+        start = time.perf_counter()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            connection.executemany(
+                "INSERT INTO token (accNo, balance) VALUES (?, ?)"
+                " ON CONFLICT(accNo) DO UPDATE SET balance = balance + excluded.balance",
+                items,
+            )
+            connection.execute("COMMIT")
+        except Exception:
+            connection.execute("ROLLBACK")
+            raise
+        finally:
+            if self.on_query is not None:
+                self.on_query("INSERT INTO token", time.perf_counter() - start)
+
+    def reset(self, address):
+        self._execute("UPDATE token SET balance = ? WHERE accNo = ?", (0, address))
+
+    def take(self, address):
+        connection = self._connection()
+        start = time.perf_counter()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            row = connection.execute(
+                "SELECT balance FROM token WHERE accNo = ?", (address,)
+            ).fetchone()
+            balance = row[0] if row else 0
+            if balance:
+                connection.execute(
+                    "UPDATE token SET balance = ? WHERE accNo = ?", (0, address)
+                )
+            connection.execute("COMMIT")
+        except Exception:
+            connection.execute("ROLLBACK")
+            raise
+        finally:
+            if self.on_query is not None:
+                self.on_query("UPDATE token", time.perf_counter() - start)
+        return balance
+
+    def claim_game(self, session_id, expires):
+        now = time.time()
+        if now - self._purged_at > CLAIM_PURGE_INTERVAL:
+            self._purged_at = now
+            self._execute("DELETE FROM game_claim WHERE expires < ?", (now,))
+        cursor = self._execute(
+            "INSERT OR IGNORE INTO game_claim (session_id, expires) VALUES (?, ?)",
+            (session_id, expires),
+        )
+        return cursor.rowcount == 1
+
+    def release_game(self, session_id):
+        self._execute("DELETE FROM game_claim WHERE session_id = ?", (session_id,))
+
+    def balances(self):
+        return self._execute(
+            "SELECT accNo, balance FROM token WHERE balance > 0"
+        ).fetchall()
+
+    def ping(self):
+        self._execute("SELECT 1").fetchone()
+        return True
+
+    def stats(self):
+        with self._lock:
+            connections = self._connections
+        return {"backend": "sqlite", "path": self.path, "connections": connections}
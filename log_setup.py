@@ -0,0 +1,116 @@
+import os
+import sys
+import atexit
+import queue
+import random
+import logging
+import threading
+from logging.handlers import QueueHandler, QueueListener
+
+from flask import has_request_context, request
+
+LOG_FORMAT = "%(levelname)s:%(name)s:%(message)s"
+
+
+def parse_mapping(value, convert):
+    # "serve_static=0.01,get_balance=0.1" -> {"serve_static": 0.01, ...}
+    mapping = {}
+    for item in (value or "").split(","):
+        if "=" in item:
+            key, raw = item.split("=", 1)
+            mapping[key.strip()] = convert(raw.strip())
+    return mapping
+
+
+def parse_level(name):
+    # "debug" -> logging.DEBUG; unknown names fail at startup instead of
+    # reaching RouteFilter as strings.
+    level = logging.getLevelName(name.upper())
+    if not isinstance(level, int):
+        raise ValueError(f"Unknown log level {name!r}")
+    return level
+
+
+def _current_endpoint():
+    if has_request_context():
+        return request.endpoint
+    return None
+
+
+class RouteFilter(logging.Filter):
+    # Runs on the request thread before a record is queued: drops records
+    # below the route's level and keeps only a sample of the chatty
+    # sub-WARNING messages from high-volume routes.
+
+    def __init__(self, route_levels=None, sample_rates=None):
+        super().__init__()
+        self.route_levels = route_levels or {}
+        self.sample_rates = sample_rates or {}
+
+    def filter(self, record):
+        endpoint = _current_endpoint()
+        if endpoint is None:
+            return True
+        level = self.route_levels.get(endpoint)
+        if level is not None and record.levelno < level:
+            return False
+        rate = self.sample_rates.get(endpoint)
+        if rate is not None and record.levelno < logging.WARNING:
+            return random.random() < rate
+        return True
+
+
+class BackgroundQueueHandler(QueueHandler):
+    # Hands records to a writer thread, which formats and writes the line,
+    # so the request thread only pays for the filter and the queue put.
+    # Records go through as they are: log arguments must not be changed
+    # after the call. The listener is (re)started lazily so it also runs in
+    # gunicorn workers forked after configuration.
+
+    def __init__(self, target, maxsize=10000):
+        super().__init__(queue.Queue(maxsize))
+        self.target = target
+        self.dropped = 0
+        self._listener = None
+        self._pid = None
+        self._start_lock = threading.Lock()
+
+    def _ensure_listener(self):
+        if self._pid == os.getpid():
+            return
+        with self._start_lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._listener = QueueListener(
+                self.queue, self.target, respect_handler_level=True
+            )
+            self._listener.start()
+
+    def prepare(self, record):
+        return record
+
+    def enqueue(self, record):
+        self._ensure_listener()
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def stop(self):
+        if self._listener and self._pid == os.getpid():
+            self._listener.stop()
+
+
+def configure_logging(level="INFO", route_levels=None, sample_rates=None):
+    target = logging.StreamHandler(sys.stderr)
+    target.setFormatter(logging.Formatter(LOG_FORMAT))
+    handler = BackgroundQueueHandler(target)
+    handler.addFilter(RouteFilter(route_levels, sample_rates))
+    root = logging.getLogger()
+    for existing in list(root.handlers):
+        root.removeHandler(existing)
+    root.addHandler(handler)
+    root.setLevel(level)
+    atexit.register(handler.stop)
+    return handler
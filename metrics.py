@@ -0,0 +1,325 @@
+import os
+import json
+import time
+import threading
+import logging
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BUCKETS = (
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    30.0,
+    60.0,
+    120.0,
+    300.0,
+)
+
+
+class Metric:
+    kind = None
+
+    def __init__(self, registry, name, help_text, labels=()):
+        self.registry = registry
+        self.name = name
+        self.help = help_text
+        self.labels = tuple(labels)
+        self._values = {}
+
+    def _key(self, labels):
+        return tuple(str(labels.get(label, "")) for label in self.labels)
+
+    def dump(self):
+        with self.registry.lock:
+            return [[list(key), value] for key, value in self._values.items()]
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self.registry.lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(Metric):
+    kind = "gauge"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self.registry.lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+    def set(self, value, **labels):
+        with self.registry.lock:
+            self._values[self._key(labels)] = value
+
+    @contextmanager
+    def track(self, **labels):
+        self.inc(**labels)
+        try:
+            yield
+        finally:
+            self.dec(**labels)
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, registry, name, help_text, labels=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(registry, name, help_text, labels)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self.registry.lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [[0] * len(self.buckets), 0, 0.0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    entry[0][i] += 1
+                    break
+            entry[1] += 1
+            entry[2] += value
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+
+class Registry:
+    # Metrics are kept per process. When `directory` is set every process
+    # also writes its values to <directory>/metrics-<pid>.json, and render()
+    # merges all those files so any gunicorn worker can answer a scrape for
+    # the whole server.
+
+    def __init__(self, directory=None, write_interval=5.0):
+        self.directory = directory
+        self.write_interval = write_interval
+        self.lock = threading.Lock()
+        self.metrics = {}
+        self._pid = None
+
+    def _add(self, metric):
+        self.metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, help_text, labels=()):
+        return self._add(Counter(self, name, help_text, labels))
+
+    def gauge(self, name, help_text, labels=()):
+        return self._add(Gauge(self, name, help_text, labels))
+
+    def histogram(self, name, help_text, labels=(), buckets=DEFAULT_BUCKETS):
+        return self._add(Histogram(self, name, help_text, labels, buckets))
+
+    def ensure_writer(self):
+        if not self.directory or self._pid == os.getpid():
+            return
+        if self._pid is not None:
+            # Values inherited from the parent are already in its own file.
+            with self.lock:
+                for metric in self.metrics.values():
+                    metric._values.clear()
+        self._pid = os.getpid()
+        os.makedirs(self.directory, exist_ok=True)
+        threading.Thread(
+            target=self._write_loop, name="metrics-writer", daemon=True
+        ).start()
+
+    def _write_loop(self):
+        while True:
+            time.sleep(self.write_interval)
+            try:
+                self.write()
+            except Exception as e:
+                logger.error("Writing metrics snapshot failed: %s", e)
+
+    def write(self):
+        snapshot = {name: metric.dump() for name, metric in self.metrics.items()}
+        path = os.path.join(self.directory, f"metrics-{os.getpid()}.json")
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w") as file:
+            json.dump(snapshot, file)
+        os.replace(tmp_path, path)
+
+    def _snapshots(self):
+        if not self.directory:
+            return [
+                (True, {name: metric.dump() for name, metric in self.metrics.items()})
+            ]
+        self.write()
+        snapshots = []
+        for filename in os.listdir(self.directory):
+            if not (filename.startswith("metrics-") and filename.endswith(".json")):
+                continue
+            pid = int(filename[len("metrics-") : -len(".json")])
+            try:
+                with open(os.path.join(self.directory, filename)) as file:
+                    snapshots.append((_pid_alive(pid), json.load(file)))
+            except (OSError, ValueError):
+                continue
+        return snapshots
+
+    def render(self):
+        merged = {name: {} for name in self.metrics}
+        for alive, snapshot in self._snapshots():
+            for name, values in snapshot.items():
+                metric = self.metrics.get(name)
+                if metric is None:
+                    continue
+                if metric.kind == "gauge" and not alive:
+                    # Gauges of exited workers no longer describe anything.
+                    continue
+                target = merged[name]
+                for key, value in values:
+                    key = tuple(key)
+                    if metric.kind == "histogram":
+                        entry = target.setdefault(
+                            key, [[0] * len(metric.buckets), 0, 0.0]
+                        )
+                        entry[0] = [a + b for a, b in zip(entry[0], value[0])]
+                        entry[1] += value[1]
+                        entry[2] += value[2]
+                    else:
+                        target[key] = target.get(key, 0) + value
+        lines = []
+        for name, metric in self.metrics.items():
+            lines.append(f"# HELP {name} {metric.help}")
+            lines.append(f"# TYPE {name} {metric.kind}")
+            for key, value in sorted(merged[name].items()):
+                labels = list(zip(metric.labels, key))
+                if metric.kind != "histogram":
+                    lines.append(f"{name}{_labels(labels)} {value}")
+                    continue
+                cumulative = 0
+                for bound, count in zip(metric.buckets, value[0]):
+                    cumulative += count
+                    bucket_labels = labels + [("le", repr(float(bound)))]
+                    lines.append(f"{name}_bucket{_labels(bucket_labels)} {cumulative}")
+                inf_labels = labels + [("le", "+Inf")]
+                lines.append(f"{name}_bucket{_labels(inf_labels)} {value[1]}")
+                lines.append(f"{name}_count{_labels(labels)} {value[1]}")
+                lines.append(f"{name}_sum{_labels(labels)} {value[2]}")
+        return "\n".join(lines) + "\n"
+
+
+def _labels(pairs):
+    if not pairs:
+        return ""
+    escaped = (
+        (k, v.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+        for k, v in pairs
+    )
+    return "{" + ",".join(f'{k}="{v}"' for k, v in escaped) + "}"
+
+
+def _pid_alive(pid):
+    if pid == os.getpid():
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+registry = Registry(directory=os.getenv("METRICS_DIR"))
+
+REQUEST_LATENCY = registry.histogram(
+    "http_request_duration_seconds",
+    "Time spent handling HTTP requests",
+    ("route", "method", "status"),
+)
+RPC_LATENCY = registry.histogram(
+    "web3_rpc_duration_seconds", "Time spent in Web3 JSON-RPC calls", ("method",)
+)
+RPC_ERRORS = registry.counter(
+    "web3_rpc_errors_total", "Web3 JSON-RPC calls that raised", ("method",)
+)
+SQL_LATENCY = registry.histogram(
+    "db_query_duration_seconds", "Time spent executing SQL statements", ("statement",)
+)
+DB_CONNECT_LATENCY = registry.histogram(
+    "db_connect_duration_seconds", "Time spent opening MySQL connections"
+)
+PAYOUT_DURATION = registry.histogram(
+    "payout_duration_seconds", "Time from payout start to final outcome", ("kind",)
+)
+PAYOUT_OUTCOMES = registry.counter(
+    "payout_outcomes_total", "Payout results by kind and status", ("kind", "status")
+)
+PAYOUT_PATHS = registry.counter(
+    "payout_path_total",
+    "Payout code paths taken (ether, award_completion, award_fallback, batch)",
+    ("path",),
+)
+PAYOUTS_IN_FLIGHT = registry.gauge(
+    "payouts_in_flight", "Payouts currently being processed", ("kind",)
+)
+
+
+def statement_label(sql):
+    # "SELECT balance FROM token WHERE ..." -> "SELECT token"
+    words = sql.split()
+    if not words:
+        return ""
+    verb = words[0].upper()
+    upper = [word.upper() for word in words]
+    for marker in ("FROM", "INTO"):
+        if marker in upper:
+            index = upper.index(marker)
+            if index + 1 < len(words):
+                return f"{verb} {words[index + 1]}"
+    if verb == "UPDATE" and len(words) > 1:
+        return f"{verb} {words[1]}"
+    return verb
+
+
+def rpc_metrics_middleware(make_request, w3):
+    def middleware(method, params):
+        start = time.perf_counter()
+        try:
+            return make_request(method, params)
+        except Exception:
+            RPC_ERRORS.inc(method=method)
+            raise
+        finally:
+            RPC_LATENCY.observe(time.perf_counter() - start, method=method)
+
+    return middleware
+
+
+async def async_rpc_metrics_middleware(make_request, w3):
+    async def middleware(method, params):
+        start = time.perf_counter()
+        try:
+            return await make_request(method, params)
+        except Exception:
+            RPC_ERRORS.inc(method=method)
+            raise
+        finally:
+            RPC_LATENCY.observe(time.perf_counter() - start, method=method)
+
+    return middleware
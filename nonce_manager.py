@@ -0,0 +1,146 @@
+import time
+import heapq
+import threading
+import logging
+
+logger = logging.getLogger(__name__)
+
+NONCE_ERRORS = (
+    "nonce too low",
+    "replacement transaction underpriced",
+    "invalid transaction nonce",
+)
+
+
+def is_nonce_error(error):
+    message = str(error).lower()
+    return any(fragment in message for fragment in NONCE_ERRORS)
+
+
+def is_already_known(error):
+    # The node already holds this exact signed transaction, e.g. because a
+    # retried RPC call had in fact got through: it was sent, not rejected.
+    return "already known" in str(error).lower()
+
+
+class NonceManager:
+    # Hands out nonces for one sending account from a local counter so
+    # concurrent payouts don't each pay a get_transaction_count round trip or
+    # collide on the same nonce. Nonces whose transaction never made it on
+    # chain are kept as gaps and reused before the counter moves on.
+
+    def __init__(self, w3, address, idle_resync_interval=60.0, max_retries=3):
+        self.w3 = w3
+        self.address = address
+        self.idle_resync_interval = idle_resync_interval
+        self.max_retries = max_retries
+        self._lock = threading.Lock()
+        self._next = None
+        self._gaps = []
+        self._inflight = {}
+        self._synced_at = 0.0
+        self.stats = {"allocated": 0, "resyncs": 0, "gaps_reused": 0, "dropped": 0}
+
+    def _chain_nonce(self):
+        return self.w3.eth.get_transaction_count(self.address, "pending")
+
+    def _sync_locked(self, exact=False, chain_nonce=None):
+        if chain_nonce is None:
+            chain_nonce = self._chain_nonce()
+        if exact or self._next is None:
+            self._next = chain_nonce
+        else:
+            self._next = max(self._next, chain_nonce)
+        self._gaps = [n for n in self._gaps if chain_nonce <= n < self._next]
+        heapq.heapify(self._gaps)
+        for nonce in [n for n in self._inflight if n < chain_nonce]:
+            del self._inflight[nonce]
+        self._synced_at = time.monotonic()
+        self.stats["resyncs"] += 1
+        logger.info("Nonce for %s synced from chain: %s", self.address, chain_nonce)
+
+    def resync(self):
+        with self._lock:
+            self._sync_locked()
+
+    def _idle_locked(self):
+        return (
+            not self._inflight
+            and time.monotonic() - self._synced_at > self.idle_resync_interval
+        )
+
+    def needs_sync(self):
+        # True when the next allocate() would read the count from the chain.
+        with self._lock:
+            return self._next is None or self._idle_locked()
+
+    def sync(self, chain_nonce):
+        # Apply a pending transaction count fetched elsewhere, e.g. as part
+        # of a JSON-RPC batch, instead of letting allocate() fetch it.
+        with self._lock:
+            self._sync_locked(exact=not self._inflight, chain_nonce=chain_nonce)
+
+    def allocate(self):
+        with self._lock:
+            if self._next is None:
+                self._sync_locked()
+            elif self._idle_locked():
+                # Nothing of ours is pending, so the chain count is exact;
+                # pick up transactions sent with this key by other tools.
+                self._sync_locked(exact=True)
+            if self._gaps:
+                nonce = heapq.heappop(self._gaps)
+                self.stats["gaps_reused"] += 1
+            else:
+                nonce = self._next
+                self._next += 1
+            self._inflight[nonce] = time.monotonic()
+            self.stats["allocated"] += 1
+            return nonce
+
+    def confirm(self, nonce):
+        with self._lock:
+            self._inflight.pop(nonce, None)
+
+    def discard(self, nonce):
+        # The node refused this nonce as used: forget it without making it
+        # a gap; the next sync puts the counter right.
+        self.confirm(nonce)
+
+    def release(self, nonce):
+        # The transaction using this nonce was never broadcast, or was
+        # dropped from the mempool: hand the nonce out again.
+        with self._lock:
+            if self._inflight.pop(nonce, None) is not None:
+                heapq.heappush(self._gaps, nonce)
+
+    def mark_dropped(self, nonce):
+        self.stats["dropped"] += 1
+        logger.info("Transaction with nonce %s was dropped, reusing nonce", nonce)
+        self.release(nonce)
+
+    def send(self, send_fn):
+        last_error = None
+        for attempt in range(self.max_retries):
+            nonce = self.allocate()
+            try:
+                return nonce, send_fn(nonce)
+            except Exception as e:
+                if not is_nonce_error(e):
+                    self.release(nonce)
+                    raise
+                logger.info("Nonce %s rejected (%s), resyncing", nonce, e)
+                self.discard(nonce)
+                self.resync()
+                last_error = e
+        raise last_error
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "address": self.address,
+                "next": self._next,
+                "in_flight": sorted(self._inflight),
+                "gaps": sorted(self._gaps),
+                **self.stats,
+            }
@@ -0,0 +1,89 @@
+import os
+import time
+import threading
+import logging
+from concurrent.futures import Future, ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+
+class BatchAggregator:
+    # Collects claims for up to `window` seconds (or until `max_batch` are
+    # waiting) and hands them to `submit` as one list. `submit` must return
+    # one result per claim, in order; each claim's Future resolves to its own
+    # result so the waiting payout job only sees what happened to its player.
+
+    def __init__(self, submit, window=2.0, max_batch=20, max_inflight_batches=2):
+        self._submit = submit
+        self.window = window
+        self.max_batch = max_batch
+        self.max_inflight_batches = max_inflight_batches
+        self._cond = threading.Condition()
+        self._items = []
+        self._first_at = None
+        self._pid = None
+        self._executor = None
+        self.stats = {"batches": 0, "claims": 0, "failed_batches": 0}
+
+    def _ensure_worker(self):
+        if self._pid == os.getpid():
+            return
+        self._pid = os.getpid()
+        self._items = []
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.max_inflight_batches, thread_name_prefix="payout-batch"
+        )
+        threading.Thread(target=self._run, name="payout-batcher", daemon=True).start()
+
+    def add(self, claim):
+        future = Future()
+        with self._cond:
+            self._ensure_worker()
+            if not self._items:
+                self._first_at = time.monotonic()
+            self._items.append((claim, future))
+            # The first claim starts the window the batcher thread times;
+            # a full batch goes out without waiting for it.
+            if len(self._items) == 1 or len(self._items) >= self.max_batch:
+                self._cond.notify()
+        return future
+
+    def _take_batch(self):
+        with self._cond:
+            while True:
+                if self._items:
+                    remaining = self.window - (time.monotonic() - self._first_at)
+                    if len(self._items) >= self.max_batch or remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                else:
+                    self._cond.wait()
+            batch = self._items[: self.max_batch]
+            self._items = self._items[self.max_batch :]
+            self._first_at = time.monotonic() if self._items else None
+            return batch
+
+    def _run(self):
+        while True:
+            batch = self._take_batch()
+            self._executor.submit(self._dispatch, batch)
+
+    def _dispatch(self, batch):
+        claims = [claim for claim, _ in batch]
+        logger.info("Submitting payout batch of %s claims", len(claims))
+        try:
+            results = self._submit(claims)
+            if len(results) != len(batch):
+                raise RuntimeError(
+                    f"Batch returned {len(results)} results for {len(batch)} claims"
+                )
+        except Exception as e:
+            logger.error("Payout batch failed: %s", e, exc_info=True)
+            self.stats["failed_batches"] += 1
+            for _, future in batch:
+                future.set_exception(e)
+            return
+        self.stats["batches"] += 1
+        self.stats["claims"] += len(batch)
+        for (_, future), result in zip(batch, results):
+            future.set_result(result)
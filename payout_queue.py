@@ -0,0 +1,142 @@
+import os
+import time
+import uuid
+import queue
+import threading
+import logging
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+QUEUED = "queued"
+SENT = "sent"
+MINED = "mined"
+FAILED = "failed"
+
+
+class PayoutJob:
+    __slots__ = (
+        "id",
+        "kind",
+        "address",
+        "points",
+        "status",
+        "message",
+        "tx_hashes",
+        "created_at",
+        "updated_at",
+    )
+
+    def __init__(self, kind, address, points):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.address = address
+        self.points = points
+        self.status = QUEUED
+        self.message = None
+        self.tx_hashes = []
+        self.created_at = time.time()
+        self.updated_at = self.created_at
+
+    def record_tx(self, tx_hash):
+        if not isinstance(tx_hash, str):
+            tx_hash = "0x" + bytes(tx_hash).hex()
+        self.tx_hashes.append(tx_hash)
+        self._set(SENT)
+
+    def finish(self, ok, message):
+        self.message = message
+        self._set(MINED if ok else FAILED)
+
+    def _set(self, status):
+        self.status = status
+        self.updated_at = time.time()
+
+    @property
+    def done(self):
+        return self.status in (MINED, FAILED)
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "kind": self.kind,
+            "address": self.address,
+            "points": self.points,
+            "status": self.status,
+            "message": self.message,
+            "tx_hashes": list(self.tx_hashes),
+            "created_at": self.created_at,
+            "updated_at": self.updated_at,
+        }
+
+
+class PayoutQueue:
+    # Runs payout handlers on a small pool of background threads so request
+    # workers return as soon as a job is accepted. Job state lives in this
+    # process, so /payout/<id> must be served by the worker that took the job.
+
+    def __init__(self, workers=4, max_jobs=10000, job_ttl=3600):
+        self.workers = workers
+        self.max_jobs = max_jobs
+        self.job_ttl = job_ttl
+        self._lock = threading.Lock()
+        self._jobs = OrderedDict()
+        self._queue = queue.Queue()
+        self._pid = None
+        self._threads = []
+
+    def _ensure_workers(self):
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._threads = [
+                threading.Thread(
+                    target=self._run, name=f"payout-worker-{i}", daemon=True
+                )
+                for i in range(self.workers)
+            ]
+            for thread in self._threads:
+                thread.start()
+
+    def submit(self, kind, address, points, handler):
+        self._ensure_workers()
+        job = PayoutJob(kind, address, points)
+        with self._lock:
+            self._evict()
+            self._jobs[job.id] = job
+        self._queue.put((job, handler))
+        logger.info("Queued %s payout job %s for %s", kind, job.id, address)
+        return job
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def pending(self):
+        return self._queue.qsize()
+
+    def _evict(self):
+        cutoff = time.time() - self.job_ttl
+        for job_id in list(self._jobs):
+            job = self._jobs[job_id]
+            if len(self._jobs) < self.max_jobs and job.created_at > cutoff:
+                break
+            if not job.done:
+                continue
+            del self._jobs[job_id]
+
+    def _run(self):
+        while True:
+            job, handler = self._queue.get()
+            try:
+                ok, message = handler(job)
+                job.finish(ok, message)
+            except Exception as e:
+                logger.error("Payout job %s failed: %s", job.id, e, exc_info=True)
+                job.finish(False, str(e))
+            finally:
+                self._queue.task_done()
+            logger.info("Payout job %s finished: %s", job.id, job.status)
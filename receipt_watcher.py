@@ -0,0 +1,216 @@
+import os
+import time
+import threading
+import logging
+from concurrent.futures import Future
+
+from hexbytes import HexBytes
+from web3.datastructures import AttributeDict
+from web3.exceptions import TimeExhausted, TransactionNotFound
+from web3._utils.method_formatters import receipt_formatter
+
+logger = logging.getLogger(__name__)
+
+UNSUPPORTED_ERRORS = ("-32601", "not found", "not supported", "unknown rpc")
+
+
+def _hash_key(tx_hash):
+    return HexBytes(tx_hash).hex().lower().removeprefix("0x")
+
+
+class Watch:
+    # All hashes sent for one nonce (the original plus fee bumps); the
+    # future resolves with the receipt of whichever one is mined.
+
+    __slots__ = ("hashes", "nonce", "sender", "deadline", "future", "checked")
+
+    def __init__(self, tx_hash, nonce, deadline, sender=None):
+        self.hashes = [tx_hash]
+        self.nonce = nonce
+        self.sender = sender
+        self.deadline = deadline
+        self.future = Future()
+        # False until the watcher has looked the hash up directly once, for
+        # transactions mined in a block it had already scanned.
+        self.checked = False
+
+
+class ReceiptWatcher:
+    # One thread follows the chain head for every payout in this process.
+    # Each new block costs one eth_getBlockReceipts call (or eth_getBlock
+    # plus one receipt per matching transaction on nodes without it), no
+    # matter how many payouts are waiting; with nothing pending it makes no
+    # calls at all.
+
+    def __init__(
+        self, w3, poll_interval=1.0, timeout=300.0, max_catchup=20, on_dropped=None
+    ):
+        self.w3 = w3
+        self.poll_interval = poll_interval
+        self.timeout = timeout
+        self.max_catchup = max_catchup
+        self.on_dropped = on_dropped
+        self.block_receipts = True
+        self._cond = threading.Condition()
+        self._watches = []
+        self._by_hash = {}
+        self._last_block = None
+        self._pid = None
+        self.stats = {
+            "blocks": 0,
+            "mined": 0,
+            "timeouts": 0,
+            "dropped": 0,
+            "rpc_errors": 0,
+        }
+
+    def _ensure_worker(self):
+        if self._pid == os.getpid():
+            return
+        self._pid = os.getpid()
+        self._watches = []
+        self._by_hash = {}
+        self._last_block = None
+        threading.Thread(target=self._run, name="receipt-watcher", daemon=True).start()
+
+    def watch(self, tx_hash, nonce=None, sender=None):
+        watch = Watch(tx_hash, nonce, time.monotonic() + self.timeout, sender)
+        with self._cond:
+            self._ensure_worker()
+            self._watches.append(watch)
+            self._by_hash[_hash_key(tx_hash)] = watch
+            self._cond.notify()
+        return watch
+
+    def add_hash(self, watch, tx_hash):
+        # A replacement (fee bump) for the same nonce.
+        with self._cond:
+            watch.hashes.append(tx_hash)
+            if not watch.future.done():
+                self._by_hash[_hash_key(tx_hash)] = watch
+
+    def _finish(self, watch, receipt=None, error=None):
+        with self._cond:
+            if watch in self._watches:
+                self._watches.remove(watch)
+            for tx_hash in watch.hashes:
+                self._by_hash.pop(_hash_key(tx_hash), None)
+        if watch.future.done():
+            return
+        if error is not None:
+            watch.future.set_exception(error)
+        else:
+            self.stats["mined"] += 1
+            watch.future.set_result(receipt)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._watches:
+                    self._last_block = None
+                    self._cond.wait()
+            try:
+                self._poll()
+            except Exception as e:
+                self.stats["rpc_errors"] += 1
+                logger.error("Receipt watcher poll failed: %s", e)
+            time.sleep(self.poll_interval)
+
+    def _poll(self):
+        head = self.w3.eth.block_number
+        if self._last_block is None:
+            self._last_block = head - 1
+        start = max(self._last_block + 1, head - self.max_catchup + 1)
+        for number in range(start, head + 1):
+            self._scan_block(number)
+            self._last_block = number
+            self.stats["blocks"] += 1
+        with self._cond:
+            unchecked = [watch for watch in self._watches if not watch.checked]
+        for watch in unchecked:
+            watch.checked = True
+            self._check_directly(watch)
+        now = time.monotonic()
+        with self._cond:
+            expired = [watch for watch in self._watches if watch.deadline <= now]
+        for watch in expired:
+            self._expire(watch)
+
+    def _scan_block(self, number):
+        with self._cond:
+            if not self._by_hash:
+                return
+        if self.block_receipts:
+            try:
+                receipts = self.w3.manager.request_blocking(
+                    "eth_getBlockReceipts", [hex(number)]
+                )
+            except ValueError as e:
+                if not any(text in str(e).lower() for text in UNSUPPORTED_ERRORS):
+                    raise
+                logger.info(
+                    "eth_getBlockReceipts unavailable (%s), using eth_getBlock", e
+                )
+                self.block_receipts = False
+            else:
+                for raw in receipts or ():
+                    watch = self._by_hash.get(_hash_key(raw["transactionHash"]))
+                    if watch is not None:
+                        receipt = AttributeDict.recursive(receipt_formatter(dict(raw)))
+                        self._finish(watch, receipt)
+                return
+        block = self.w3.eth.get_block(number)
+        for tx_hash in block["transactions"]:
+            if self._by_hash.get(_hash_key(tx_hash)) is not None:
+                self._resolve(tx_hash)
+
+    def _resolve(self, tx_hash):
+        try:
+            receipt = self.w3.eth.get_transaction_receipt(tx_hash)
+        except TransactionNotFound:
+            return False
+        watch = self._by_hash.get(_hash_key(tx_hash))
+        if watch is not None:
+            self._finish(watch, receipt)
+        return True
+
+    def _check_directly(self, watch):
+        for tx_hash in list(watch.hashes):
+            if self._resolve(tx_hash):
+                return
+
+    def _expire(self, watch):
+        # Last look for a receipt, then decide whether any of the hashes is
+        # still known to the node; if none is, the nonce was never used.
+        for tx_hash in list(watch.hashes):
+            if self._resolve(tx_hash):
+                return
+        dropped = True
+        for tx_hash in list(watch.hashes):
+            try:
+                self.w3.eth.get_transaction(tx_hash)
+                dropped = False
+                break
+            except TransactionNotFound:
+                continue
+        self.stats["timeouts"] += 1
+        if dropped:
+            self.stats["dropped"] += 1
+            if self.on_dropped and watch.nonce is not None:
+                self.on_dropped(watch.nonce, watch.sender)
+        self._finish(
+            watch,
+            error=TimeExhausted(
+                f"Transaction 0x{_hash_key(watch.hashes[0])} not mined "
+                f"after {self.timeout} seconds" + (" (dropped)" if dropped else "")
+            ),
+        )
+
+    def snapshot(self):
+        with self._cond:
+            return {
+                **self.stats,
+                "pending": len(self._watches),
+                "last_block": self._last_block,
+                "block_receipts": self.block_receipts,
+            }
@@ -0,0 +1,158 @@
+import time
+import threading
+import logging
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from web3 import HTTPProvider
+from web3._utils.encoding import FriendlyJsonSerde
+
+logger = logging.getLogger(__name__)
+
+
+def to_int(value):
+    # Raw JSON-RPC results are hex strings; some stand-ins return numbers.
+    if isinstance(value, str):
+        return int(value, 16)
+    return int(value)
+
+
+class RPCError(ValueError):
+    def __init__(self, method, error):
+        super().__init__(error)
+        self.method = method
+        self.error = error
+
+
+class PooledHTTPProvider(HTTPProvider):
+    # HTTPProvider on one keep-alive requests.Session shared by every thread,
+    # with a connection pool sized for the payout workers, retries on
+    # connection failures only (a timed-out eth_sendRawTransaction must not
+    # be resent blindly), and per-method timing. batch_request() sends
+    # several independent calls as one JSON-RPC batch.
+
+    def __init__(
+        self, endpoint_uri, timeout=10.0, pool_size=20, retries=2, on_batch_call=None
+    ):
+        super().__init__(endpoint_uri)
+        self.timeout = timeout
+        # Called as on_batch_call(method, seconds, ok) for calls sent through
+        # batch_request; single calls already pass through web3 middleware.
+        self.on_batch_call = on_batch_call
+        self.session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=1,
+            pool_maxsize=pool_size,
+            max_retries=Retry(
+                total=retries, connect=retries, read=0, status=0, backoff_factor=0.1
+            ),
+        )
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.session.headers.update(
+            {"Content-Type": "application/json", "User-Agent": "wordhunt-server"}
+        )
+        self._lock = threading.Lock()
+        self._ids = iter(range(1, 2**62))
+        self._stats = {}
+        self.http_requests = 0
+
+    def _record(self, method, seconds, ok, batched=False):
+        with self._lock:
+            entry = self._stats.get(method)
+            if entry is None:
+                entry = self._stats[method] = {
+                    "calls": 0,
+                    "errors": 0,
+                    "batched": 0,
+                    "total_ms": 0.0,
+                    "max_ms": 0.0,
+                }
+            entry["calls"] += 1
+            entry["errors"] += 0 if ok else 1
+            entry["batched"] += 1 if batched else 0
+            entry["total_ms"] += seconds * 1000
+            entry["max_ms"] = max(entry["max_ms"], seconds * 1000)
+
+    def _post(self, body):
+        with self._lock:
+            self.http_requests += 1
+        response = self.session.post(self.endpoint_uri, data=body, timeout=self.timeout)
+        response.raise_for_status()
+        return response.content
+
+    def make_request(self, method, params):
+        start = time.perf_counter()
+        ok = False
+        try:
+            response = self.decode_rpc_response(
+                self._post(self.encode_rpc_request(method, params))
+            )
+            ok = "error" not in response
+            return response
+        finally:
+            self._record(method, time.perf_counter() - start, ok)
+
+    def batch_request(self, calls):
+        # calls: [(method, params), ...]. Returns one entry per call, in
+        # order: the raw "result" value, or an RPCError instance.
+        with self._lock:
+            ids = [next(self._ids) for _ in calls]
+        payload = [
+            {"jsonrpc": "2.0", "method": method, "params": params, "id": request_id}
+            for request_id, (method, params) in zip(ids, calls)
+        ]
+        start = time.perf_counter()
+        try:
+            responses = FriendlyJsonSerde().json_decode(
+                self._post(FriendlyJsonSerde().json_encode(payload).encode())
+            )
+        except Exception:
+            elapsed = time.perf_counter() - start
+            for method, _ in calls:
+                self._record(method, elapsed, False, batched=True)
+                if self.on_batch_call:
+                    self.on_batch_call(method, elapsed, False)
+            raise
+        elapsed = time.perf_counter() - start
+        if isinstance(responses, dict):
+            # Some nodes answer a batch they reject with a single error.
+            raise RPCError("batch", responses.get("error", responses))
+        by_id = {response.get("id"): response for response in responses}
+        results = []
+        for request_id, (method, _) in zip(ids, calls):
+            response = by_id.get(request_id, {"error": "missing from batch response"})
+            ok = "error" not in response
+            self._record(method, elapsed, ok, batched=True)
+            if self.on_batch_call:
+                self.on_batch_call(method, elapsed, ok)
+            results.append(
+                response.get("result") if ok else RPCError(method, response["error"])
+            )
+        return results
+
+    def stats(self):
+        with self._lock:
+            methods = {
+                method: {
+                    **entry,
+                    "avg_ms": entry["total_ms"] / entry["calls"],
+                }
+                for method, entry in self._stats.items()
+            }
+            return {"http_requests": self.http_requests, "methods": methods}
+
+
+def batch(w3, calls):
+    # One JSON-RPC batch when the provider supports it, otherwise the same
+    # calls one after the other; the result list has the same shape.
+    if isinstance(w3.provider, PooledHTTPProvider):
+        return w3.provider.batch_request(calls)
+    results = []
+    for method, params in calls:
+        try:
+            results.append(w3.manager.request_blocking(method, params))
+        except ValueError as e:
+            results.append(RPCError(method, e))
+    return results
@@ -1,14 +1,16 @@
 import re
 import os
-import json
+import sys
 import mysql.connector
 from mysql.connector import Error
 from flask import Flask, request, jsonify
 from flask_cors import CORS
 from dotenv import load_dotenv
-from solcx import compile_standard
 from web3 import Web3
 
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from contract_artifacts import load as load_artifacts  # noqa: E402
+
 load_dotenv()
 
 app = Flask(__name__)
@@ -17,31 +19,10 @@ CORS(app, origins=["http://127.0.0.1:5500"], supports_credentials=True)
 Alchemy_URL = "https://eth-sepolia.g.alchemy.com/v2/pNASGYMf60h1z4fJpVgbgh_FMzO2iYoe"
 w3 = Web3(Web3.HTTPProvider(Alchemy_URL))
 
-with open("contract.sol", "r") as file:
-    content = file.read()
-
-compile_sol = compile_standard(
-    {
-        "language": "Solidity",
-        "sources": {"contract.sol": {"content": content}},
-        "settings": {
-            "outputSelection": {
-                "*": {
-                    "*": ["abi", "metadata", "evm.bytecode", "evm.bytecode.sourceMap"]
-                }
-            }
-        },
-    },
-    solc_version="0.8.0",
-)
-
-with open("package.json", "w") as file:
-    json.dump(compile_sol, file)
-
-bytecode = compile_sol["contracts"]["contract.sol"]["transfer"]["evm"]["bytecode"][
-    "object"
-]
-abi = compile_sol["contracts"]["contract.sol"]["transfer"]["abi"]
+# Built once by `python contract_artifacts.py build`, not on every import.
+artifact = load_artifacts()["transfer"]
+bytecode = artifact["bytecode"]
+abi = artifact["abi"]
 
 my_address = w3.to_checksum_address(os.getenv("MY_ADDRESS"))
 chain_id = 11155111
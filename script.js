@@ -33,13 +33,38 @@ let coordinates = [];
 let str = "";
 let initx = -1;
 let inity = -1;
+let sessionId = null;
+// Paths of the words the server confirmed; sent with the claim.
+let foundPaths = [];
 
 const API_URL = "https://blockchain-wordhuntgrid.onrender.com";
 
 const n = 11, m = 15;
 const grid = new Array(n).fill().map(() => new Array(m).fill(-1));
 
-function setup() {
+async function setup() {
+    try {
+        const response = await fetch(`${API_URL}/grid?category=${id}`);
+        const res = await response.json();
+        if (!response.ok || !res.valid) throw new Error(res.error || "Grid request failed");
+        for (let i = 0; i < n; i++) {
+            for (let j = 0; j < m; j++) {
+                grid[i][j] = res.grid[i][j];
+            }
+        }
+        wordPositions = [];
+        sessionId = res.session_id;
+    } catch (error) {
+        console.error("Falling back to local grid:", error);
+        sessionId = null;
+        setupLocal();
+        alert("Couldn't reach the server. This grid is for practice only: its points can't be claimed.");
+    }
+    displayGrid();
+    displayList(id);
+}
+
+function setupLocal() {
     wordPositions = [];
     let list = words[id];
     let placedWords = 0;
@@ -144,8 +169,6 @@ function setup() {
             if (grid[i][j] === -1) grid[i][j] = String.fromCharCode(65 + Math.floor(Math.random() * 26));
         }
     }
-    displayGrid();
-    displayList(id);
 }
 
 function displayGrid() {
@@ -272,6 +295,10 @@ function clearSelection() {
 }
 
 function check() {
+    if (sessionId) {
+        submitWord(coordinates.slice());
+        return;
+    }
     const rev = str.split('').reverse().join('');
     let foundWord = null;
 
@@ -281,20 +308,40 @@ function check() {
         }
     });
 
-    if (foundWord) {
-        foundWord.positions.forEach(([row, col]) => {
-            const cell = document.querySelector(`.cell[data-row="${row}"][data-col="${col}"]`);
-            cell.classList.add('found');
-            cell.classList.remove('selected');
-        });
-        document.querySelectorAll('.listRow').forEach(row => {
-            if (row.innerText === foundWord.word) row.classList.add('append');
+    if (foundWord) markFound(foundWord.word, foundWord.positions, correctCount + 1);
+}
+
+async function submitWord(path) {
+    try {
+        const response = await fetch(`${API_URL}/submitWord`, {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({ session_id: sessionId, path })
         });
-        correctCount++;
-        correctGuess();
+        const res = await response.json();
+        if (response.ok && res.found && !foundPaths.some(p => coordinatesMatch(p, path))) {
+            foundPaths.push(path);
+            markFound(res.word, path, foundPaths.length);
+        }
+    } catch (error) {
+        console.error("Error in submitWord:", error);
     }
 }
 
+function markFound(word, positions, points) {
+    positions.forEach(([row, col]) => {
+        const cell = document.querySelector(`.cell[data-row="${row}"][data-col="${col}"]`);
+        cell.classList.add('found');
+        cell.classList.remove('selected');
+    });
+    document.querySelectorAll('.listRow').forEach(row => {
+        if (row.innerText === word) row.classList.add('append');
+    });
+    if (points === correctCount) return;
+    correctCount = points;
+    correctGuess();
+}
+
 function coordinatesMatch(wordPos, selectedCoordinates) {
     if (wordPos.length !== selectedCoordinates.length) return false;
     return wordPos.every(([row, col], i) => row === selectedCoordinates[i][0] && col === selectedCoordinates[i][1]) ||
@@ -337,6 +384,16 @@ async function collectAmount() {
     const winGame = document.createElement('div');
     winGame.className = 'winGame';
     winGame.innerText = `Your Score is ${correctCount}`;
+    if (!sessionId) {
+        // A locally generated grid has no session for the server to check.
+        winGame.innerText += " (practice grid, not claimable)";
+        document.body.appendChild(winGame);
+        setTimeout(() => {
+            document.body.removeChild(winGame);
+            document.querySelector('.category').classList.remove('blur-background');
+        }, 3000);
+        return;
+    }
     const claim = document.createElement('div');
     claim.className = 'option1';
     claim.innerText = 'Claim';
@@ -354,11 +411,15 @@ async function collectAmount() {
             const response = await fetch(`${API_URL}/transfer`, {
                 method: 'POST',
                 headers: { 'Content-Type': 'application/json' },
-                body: JSON.stringify({ points: correctCount, address: accountNumber })
+                body: JSON.stringify({ points: correctCount, session_id: sessionId, paths: foundPaths, address: accountNumber, async: true })
             });
             console.log(`Response: ${response.status} ${response.statusText}`);
-            const res = await response.json();
-            if (!response.ok) {
+            const res = await waitForPayout(response, await response.json());
+            if (res.pending) {
+                alert("Your reward is still being processed. Check your wallet shortly.");
+                document.body.removeChild(winGame);
+                document.querySelector('.category').classList.remove('blur-background');
+            } else if (!response.ok || !res.valid) {
                 console.error(`Transfer failed: ${response.status} ${response.statusText}`, res);
                 alert(`Failed to claim reward: ${res.message || res.error || 'Unable to process transaction'} (Status: ${response.status}). Points added to wallet.`);
                 await addToBalance();
@@ -389,12 +450,38 @@ async function collectAmount() {
     });
 }
 
-function gameStart() {
+// Jobs live in the worker that queued them, so a poll answered by another
+// worker (404) or lost to the network says nothing about the payout; keep
+// polling. A job still unresolved after PAYOUT_POLL_LIMIT polls comes back
+// as pending, which is never credited to the wallet: it may yet be paid.
+const PAYOUT_POLL_LIMIT = 100;
+
+async function waitForPayout(response, res) {
+    if (response.status !== 202 || !res.job_id) return res;
+    for (let i = 0; i < PAYOUT_POLL_LIMIT; i++) {
+        await new Promise(resolve => setTimeout(resolve, 3000));
+        let poll, job;
+        try {
+            poll = await fetch(`${API_URL}/payout/${res.job_id}`);
+            job = await poll.json();
+        } catch (error) {
+            console.warn(`Payout ${res.job_id}: poll failed`, error);
+            continue;
+        }
+        console.log(`Payout ${res.job_id}: ${job.status}`, job.tx_hashes);
+        if (poll.status === 404) continue;
+        if (!poll.ok || job.status === 'mined' || job.status === 'failed') return job;
+    }
+    return { valid: false, pending: true, message: 'Payout still processing' };
+}
+
+async function gameStart() {
     display.innerHTML = '';
     leftTime = 120;
     correctCount = 0;
+    foundPaths = [];
     if (ut) clearInterval(ut);
-    setup();
+    await setup();
     ut = setInterval(updateTimer, 1000);
 }
 
@@ -491,7 +578,7 @@ async function addToBalance() {
         const response = await fetch(`${API_URL}/addToBalance`, {
             method: 'POST',
             headers: { 'Content-Type': 'application/json' },
-            body: JSON.stringify({ address: accountNumber, points: correctCount })
+            body: JSON.stringify({ address: accountNumber, points: correctCount, session_id: sessionId, paths: foundPaths })
         });
         console.log(`Response: ${response.status} ${response.statusText}`);
         const res = await response.json();
@@ -541,11 +628,11 @@ wallet.addEventListener('mousedown', () => {
                 const response = await fetch(`${API_URL}/walletTransfer`, {
                     method: 'POST',
                     headers: { 'Content-Type': 'application/json' },
-                    body: JSON.stringify({ points: walletBalance, address: accountNumber })
+                    body: JSON.stringify({ points: walletBalance, address: accountNumber, async: true })
                 });
                 console.log(`Response: ${response.status} ${response.statusText}`);
-                const res = await response.json();
-                if (!response.ok) {
+                const res = await waitForPayout(response, await response.json());
+                if (!response.ok || !res.valid) {
                     console.error(`Wallet transfer failed: ${response.status} ${response.statusText}`, res);
                     alert(`Failed to claim tokens: ${res.message || res.error || 'Unable to process transaction. Please try again later.'} (Status: ${response.status})`);
                 } else {
@@ -1,20 +1,63 @@
 import re
 import os
-import json
-import mysql.connector
-from mysql.connector import Error
-from flask import Flask, request, jsonify, send_from_directory
+import time
+from concurrent.futures import TimeoutError as FutureTimeout
+from flask import Flask, Response, g, request, jsonify
 from flask_cors import CORS
 from dotenv import load_dotenv
 from web3 import Web3
 import logging
-
-logging.basicConfig(level=logging.DEBUG)
-logger = logging.getLogger(__name__)
+from log_setup import configure_logging, parse_mapping, parse_level
+from db_pool import ConnectionPool
+from ledger import MySQLLedger, SQLiteLedger
+from balance_buffer import BalanceWriteBuffer
+from balance_cache import BalanceCache
+from payout_queue import PayoutQueue, PayoutJob, FAILED, MINED
+from signer_pool import SignerPool, is_funds_error
+from nonce_manager import is_already_known
+from fee_oracle import FeeOracle
+from contract_funds import ContractFunds
+from gas_cache import GasEstimateCache
+from payout_batcher import BatchAggregator
+from health import HealthChecker
+from static_assets import StaticAssets
+from grid_engine import GridEngine, PuzzlePool, category_index
+from game_sessions import SessionStore, derive_secret
+from leaderboard import Leaderboard
+from contract_artifacts import ArtifactsMissing, load as load_artifacts
+from event_indexer import EventIndexer
+from receipt_watcher import ReceiptWatcher
+from rpc_provider import PooledHTTPProvider, batch, to_int
+from metrics import (
+    registry,
+    rpc_metrics_middleware,
+    statement_label,
+    REQUEST_LATENCY,
+    RPC_LATENCY,
+    RPC_ERRORS,
+    SQL_LATENCY,
+    DB_CONNECT_LATENCY,
+    PAYOUT_DURATION,
+    PAYOUT_OUTCOMES,
+    PAYOUT_PATHS,
+    PAYOUTS_IN_FLIGHT,
+)
+from web3.logs import DISCARD
 
 load_dotenv()
 
-app = Flask(__name__, static_folder=".")
+configure_logging(
+    level=os.getenv("LOG_LEVEL", "INFO"),
+    route_levels=parse_mapping(os.getenv("LOG_ROUTE_LEVELS"), parse_level),
+    sample_rates=parse_mapping(
+        os.getenv("LOG_SAMPLE_RATES", "serve_static=0.01,index=0.1,get_balance=0.1"),
+        float,
+    ),
+)
+logger = logging.getLogger(__name__)
+
+app = Flask(__name__, static_folder=None)
+static_assets = StaticAssets(os.path.dirname(os.path.abspath(__file__)))
 CORS(
     app,
     origins=["https://blockchain-wordhuntgrid.onrender.com", "http://localhost:3000"],
@@ -24,23 +67,39 @@ CORS(
 ALCHEMY_URL = os.getenv("ALCHEMY_URL")
 w3 = None
 if ALCHEMY_URL:
-    w3 = Web3(Web3.HTTPProvider(ALCHEMY_URL))
-    logger.info(f"Connected to Web3: {w3.is_connected()}")
+
+    def record_batch_call(method, seconds, ok):
+        RPC_LATENCY.observe(seconds, method=method)
+        if not ok:
+            RPC_ERRORS.inc(method=method)
+
+    w3 = Web3(
+        PooledHTTPProvider(
+            ALCHEMY_URL,
+            timeout=float(os.getenv("RPC_TIMEOUT", 10)),
+            pool_size=int(os.getenv("RPC_POOL_SIZE", 20)),
+            on_batch_call=record_batch_call,
+        )
+    )
+    w3.middleware_onion.add(rpc_metrics_middleware, "metrics")
 else:
     logger.error("ALCHEMY_URL not set")
     raise ValueError("ALCHEMY_URL not set")
 
+# ABIs come from the build artifacts for contract.sol (see
+# contract_artifacts.py); nothing is compiled here. Without a build of the
+# current contract.sol the latest build (or the legacy contract_data.json)
+# is used with a warning, and the features its ABI lacks stay off.
+# CONTRACT_ARTIFACTS_STRICT=1 refuses to start instead, for deployments
+# that build contract.sol as part of the release.
 try:
-    with open("contract_data.json", "r") as file:
-        contract_data = json.load(file)
-    nft_abi = contract_data["WordHuntNFT"]["abi"]
-    transfer_abi = contract_data["transfer"]["abi"]
-    logger.info("Loaded ABIs from contract_data.json")
-except FileNotFoundError as e:
-    logger.error(f"Failed to load contract_data.json: {e}")
-    raise
-except KeyError as e:
-    logger.error(f"Invalid contract_data.json structure: {e}")
+    contract_artifacts = load_artifacts(
+        strict=os.getenv("CONTRACT_ARTIFACTS_STRICT") == "1"
+    )
+    nft_abi = contract_artifacts["WordHuntNFT"]["abi"]
+    transfer_abi = contract_artifacts["transfer"]["abi"]
+except (OSError, KeyError, ArtifactsMissing) as e:
+    logger.error("Failed to load contract artifacts: %s", e)
     raise
 
 my_address = os.getenv("MY_ADDRESS")
@@ -56,76 +115,305 @@ if not all([my_address, private_key, nft_address, transfer_address]):
 my_address = w3.to_checksum_address(my_address)
 nft_address = w3.to_checksum_address(nft_address)
 transfer_address = w3.to_checksum_address(transfer_address)
-chain_id = 11155111
+chain_id = int(os.getenv("CHAIN_ID", 11155111))
+# Payout keys: SIGNER_KEYS (comma-separated) or just PRIVATE_KEY. Every
+# address must be the transfer contract's owner or one of its operators;
+# the others are excluded before a worker's first payout (see
+# SignerPool.check_authorised).
+# MY_ADDRESS is still used as "from" for gas estimates and eth_call.
+signer_pool = SignerPool(
+    w3,
+    [key.strip() for key in os.getenv("SIGNER_KEYS", "").split(",") if key.strip()]
+    or [private_key],
+    min_balance=w3.to_wei(os.getenv("SIGNER_MIN_BALANCE_ETH", "0.05"), "ether"),
+    check_interval=float(os.getenv("SIGNER_BALANCE_CHECK_INTERVAL", 60)),
+)
+fee_oracle = FeeOracle(
+    w3, refresh_interval=float(os.getenv("FEE_REFRESH_INTERVAL", 12))
+)
+FEE_TIERS = {
+    "transfer": os.getenv("FEE_TIER_TRANSFER", "fast"),
+    "walletTransfer": os.getenv("FEE_TIER_WALLET_TRANSFER", "standard"),
+}
+FEE_BUMP_AFTER = float(os.getenv("FEE_BUMP_AFTER", 60))
+FEE_MAX_BUMPS = int(os.getenv("FEE_MAX_BUMPS", 3))
+RECEIPT_TIMEOUT = float(os.getenv("RECEIPT_TIMEOUT", 300))
+RECEIPT_POLL_INTERVAL = float(os.getenv("RECEIPT_POLL_INTERVAL", 1))
+receipt_watcher = ReceiptWatcher(
+    w3,
+    poll_interval=RECEIPT_POLL_INTERVAL,
+    timeout=RECEIPT_TIMEOUT,
+    on_dropped=lambda nonce, sender: signer_pool.get(sender).nonces.mark_dropped(nonce),
+)
+gas_cache = GasEstimateCache(
+    ttl=float(os.getenv("GAS_ESTIMATE_TTL", 600)),
+    margin=float(os.getenv("GAS_ESTIMATE_MARGIN", 0.2)),
+)
 
 
 nft_contract = w3.eth.contract(address=nft_address, abi=nft_abi)
 transfer_contract = w3.eth.contract(address=transfer_address, abi=transfer_abi)
-logger.info(f"NFT contract initialized at: {nft_address}")
-logger.info(f"Transfer contract initialized at: {transfer_address}")
+logger.info("NFT contract initialized at: %s", nft_address)
+logger.info("Transfer contract initialized at: %s", transfer_address)
+signer_pool.contract = transfer_contract
+
+# NFT Transfer and CoinSpent events copied into a local SQLite file for
+# /nfts and /spends. One worker per host tails the chain; set
+# EVENT_INDEX_START_BLOCK to the deployment block for a full history.
+EVENT_INDEX_START_BLOCK = os.getenv("EVENT_INDEX_START_BLOCK")
+event_indexer = EventIndexer(
+    w3,
+    nft_contract,
+    transfer_contract,
+    os.getenv("EVENT_INDEX_PATH", "events.db"),
+    start_block=int(EVENT_INDEX_START_BLOCK) if EVENT_INDEX_START_BLOCK else None,
+    confirmations=int(os.getenv("EVENT_INDEX_CONFIRMATIONS", 3)),
+    chunk_size=int(os.getenv("EVENT_INDEX_CHUNK", 2000)),
+    max_chunk=int(os.getenv("EVENT_INDEX_MAX_CHUNK", 10000)),
+    poll_interval=float(os.getenv("EVENT_INDEX_POLL_INTERVAL", 12)),
+)
+
+COMPLETION_TOKEN_URI = "https://ipfs.io/ipfs/QmActualHash"
+# NFT_MINT_MODE=shared mints completion NFTs without storing a token URI;
+# tokenURI comes from the NFT contract's shared base URI instead (deploy
+# with --base-uri). NFT_VARIANT is appended to it when non-zero.
+SHARED_URI_MINTS = os.getenv("NFT_MINT_MODE", "uri") == "shared"
+NFT_VARIANT = int(os.getenv("NFT_VARIANT", 0))
+if SHARED_URI_MINTS and not any(
+    item.get("name") == "awardCompletionShared" for item in transfer_abi
+):
+    logger.error(
+        "NFT_MINT_MODE=shared but the transfer ABI has no awardCompletionShared; "
+        "run `python contract_artifacts.py build`"
+    )
+    SHARED_URI_MINTS = False
+# Only the transfer contract may call mintShared, so the split path mints
+# through its mintSharedOnly; a build without it mints with a URI there.
+SHARED_SPLIT_MINTS = SHARED_URI_MINTS and any(
+    item.get("name") == "mintSharedOnly" for item in transfer_abi
+)
 
 DB_CONFIG = {
     "host": os.getenv("HOST"),
     "user": os.getenv("USER"),
     "password": os.getenv("PASSWORD"),
     "database": os.getenv("DATABASE"),
-    "port": 4000,
+    "port": int(os.getenv("DB_PORT", 4000)),
 }
 
+db_pool = ConnectionPool(
+    DB_CONFIG,
+    size=int(os.getenv("DB_POOL_SIZE", 5)),
+    max_age=float(os.getenv("DB_POOL_MAX_AGE", 1800)),
+    checkout_timeout=float(os.getenv("DB_POOL_TIMEOUT", 5)),
+    validate_idle=float(os.getenv("DB_POOL_VALIDATE_IDLE", 5)),
+    on_query=lambda sql, seconds: SQL_LATENCY.observe(
+        seconds, statement=statement_label(sql)
+    ),
+    on_connect=DB_CONNECT_LATENCY.observe,
+)
 
-def get_db_connection():
-    try:
-        connection = mysql.connector.connect(**DB_CONFIG)
-        if connection.is_connected():
-            logger.info("Connected to MySQL database")
-            return connection
-        logger.error("MySQL connection established but not connected")
-        return None
-    except Error as e:
-        logger.error(f"Database connection failed: {e}")
-        return None
 
+# LEDGER_BACKEND=sqlite keeps balances in a local WAL-mode file instead of
+# the remote database (single-node deployments and benchmarks).
+LEDGER_BACKEND = os.getenv("LEDGER_BACKEND", "mysql")
+if LEDGER_BACKEND == "sqlite":
+    ledger = SQLiteLedger(
+        os.getenv("LEDGER_SQLITE_PATH", "ledger.db"),
+        on_query=lambda sql, seconds: SQL_LATENCY.observe(
+            seconds, statement=statement_label(sql)
+        ),
+    )
+elif LEDGER_BACKEND == "mysql":
+    ledger = MySQLLedger(db_pool)
+else:
+    raise ValueError(f"Unknown LEDGER_BACKEND {LEDGER_BACKEND!r}")
 
-try:
-    connection = get_db_connection()
-    if connection:
-        logger.info("Database connection successful on startup")
-        connection.close()
-    else:
-        logger.error("Database connection failed on startup")
-except Exception as e:
-    logger.error(f"Database startup check failed: {e}")
+balance_cache = BalanceCache(
+    max_entries=int(os.getenv("BALANCE_CACHE_SIZE", 10000)),
+    ttl=float(os.getenv("BALANCE_CACHE_TTL", 30)),
+    redis_url=os.getenv("BALANCE_CACHE_REDIS_URL"),
+)
+
+
+def forget_balances(addresses):
+    # A flush moves points from the buffer into the ledger; whatever was
+    # cached for those players is read again in full on the next lookup.
+    for address in addresses:
+        balance_cache.invalidate(address)
+
+
+balance_buffer = None
+if os.getenv("BALANCE_WRITE_BEHIND") == "1":
+    balance_buffer = BalanceWriteBuffer(
+        ledger,
+        flush_interval=float(os.getenv("BALANCE_FLUSH_INTERVAL_MS", 200)) / 1000,
+        max_entries=int(os.getenv("BALANCE_FLUSH_MAX_ENTRIES", 500)),
+        max_pending_value=int(os.getenv("BALANCE_MAX_PENDING", 10000)),
+        on_flush=forget_balances,
+    )
+    logger.info("Write-behind balance buffer enabled")
+
+# Rebuilt from the ledger on a background thread once a worker serves its
+# first request; the balance-writing routes keep it current in between.
+leaderboard = Leaderboard(
+    ledger.balances,
+    refresh_interval=float(os.getenv("LEADERBOARD_REFRESH_INTERVAL", 300)),
+)
+
+puzzle_pool = PuzzlePool(GridEngine(), size=int(os.getenv("PUZZLE_POOL_SIZE", 16)))
+
+# Sessions are signed tokens, so any worker can check a game another one
+# issued; GAME_SESSION_SECRET must then be the same everywhere, and by
+# default is derived from PRIVATE_KEY. Claims are recorded in the ledger.
+game_sessions = SessionStore(
+    os.getenv("GAME_SESSION_SECRET") or derive_secret(private_key),
+    ttl=float(os.getenv("GAME_SESSION_TTL", 900)),
+)
+ALLOW_CLIENT_POINTS = os.getenv("ALLOW_CLIENT_POINTS") == "1"
+
+payout_queue = PayoutQueue(
+    workers=int(os.getenv("PAYOUT_WORKERS", 4)),
+    job_ttl=float(os.getenv("PAYOUT_JOB_TTL", 3600)),
+)
+
+
+# Import never talks to the node or the database; these checks run on a
+# background thread once a worker serves its first request.
+health = HealthChecker(
+    {"web3": lambda: w3.is_connected(), "database": ledger.ping},
+    interval=float(os.getenv("HEALTH_CHECK_INTERVAL", 30)),
+)
+
+
+@app.before_request
+def start_request_timer():
+    registry.ensure_writer()
+    health.ensure_started()
+    leaderboard.ensure_started()
+    event_indexer.ensure_started()
+    g.request_start = time.perf_counter()
+
+
+@app.after_request
+def record_request_latency(response):
+    start = g.pop("request_start", None)
+    if start is not None:
+        REQUEST_LATENCY.observe(
+            time.perf_counter() - start,
+            route=request.endpoint or "unmatched",
+            method=request.method,
+            status=response.status_code,
+        )
+    return response
+
+
+@app.route("/health", methods=["GET"])
+def health_status():
+    status = health.status()
+    return jsonify(status), 200 if status["ready"] else 503
+
+
+@app.route("/metrics", methods=["GET"])
+def metrics():
+    return Response(registry.render(), mimetype="text/plain; version=0.0.4")
 
 
 @app.route("/")
 def index():
-    logger.info("Serving index.html from root")
-    try:
-        return send_from_directory(app.static_folder, "index.html")
-    except FileNotFoundError:
-        logger.error("index.html not found in root")
-        return jsonify({"error": "index.html not found"}), 404
+    return send_asset("index.html")
 
 
 @app.route("/<path:path>")
 def serve_static(path):
-    logger.info(f"Serving file from root: {path}")
-    try:
-        return send_from_directory(app.static_folder, path)
-    except FileNotFoundError:
-        logger.error(f"File not found: {path}")
+    return send_asset(path)
+
+
+def send_asset(path):
+    asset, fingerprinted = static_assets.lookup(path)
+    if asset is None:
+        logger.error("File not found: %s", path)
         return jsonify({"error": f"File {path} not found"}), 404
+    status, body, headers = static_assets.response_parts(
+        asset,
+        fingerprinted,
+        request.headers.get("Accept-Encoding"),
+        request.headers.get("If-None-Match"),
+    )
+    return Response(body, status=status, mimetype=asset.mimetype, headers=headers)
 
 
 @app.route("/debug/static-files", methods=["GET"])
 def list_static_files():
-    try:
-        files = os.listdir(app.static_folder)
-        logger.info(f"Root folder contents: {files}")
-        return jsonify({"static_files": files})
-    except Exception as e:
-        logger.error(f"Error listing root files: {e}")
-        return jsonify({"error": str(e)}), 500
+    listing = static_assets.listing()
+    return jsonify({"static_files": list(listing), "assets": listing})
+
+
+@app.route("/debug/db-pool", methods=["GET"])
+def db_pool_stats():
+    return jsonify(ledger.stats())
+
+
+@app.route("/debug/nonce", methods=["GET"])
+def nonce_stats():
+    return jsonify([signer.nonces.snapshot() for signer in signer_pool.signers])
+
+
+@app.route("/debug/signers", methods=["GET"])
+def signer_stats():
+    return jsonify(signer_pool.snapshot())
+
+
+@app.route("/debug/contract-funds", methods=["GET"])
+def contract_funds_stats():
+    return jsonify(contract_funds.snapshot())
+
+
+@app.route("/debug/fees", methods=["GET"])
+def fee_stats():
+    return jsonify(fee_oracle.snapshot())
+
+
+@app.route("/debug/rpc", methods=["GET"])
+def rpc_stats():
+    if not isinstance(w3.provider, PooledHTTPProvider):
+        return jsonify({"error": "Provider does not record call timings"}), 404
+    return jsonify(w3.provider.stats())
+
+
+@app.route("/debug/receipts", methods=["GET"])
+def receipt_watcher_stats():
+    return jsonify(receipt_watcher.snapshot())
+
+
+@app.route("/debug/gas-cache", methods=["GET"])
+def gas_cache_stats():
+    return jsonify(gas_cache.snapshot())
+
+
+@app.route("/debug/balance-cache", methods=["GET"])
+def balance_cache_stats():
+    return jsonify(balance_cache.snapshot())
+
+
+@app.route("/debug/puzzle-pool", methods=["GET"])
+def puzzle_pool_stats():
+    return jsonify(puzzle_pool.snapshot())
+
+
+@app.route("/debug/sessions", methods=["GET"])
+def session_stats():
+    return jsonify(game_sessions.snapshot())
+
+
+@app.route("/debug/leaderboard", methods=["GET"])
+def leaderboard_stats():
+    return jsonify(leaderboard.snapshot())
+
+
+@app.route("/debug/indexer", methods=["GET"])
+def indexer_stats():
+    return jsonify(event_indexer.snapshot())
 
 
 @app.route("/api", methods=["GET"])
@@ -142,90 +430,153 @@ def api_index():
     )
 
 
+@app.route("/grid", methods=["GET"])
+def get_grid():
+    try:
+        category = category_index(request.args.get("category"))
+    except ValueError as e:
+        return jsonify({"valid": False, "error": str(e)}), 400
+    try:
+        puzzle = puzzle_pool.take(category)
+        session_id = game_sessions.create(puzzle)
+    except Exception as e:
+        logger.error("Error in /grid: %s", e, exc_info=True)
+        return jsonify({"valid": False, "error": str(e)}), 500
+    # Answer placements stay on the server; finds are checked by /submitWord.
+    return jsonify(
+        {
+            "valid": True,
+            "session_id": session_id,
+            "category": puzzle["category"],
+            "name": puzzle["name"],
+            "words": puzzle["words"],
+            "grid": puzzle["grid"],
+        }
+    )
+
+
+@app.route("/submitWord", methods=["POST"])
+def submit_word():
+    data = request.get_json(silent=True) or {}
+    try:
+        word = game_sessions.submit(data.get("session_id"), data.get("path"))
+    except KeyError:
+        return jsonify({"valid": False, "error": "Unknown or expired session"}), 404
+    return jsonify({"valid": True, "found": word is not None, "word": word})
+
+
+def claim_points(data):
+    # Points are the words whose paths the client sends in "paths", checked
+    # against the session; the count sent by the client is only honoured
+    # when ALLOW_CLIENT_POINTS=1.
+    session_id = data.get("session_id")
+    if session_id:
+        session = game_sessions.get(session_id)
+        if session is None or not ledger.claim_game(session.id, session.expires):
+            return None, "Unknown, expired or already claimed game session"
+        return session.points(data.get("paths")), None
+    if ALLOW_CLIENT_POINTS:
+        return data.get("points", 0), None
+    return None, "session_id is required"
+
+
+def release_session(session_id):
+    # Undo the claim after a payout that failed, so the points can still go
+    # to the wallet balance instead.
+    session = game_sessions.get(session_id)
+    if session is None:
+        return
+    try:
+        ledger.release_game(session.id)
+    except Exception as e:
+        logger.error("Could not release game session %s: %s", session.id, e)
+
+
 @app.route("/balance", methods=["POST"])
 def get_balance():
-    connection = None
     try:
         data = request.get_json()
-        logger.info(f"/balance request: {data}")
+        logger.info("/balance request: %s", data)
         address = data.get("address", "")
         if not address or not is_valid_ethereum_address(address):
-            logger.error(f"Invalid Ethereum address: {address}")
+            logger.error("Invalid Ethereum address: %s", address)
             return jsonify({"valid": False, "error": "Invalid Ethereum address"}), 400
-        connection = get_db_connection()
-        if not connection:
-            logger.error("DB connection failed")
-            return jsonify({"valid": False, "error": "Database connection failed"}), 500
-        cursor = connection.cursor()
-        cursor.execute("SELECT balance FROM token WHERE accNo = %s", (address,))
-        result = cursor.fetchone()
-        if result:
-            balance = result[0]
-            logger.info(f"Balance for {address}: {balance}")
+        balance = balance_cache.get(address)
+        if balance is not None:
+            logger.info("Balance for %s: %s (cached)", address, balance)
             return jsonify({"valid": True, "balance": balance})
-        logger.info(f"No balance for {address}, inserting 0")
-        cursor.execute(
-            "INSERT INTO token (accNo, balance) VALUES (%s, %s)", (address, 0)
-        )
-        connection.commit()
-        return jsonify({"valid": True, "balance": 0})
+        balance = read_balance(address)
+        balance_cache.set(address, balance)
+        logger.info("Balance for %s: %s", address, balance)
+        return jsonify({"valid": True, "balance": balance})
     except Exception as e:
-        logger.error(f"Error in /balance: {e}", exc_info=True)
+        logger.error("Error in /balance: %s", e, exc_info=True)
         return jsonify({"valid": False, "error": str(e)}), 500
-    finally:
-        if connection and connection.is_connected():
-            cursor.close()
-            connection.close()
+
+
+def read_balance(address):
+    # The stored balance plus anything still buffered, read together.
+    if balance_buffer:
+        return balance_buffer.balance(address)
+    return ledger.get_or_create(address)
 
 
 @app.route("/addToBalance", methods=["POST"])
 def add_balance():
-    connection = None
+    data = request.get_json(silent=True) or {}
+    logger.info("/addToBalance request: %s", data)
+    address = data.get("address", "")
+    if not address or not is_valid_ethereum_address(address):
+        logger.error("Invalid Ethereum address: %s", address)
+        return jsonify({"valid": False, "error": "Invalid Ethereum address"}), 400
     try:
-        data = request.get_json()
-        logger.info(f"/addToBalance request: {data}")
-        address = data.get("address", "")
-        points = data.get("points", 0)
-        if not address or not is_valid_ethereum_address(address):
-            logger.error(f"Invalid Ethereum address: {address}")
-            return jsonify({"valid": False, "error": "Invalid Ethereum address"}), 400
-        if not isinstance(points, int) or points < 0:
-            logger.error(f"Invalid points: {points}")
-            return (
-                jsonify(
-                    {"valid": False, "error": "Points must be a non-negative integer"}
-                ),
-                400,
-            )
-        connection = get_db_connection()
-        if not connection:
-            logger.error("DB connection failed")
-            return jsonify({"valid": False, "error": "Database connection failed"}), 500
-        cursor = connection.cursor()
-        cursor.execute("SELECT balance FROM token WHERE accNo = %s", (address,))
-        result = cursor.fetchone()
-        if not result:
-            logger.info(f"No balance for {address}, inserting {points}")
-            cursor.execute(
-                "INSERT INTO token (accNo, balance) VALUES (%s, %s)", (address, points)
-            )
-            connection.commit()
-            return jsonify({"valid": True, "balance": points})
-        current_balance = result[0]
-        new_balance = current_balance + points
-        cursor.execute(
-            "UPDATE token SET balance = %s WHERE accNo = %s", (new_balance, address)
-        )
-        connection.commit()
-        logger.info(f"Updated balance for {address}: {new_balance}")
-        return jsonify({"valid": True, "balance": new_balance})
+        points, error = claim_points(data)
     except Exception as e:
-        logger.error(f"Error in /addToBalance: {e}", exc_info=True)
+        logger.error("Error in /addToBalance: %s", e, exc_info=True)
         return jsonify({"valid": False, "error": str(e)}), 500
-    finally:
-        if connection and connection.is_connected():
-            cursor.close()
-            connection.close()
+    if error:
+        logger.error("Rejected /addToBalance for %s: %s", address, error)
+        return jsonify({"valid": False, "error": error}), 409
+    if not isinstance(points, int) or points < 0:
+        logger.error("Invalid points: %s", points)
+        return (
+            jsonify({"valid": False, "error": "Points must be a non-negative integer"}),
+            400,
+        )
+    response, credited = credit_points(address, points)
+    if not credited and data.get("session_id"):
+        release_session(data["session_id"])
+    return response
+
+
+def credit_points(address, points):
+    # Returns (response, credited). Once the points are buffered or written
+    # the session stays claimed, even if a later step fails.
+    credited = False
+    try:
+        if balance_buffer:
+            # Make sure the player's row exists before buffering, so that a
+            # failed read leaves nothing credited.
+            if balance_cache.get(address) is None:
+                ledger.get_or_create(address)
+            credited = True
+            balance_buffer.add(address, points)
+            new_balance = balance_cache.incr(address, points)
+            if new_balance is None:
+                new_balance = balance_buffer.balance(address)
+                balance_cache.set(address, new_balance)
+            leaderboard.update(address, new_balance)
+            logger.info("Buffered %s points for %s: %s", points, address, new_balance)
+            return jsonify({"valid": True, "balance": new_balance}), credited
+        new_balance = ledger.increment(address, points)
+        credited = True
+        balance_cache.set(address, new_balance)
+        leaderboard.update(address, new_balance)
+        logger.info("Updated balance for %s: %s", address, new_balance)
+        return jsonify({"valid": True, "balance": new_balance}), credited
+    except Exception as e:
+        logger.error("Error in /addToBalance: %s", e, exc_info=True)
+        return (jsonify({"valid": False, "error": str(e)}), 500), credited
 
 
 def is_valid_ethereum_address(address):
@@ -242,285 +593,696 @@ def is_valid_ethereum_address(address):
 def verify_address():
     try:
         data = request.get_json()
-        logger.info(f"/verifyAddress request: {data}")
+        logger.info("/verifyAddress request: %s", data)
         address = data.get("address", "")
         if not is_valid_ethereum_address(address):
-            logger.error(f"Invalid Ethereum address: {address}")
+            logger.error("Invalid Ethereum address: %s", address)
             return jsonify({"valid": False, "message": "Invalid Ethereum address"}), 400
-        logger.info(f"Valid Ethereum address: {address}")
+        logger.info("Valid Ethereum address: %s", address)
         return jsonify({"valid": True, "message": "Connected"})
     except Exception as e:
-        logger.error(f"Error in /verifyAddress: {e}", exc_info=True)
+        logger.error("Error in /verifyAddress: %s", e, exc_info=True)
         return jsonify({"valid": False, "message": str(e)}), 500
 
 
+@app.route("/leaderboard", methods=["GET"])
+def get_leaderboard():
+    try:
+        limit = min(max(int(request.args.get("limit", 10)), 1), 100)
+        offset = max(int(request.args.get("offset", 0)), 0)
+    except ValueError:
+        return (
+            jsonify({"valid": False, "error": "limit and offset must be integers"}),
+            400,
+        )
+    if not leaderboard.ready:
+        return jsonify({"valid": False, "error": "Leaderboard is loading"}), 503
+    return jsonify(
+        {
+            "valid": True,
+            "players": len(leaderboard),
+            "leaderboard": leaderboard.top(limit, offset),
+        }
+    )
+
+
+@app.route("/rank/<address>", methods=["GET"])
+def get_rank(address):
+    if not is_valid_ethereum_address(address):
+        return jsonify({"valid": False, "error": "Invalid Ethereum address"}), 400
+    if not leaderboard.ready:
+        return jsonify({"valid": False, "error": "Leaderboard is loading"}), 503
+    entry = leaderboard.rank(address)
+    if entry is None:
+        return jsonify({"valid": False, "error": "Address has no ranked balance"}), 404
+    return jsonify({"valid": True, **entry})
+
+
+@app.route("/nfts/<address>", methods=["GET"])
+def get_nfts(address):
+    if not is_valid_ethereum_address(address):
+        return jsonify({"valid": False, "error": "Invalid Ethereum address"}), 400
+    indexed_block = event_indexer.checkpoint()
+    if indexed_block is None:
+        return jsonify({"valid": False, "error": "Event index is loading"}), 503
+    return jsonify(
+        {
+            "valid": True,
+            "address": address,
+            "indexed_block": indexed_block,
+            "nfts": event_indexer.nfts(address),
+        }
+    )
+
+
+@app.route("/spends/<address>", methods=["GET"])
+def get_spends(address):
+    if not is_valid_ethereum_address(address):
+        return jsonify({"valid": False, "error": "Invalid Ethereum address"}), 400
+    try:
+        limit = min(max(int(request.args.get("limit", 50)), 1), 500)
+        offset = max(int(request.args.get("offset", 0)), 0)
+    except ValueError:
+        return (
+            jsonify({"valid": False, "error": "limit and offset must be integers"}),
+            400,
+        )
+    indexed_block = event_indexer.checkpoint()
+    if indexed_block is None:
+        return jsonify({"valid": False, "error": "Event index is loading"}), 503
+    return jsonify(
+        {
+            "valid": True,
+            "address": address,
+            "indexed_block": indexed_block,
+            **event_indexer.spends(address, limit, offset),
+        }
+    )
+
+
+def prefetch_payout_state(calls=()):
+    # The pending nonce, fee history and gas estimate a payout may need don't
+    # depend on each other: when more than one is missing, fetch them in a
+    # single JSON-RPC batch. Anything that fails here is fetched again the
+    # usual way by the component that needs it.
+    calls = list(calls)
+    for signer in signer_pool.signers:
+        if signer.active and signer.nonces.needs_sync():
+            calls.append(
+                (
+                    "eth_getTransactionCount",
+                    [signer.address, "pending"],
+                    lambda result, nonces=signer.nonces: nonces.sync(to_int(result)),
+                )
+            )
+    if fee_oracle.is_cold():
+        calls.append(
+            ("eth_feeHistory", fee_oracle.history_params(), fee_oracle.refresh)
+        )
+    if contract_funds.is_cold():
+        calls.append(
+            ("eth_getBalance", contract_funds.balance_params(), contract_funds.refresh)
+        )
+    if len(calls) < 2:
+        return
+    try:
+        results = batch(w3, [(method, params) for method, params, _ in calls])
+    except Exception as e:
+        logger.info("Payout prefetch batch failed: %s", e)
+        return
+    for (method, _, apply), result in zip(calls, results):
+        if isinstance(result, Exception):
+            logger.info("Batched %s failed: %s", method, result)
+            continue
+        apply(result)
+
+
+def estimate_gas(contract, contract_fn):
+    limit, key = gas_cache.lookup(contract_fn)
+    if limit is not None:
+        prefetch_payout_state()
+        return limit, key
+    estimated = {}
+    data = contract.encodeABI(fn_name=contract_fn.fn_name, args=contract_fn.args)
+    prefetch_payout_state(
+        [
+            (
+                "eth_estimateGas",
+                [{"from": my_address, "to": contract.address, "data": data}],
+                lambda result: estimated.update(
+                    limit=gas_cache.store(key, to_int(result))
+                ),
+            )
+        ]
+    )
+    if "limit" not in estimated:
+        estimated["limit"] = gas_cache.store(
+            key, contract_fn.estimate_gas({"from": my_address})
+        )
+    return estimated["limit"], key
+
+
+def send_transaction(job, build_tx, tier="standard"):
+    # Signs with the least busy signer; the signer stays counted as in
+    # flight until wait_for_receipt() returns for this transaction.
+    prefetch_payout_state()
+    sent = {}
+    unfunded = set()
+    while True:
+        signer = signer_pool.acquire(exclude=unfunded)
+
+        def sign_and_send(nonce):
+            tx = build_tx(
+                {
+                    "from": signer.address,
+                    "nonce": nonce,
+                    "chainId": chain_id,
+                    **fee_oracle.fees(tier),
+                }
+            )
+            signed_tx = w3.eth.account.sign_transaction(
+                tx, private_key=signer.private_key
+            )
+            sent["tx"] = tx
+            try:
+                return w3.eth.send_raw_transaction(signed_tx.raw_transaction)
+            except Exception as e:
+                if not is_already_known(e):
+                    raise
+                return signed_tx.hash
+
+        try:
+            nonce, tx_hash = signer.nonces.send(sign_and_send)
+            break
+        except Exception as e:
+            signer_pool.release(signer)
+            if not is_funds_error(e):
+                raise
+            signer_pool.deactivate(signer, str(e))
+            unfunded.add(signer.address)
+    if job:
+        job.record_tx(tx_hash)
+    logger.info(
+        "Transaction sent: %s (signer %s, nonce %s)",
+        tx_hash.hex(),
+        signer.address,
+        nonce,
+    )
+    return sent["tx"], tx_hash
+
+
+def wait_for_receipt(tx_hash, tx, job=None, tier="standard"):
+    # The shared receipt watcher reports when any hash sent for this nonce is
+    # mined; if that takes longer than FEE_BUMP_AFTER seconds the transaction
+    # is re-sent with bumped fees. Timeouts and dropped nonces are detected
+    # by the watcher and raised from the future.
+    signer = signer_pool.get(tx["from"])
+    watch = receipt_watcher.watch(tx_hash, tx["nonce"], signer.address)
+    try:
+        return _wait_for_receipt(signer, watch, tx, job, tier)
+    finally:
+        signer_pool.release(signer)
+
+
+def _wait_for_receipt(signer, watch, tx, job, tier):
+    nonce = tx["nonce"]
+    bumps = 0
+    while True:
+        try:
+            receipt = watch.future.result(timeout=FEE_BUMP_AFTER)
+        except FutureTimeout:
+            if bumps >= FEE_MAX_BUMPS:
+                continue
+            bumped = fee_oracle.bump(tx, tier)
+            signed_tx = w3.eth.account.sign_transaction(
+                bumped, private_key=signer.private_key
+            )
+            try:
+                replacement = w3.eth.send_raw_transaction(signed_tx.raw_transaction)
+            except Exception as e:
+                # Usually "nonce too low": one of the earlier hashes was
+                # mined in the meantime and the watcher will pick it up.
+                logger.info("Fee bump for nonce %s not sent: %s", nonce, e)
+                continue
+            tx = bumped
+            bumps += 1
+            receipt_watcher.add_hash(watch, replacement)
+            if job:
+                job.record_tx(replacement)
+            logger.info(
+                "Bumped fees for nonce %s: %s (maxFeePerGas %s)",
+                nonce,
+                replacement.hex(),
+                bumped["maxFeePerGas"],
+            )
+            continue
+        signer.nonces.confirm(nonce)
+        return receipt
+
+
+def payout_tier(job):
+    return FEE_TIERS.get(job.kind, "standard") if job else "standard"
+
+
+def send_ether(job, recipient_address, amount):
+    tier = payout_tier(job)
+    tx, tx_hash = send_transaction(
+        job,
+        lambda params: {
+            **params,
+            "to": w3.to_checksum_address(recipient_address),
+            "value": amount,
+            "gas": 21000,
+        },
+        tier,
+    )
+    return wait_for_receipt(tx_hash, tx, job, tier)
+
+
+def submit_award_batch(jobs):
+    players = [w3.to_checksum_address(job.address) for job in jobs]
+    if SHARED_URI_MINTS:
+        award_call = transfer_contract.functions.awardCompletionBatchShared(
+            players, NFT_VARIANT
+        )
+    else:
+        award_call = transfer_contract.functions.awardCompletionBatch(
+            players, COMPLETION_TOKEN_URI
+        )
+    gas, gas_key = estimate_gas(transfer_contract, award_call)
+    tx, tx_hash = send_transaction(
+        None,
+        lambda params: award_call.build_transaction({**params, "gas": gas}),
+        payout_tier(jobs[0]),
+    )
+    for job in jobs:
+        job.record_tx(tx_hash)
+    receipt = wait_for_receipt(tx_hash, tx, tier=payout_tier(jobs[0]))
+    gas_cache.check_receipt(gas_key, gas, receipt)
+    if receipt.status == 0:
+        logger.error("Batch award transaction failed: %s", tx_hash.hex())
+        return [(False, "Transaction failed")] * len(jobs)
+    results = [(False, "Ether transfer to player failed")] * len(jobs)
+    awarded = transfer_contract.events.CompletionAwarded().process_receipt(
+        receipt, errors=DISCARD
+    )
+    for event in awarded:
+        results[event.args.index] = (True, "Successfully sent NFT and Ether")
+    logger.info("Batch award mined: %s/%s players paid", len(awarded), len(jobs))
+    return results
+
+
+award_batcher = None
+if float(os.getenv("PAYOUT_BATCH_WINDOW_MS", 0)) > 0:
+    if any(item.get("name") == "awardCompletionBatch" for item in transfer_abi):
+        award_batcher = BatchAggregator(
+            submit_award_batch,
+            window=float(os.getenv("PAYOUT_BATCH_WINDOW_MS")) / 1000,
+            max_batch=int(os.getenv("PAYOUT_BATCH_SIZE", 20)),
+        )
+        logger.info("Batched completion awards enabled")
+    else:
+        logger.error(
+            "PAYOUT_BATCH_WINDOW_MS is set but the transfer ABI has no "
+            "awardCompletionBatch; run `python contract_artifacts.py build`"
+        )
+
+
+def top_up_contract(amount):
+    deposit_call = transfer_contract.functions.deposit()
+    gas, _ = estimate_gas(transfer_contract, deposit_call)
+    tx, tx_hash = send_transaction(
+        None,
+        lambda params: deposit_call.build_transaction(
+            {**params, "value": amount, "gas": gas}
+        ),
+    )
+    receipt = wait_for_receipt(tx_hash, tx)
+    if receipt.status == 0:
+        raise RuntimeError(f"deposit() failed: {tx_hash.hex()}")
+
+
+# Alerts when the transfer contract's uncommitted balance falls below
+# CONTRACT_LOW_WATER_ETH. With CONTRACT_TOP_UP_ETH set, the signer pool also
+# deposits that much through deposit(). One worker per host, holding
+# CONTRACT_FUNDS_LOCK, alerts and tops up. Reservations only cover the
+# worker's own payouts, so with several workers set the low-water mark to
+# at least workers x threads x 0.01 ETH (see ContractFunds).
+CONTRACT_TOP_UP_ETH = os.getenv("CONTRACT_TOP_UP_ETH", "0")
+contract_funds = ContractFunds(
+    w3,
+    transfer_address,
+    refresh_interval=float(os.getenv("CONTRACT_BALANCE_REFRESH_INTERVAL", 30)),
+    low_water=w3.to_wei(os.getenv("CONTRACT_LOW_WATER_ETH", "0.05"), "ether"),
+    top_up=top_up_contract,
+    top_up_amount=w3.to_wei(CONTRACT_TOP_UP_ETH, "ether"),
+    alert_interval=float(os.getenv("CONTRACT_ALERT_INTERVAL", 300)),
+    lock_path=os.getenv("CONTRACT_FUNDS_LOCK", "contract-funds.lock"),
+)
+
+
+def track_payout(handler):
+    def run(job):
+        start = time.perf_counter()
+        ok = False
+        try:
+            with PAYOUTS_IN_FLIGHT.track(kind=job.kind):
+                ok, message = handler(job)
+            return ok, message
+        finally:
+            PAYOUT_OUTCOMES.inc(kind=job.kind, status=MINED if ok else FAILED)
+            PAYOUT_DURATION.observe(time.perf_counter() - start, kind=job.kind)
+
+    return run
+
+
+def release_on_failure(handler, session_id):
+    # A game whose payout failed can still be credited via /addToBalance.
+    def run(job):
+        ok = False
+        try:
+            ok, message = handler(job)
+            return ok, message
+        finally:
+            if not ok:
+                release_session(session_id)
+
+    return run
+
+
+def run_payout(kind, recipient_address, points, handler, run_async):
+    handler = track_payout(handler)
+    if run_async:
+        job = payout_queue.submit(kind, recipient_address, points, handler)
+        return (
+            jsonify(
+                {
+                    "valid": True,
+                    "message": "Payout queued",
+                    "job_id": job.id,
+                    "status": job.status,
+                }
+            ),
+            202,
+        )
+    job = PayoutJob(kind, recipient_address, points)
+    ok, message = handler(job)
+    job.finish(ok, message)
+    if not ok:
+        return jsonify({"valid": False, "message": message}), 500
+    return jsonify({"valid": True, "message": message})
+
+
+@app.route("/payout/<job_id>", methods=["GET"])
+def payout_status(job_id):
+    job = payout_queue.get(job_id)
+    if not job:
+        return jsonify({"valid": False, "message": "Unknown payout job"}), 404
+    return jsonify({"valid": job.status != FAILED, **job.to_dict()})
+
+
+def restore_balance(address, points):
+    new_balance = ledger.increment(address, points)
+    balance_cache.invalidate(address)
+    leaderboard.update(address, new_balance)
+    logger.info("Restored %s points to %s", points, address)
+
+
+def process_wallet_transfer(job):
+    # Pays out the balance held on the server, taken (and zeroed) before
+    # anything is sent; it is only put back when the payout certainly
+    # didn't happen.
+    recipient_address = job.address
+    if balance_buffer:
+        # Make buffered increments durable first so they are part of the
+        # payout instead of being flushed back in afterwards.
+        balance_buffer.flush()
+    points = ledger.take(recipient_address)
+    if points <= 0:
+        return False, "No balance to transfer"
+    job.points = points
+    balance_cache.invalidate(recipient_address)
+    leaderboard.update(recipient_address, 0)
+    total_amount = points * 10**15
+    logger.info("Transfer amount for %s points: %s", points, total_amount)
+    PAYOUT_PATHS.inc(path="ether")
+    try:
+        receipt = send_ether(job, recipient_address, total_amount)
+    except Exception:
+        if job.tx_hashes:
+            logger.error(
+                "Payout of %s points to %s has no known outcome; balance stays 0",
+                points,
+                recipient_address,
+            )
+        else:
+            restore_balance(recipient_address, points)
+        raise
+    if receipt.status == 0:
+        logger.error("Transaction failed")
+        restore_balance(recipient_address, points)
+        return False, "Transaction failed"
+    logger.info("Paid out %s points to %s", points, recipient_address)
+    return True, "Successfully sent Ether"
+
+
 @app.route("/walletTransfer", methods=["POST"])
 def wallet_transfer():
-    connection = None
+    # Any "points" in the request is ignored: the amount is the balance
+    # held on the server when the payout runs.
     try:
         data = request.get_json()
-        logger.info(f"/walletTransfer request: {data}")
-        points = data.get("points", 0)
+        logger.info("/walletTransfer request: %s", data)
         recipient_address = data.get("address", "")
         if not is_valid_ethereum_address(recipient_address):
-            logger.error(f"Invalid recipient address: {recipient_address}")
+            logger.error("Invalid recipient address: %s", recipient_address)
             return jsonify({"valid": False, "message": "Invalid Ethereum address"}), 400
-        if not isinstance(points, int) or points <= 0:
-            logger.error(f"Invalid points: {points}")
-            return (
-                jsonify(
-                    {"valid": False, "message": "Points must be a positive integer"}
-                ),
-                400,
-            )
+        balance = balance_cache.get(recipient_address)
+        if balance is None:
+            balance = read_balance(recipient_address)
+        if balance <= 0:
+            return jsonify({"valid": False, "message": "No balance to transfer"}), 400
+        return run_payout(
+            "walletTransfer",
+            recipient_address,
+            balance,
+            process_wallet_transfer,
+            data.get("async", False),
+        )
+    except Exception as e:
+        logger.error("Error in /walletTransfer: %s", e, exc_info=True)
+        return jsonify({"valid": False, "message": str(e)}), 500
+
+
+def process_transfer(job):
+    recipient_address = job.address
+    points = job.points
+    if points != 10:
         total_amount = points * 10**15
-        logger.info(f"Transfer amount for {points} points: {total_amount}")
-        nonce = w3.eth.get_transaction_count(my_address)
-        tx = {
-            "from": my_address,
-            "to": w3.to_checksum_address(recipient_address),
-            "value": total_amount,
-            "nonce": nonce,
-            "chainId": chain_id,
-            "gas": 21000,
-            "gasPrice": w3.to_wei("20", "gwei"),
-        }
-        signed_tx = w3.eth.account.sign_transaction(tx, private_key=private_key)
-        tx_hash = w3.eth.send_raw_transaction(signed_tx.raw_transaction)
-        logger.info(f"Transaction sent: {tx_hash.hex()}")
-        receipt = w3.eth.wait_for_transaction_receipt(tx_hash)
+        logger.info("Transfer amount for %s points: %s", points, total_amount)
+        PAYOUT_PATHS.inc(path="ether")
+        receipt = send_ether(job, recipient_address, total_amount)
         if receipt.status == 0:
             logger.error("Transaction failed")
-            return jsonify({"valid": False, "message": "Transaction failed"}), 500
-        connection = get_db_connection()
-        if not connection:
-            logger.error("DB connection failed")
-            return jsonify({"valid": False, "error": "Database connection failed"}), 500
-        cursor = connection.cursor()
-        cursor.execute(
-            "UPDATE token SET balance = %s WHERE accNo = %s", (0, recipient_address)
+            return False, "Transaction failed"
+        return True, "Successfully sent Ether"
+
+    token_uri = COMPLETION_TOKEN_URI
+    total_amount = points * 10**15
+    # Check the contract can pay before sending anything; if it can't, a
+    # mined awardCompletion would only revert and fall back anyway.
+    if not contract_funds.reserve(total_amount):
+        logger.info(
+            "Transfer contract can't cover %s wei, paying %s on the split path",
+            total_amount,
+            recipient_address,
         )
-        connection.commit()
-        logger.info(f"Reset balance to 0 for {recipient_address}")
-        return jsonify({"valid": True, "message": "Successfully sent Ether"})
-    except Exception as e:
-        logger.error(f"Error in /walletTransfer: {e}", exc_info=True)
-        return jsonify({"valid": False, "message": str(e)}), 500
+        PAYOUT_PATHS.inc(path="split")
+        return send_split_payout(job, token_uri)
+    released = []
+
+    def release(spent=False):
+        if not released:
+            released.append(True)
+            contract_funds.release(total_amount, spent)
+
+    try:
+        return award_completion(job, token_uri, release)
     finally:
-        if connection and connection.is_connected():
-            cursor.close()
-            connection.close()
+        release()
+
+
+def award_completion(job, token_uri, release):
+    recipient_address = job.address
+    points = job.points
+    if award_batcher:
+        logger.info("Queueing %s for the next award batch", recipient_address)
+        PAYOUT_PATHS.inc(path="batch")
+        # Allow for the window and for the batch queueing behind another
+        # one's receipt. A batch that is still out may yet be mined, so its
+        # reservation counts as spent until the next balance refresh.
+        try:
+            ok, message = award_batcher.add(job).result(
+                timeout=award_batcher.window + 2 * RECEIPT_TIMEOUT
+            )
+        except FutureTimeout:
+            logger.error("Award batch for %s timed out", recipient_address)
+            release(spent=True)
+            return False, "Award batch timed out"
+        release(spent=ok)
+        return ok, message
+
+    logger.info(
+        "Calling awardCompletion for %s with points: %s, tokenURI: %s",
+        recipient_address,
+        points,
+        token_uri,
+    )
+    PAYOUT_PATHS.inc(path="award_completion")
+    if SHARED_URI_MINTS:
+        award_call = transfer_contract.functions.awardCompletionShared(
+            w3.to_checksum_address(recipient_address), points, NFT_VARIANT
+        )
+    else:
+        award_call = transfer_contract.functions.awardCompletion(
+            w3.to_checksum_address(recipient_address), points, token_uri
+        )
+    try:
+        gas, gas_key = estimate_gas(transfer_contract, award_call)
+    except Exception as gas_error:
+        logger.error("Gas estimation failed: %s", gas_error)
+        return False, f"Gas estimation failed: {str(gas_error)}"
+    tx, tx_hash = send_transaction(
+        job,
+        lambda params: award_call.build_transaction({**params, "gas": gas}),
+        payout_tier(job),
+    )
+    receipt = wait_for_receipt(tx_hash, tx, job, payout_tier(job))
+    gas_cache.check_receipt(gas_key, gas, receipt)
+    release(spent=receipt.status != 0)
+    if receipt.status != 0:
+        logger.info("NFT and Ether transferred to %s", recipient_address)
+        return True, "Successfully sent NFT and Ether"
+
+    try:
+        w3.eth.call(
+            {
+                "from": my_address,
+                "to": transfer_address,
+                "data": transfer_contract.encodeABI(
+                    fn_name=award_call.fn_name, args=award_call.args
+                ),
+            },
+            block_identifier=receipt.blockNumber,
+        )
+        logger.error("Transaction failed without specific revert reason")
+        return False, "Transaction failed"
+    except Exception as revert_error:
+        revert_reason = str(revert_error)
+    logger.error("Transaction failed with revert reason: %s", revert_reason)
+    if "insufficient contract balance" in revert_reason.lower():
+        # The cached balance was too optimistic; correct it for the next
+        # payouts.
+        try:
+            contract_funds.refresh()
+        except Exception as e:
+            logger.info("Contract balance refresh failed: %s", e)
+    logger.info("awardCompletion failed, attempting direct Ether transfer")
+    PAYOUT_PATHS.inc(path="award_fallback")
+    return send_split_payout(job, token_uri, revert_reason)
+
+
+def send_split_payout(job, token_uri, revert_reason=None):
+    # Ether from the hot wallet, then a separate mint.
+    recipient_address = job.address
+    ether_receipt = send_ether(job, recipient_address, job.points * 10**15)
+    if ether_receipt.status == 0:
+        logger.error("Ether transfer transaction failed")
+        if revert_reason:
+            return False, f"Transaction failed: {revert_reason}"
+        return False, "Transaction failed"
+
+    # Proceed to mint NFT directly
+    logger.info("Ether transfer succeeded, attempting NFT mint")
+    if SHARED_SPLIT_MINTS:
+        mint_contract = transfer_contract
+        mint_call = transfer_contract.functions.mintSharedOnly(
+            w3.to_checksum_address(recipient_address), NFT_VARIANT
+        )
+    else:
+        mint_contract = nft_contract
+        mint_call = nft_contract.functions.mintNFT(
+            w3.to_checksum_address(recipient_address), token_uri
+        )
+    try:
+        gas, gas_key = estimate_gas(mint_contract, mint_call)
+    except Exception as gas_error:
+        logger.error("NFT mint gas estimation failed: %s", gas_error)
+        return False, f"NFT mint failed: {str(gas_error)}"
+    tx, nft_tx_hash = send_transaction(
+        job,
+        lambda params: mint_call.build_transaction({**params, "gas": gas}),
+        payout_tier(job),
+    )
+    logger.info("NFT mint transaction sent: %s", nft_tx_hash.hex())
+    nft_receipt = wait_for_receipt(nft_tx_hash, tx, job, payout_tier(job))
+    gas_cache.check_receipt(gas_key, gas, nft_receipt)
+    if nft_receipt.status == 0:
+        logger.error("NFT mint transaction failed")
+        try:
+            revert_reason = w3.eth.call(
+                {
+                    "from": my_address,
+                    "to": mint_contract.address,
+                    "data": mint_contract.encodeABI(
+                        fn_name=mint_call.fn_name, args=mint_call.args
+                    ),
+                },
+                block_identifier=nft_receipt.blockNumber,
+            )
+        except Exception as revert_error:
+            revert_reason = str(revert_error)
+        return False, f"NFT mint failed: {revert_reason}"
+    logger.info("NFT and Ether transferred to %s", recipient_address)
+    return True, "Successfully sent NFT and Ether"
 
 
 @app.route("/transfer", methods=["POST"])
 def transfer():
     try:
         data = request.get_json()
-        logger.info(f"/transfer request: {data}")
-        points = data.get("points", 0)
+        logger.info("/transfer request: %s", data)
         recipient_address = data.get("address", "")
         if not is_valid_ethereum_address(recipient_address):
-            logger.error(f"Invalid recipient address: {recipient_address}")
+            logger.error("Invalid recipient address: %s", recipient_address)
             return jsonify({"valid": False, "message": "Invalid Ethereum address"}), 400
+        points, error = claim_points(data)
+        if error:
+            logger.error("Rejected /transfer for %s: %s", recipient_address, error)
+            return jsonify({"valid": False, "message": error}), 409
+        session_id = data.get("session_id")
         if not isinstance(points, int) or points <= 0:
-            logger.error(f"Invalid points: {points}")
+            logger.error("Invalid points: %s", points)
+            if session_id:
+                release_session(session_id)
             return (
                 jsonify(
                     {"valid": False, "message": "Points must be a positive integer"}
                 ),
                 400,
             )
-        if points == 10:
-            token_uri = "https://ipfs.io/ipfs/QmActualHash"
-            logger.info(
-                f"Calling awardCompletion for {recipient_address} with points: {points}, tokenURI: {token_uri}"
-            )
-            nonce = w3.eth.get_transaction_count(my_address)
-            try:
-                gas = transfer_contract.functions.awardCompletion(
-                    w3.to_checksum_address(recipient_address), points, token_uri
-                ).estimate_gas({"from": my_address})
-            except Exception as gas_error:
-                logger.error(f"Gas estimation failed: {gas_error}")
-                return (
-                    jsonify(
-                        {
-                            "valid": False,
-                            "message": f"Gas estimation failed: {str(gas_error)}",
-                        }
-                    ),
-                    500,
-                )
-            tx = transfer_contract.functions.awardCompletion(
-                w3.to_checksum_address(recipient_address), points, token_uri
-            ).build_transaction(
-                {
-                    "from": my_address,
-                    "nonce": nonce,
-                    "chainId": chain_id,
-                    "gas": gas + 10000,
-                    "gasPrice": w3.to_wei("20", "gwei"),
-                }
-            )
-            signed_tx = w3.eth.account.sign_transaction(tx, private_key=private_key)
-            tx_hash = w3.eth.send_raw_transaction(signed_tx.raw_transaction)
-            logger.info(f"Transaction sent: {tx_hash.hex()}")
-            receipt = w3.eth.wait_for_transaction_receipt(tx_hash)
-            if receipt.status == 0:
-                try:
-                    w3.eth.call(
-                        {
-                            "from": my_address,
-                            "to": transfer_address,
-                            "data": transfer_contract.encodeABI(
-                                fn_name="awardCompletion",
-                                args=[
-                                    w3.to_checksum_address(recipient_address),
-                                    points,
-                                    token_uri,
-                                ],
-                            ),
-                        },
-                        block_identifier=receipt.blockNumber,
-                    )
-                except Exception as revert_error:
-                    revert_reason = str(revert_error)
-                    logger.error(
-                        f"Transaction failed with revert reason: {revert_reason}"
-                    )
-                    logger.info(
-                        "awardCompletion failed, attempting direct Ether transfer"
-                    )
-                    nonce += 1
-                    total_amount = points * 10**15
-                    tx_ether = {
-                        "from": my_address,
-                        "to": w3.to_checksum_address(recipient_address),
-                        "value": total_amount,
-                        "nonce": nonce,
-                        "chainId": chain_id,
-                        "gas": 21000,
-                        "gasPrice": w3.to_wei("20", "gwei"),
-                    }
-                    signed_ether_tx = w3.eth.account.sign_transaction(
-                        tx_ether, private_key=private_key
-                    )
-                    ether_tx_hash = w3.eth.send_raw_transaction(
-                        signed_ether_tx.raw_transaction
-                    )
-                    logger.info(
-                        f"Ether transfer transaction sent: {ether_tx_hash.hex()}"
-                    )
-                    ether_receipt = w3.eth.wait_for_transaction_receipt(ether_tx_hash)
-                    if ether_receipt.status == 0:
-                        logger.error("Ether transfer transaction failed")
-                        return (
-                            jsonify(
-                                {
-                                    "valid": False,
-                                    "message": f"Transaction failed: {revert_reason}",
-                                }
-                            ),
-                            500,
-                        )
-                    # Proceed to mint NFT directly
-                    logger.info("Ether transfer succeeded, attempting NFT mint")
-                    nonce += 1
-                    try:
-                        gas = nft_contract.functions.mintNFT(
-                            w3.to_checksum_address(recipient_address), token_uri
-                        ).estimate_gas({"from": my_address})
-                    except Exception as gas_error:
-                        logger.error(f"NFT mint gas estimation failed: {gas_error}")
-                        return (
-                            jsonify(
-                                {
-                                    "valid": False,
-                                    "message": f"NFT mint failed: {str(gas_error)}",
-                                }
-                            ),
-                            500,
-                        )
-                    tx_nft = nft_contract.functions.mintNFT(
-                        w3.to_checksum_address(recipient_address), token_uri
-                    ).build_transaction(
-                        {
-                            "from": my_address,
-                            "nonce": nonce,
-                            "chainId": chain_id,
-                            "gas": gas + 10000,
-                            "gasPrice": w3.to_wei("20", "gwei"),
-                        }
-                    )
-                    signed_nft_tx = w3.eth.account.sign_transaction(
-                        tx_nft, private_key=private_key
-                    )
-                    nft_tx_hash = w3.eth.send_raw_transaction(
-                        signed_nft_tx.raw_transaction
-                    )
-                    logger.info(f"NFT mint transaction sent: {nft_tx_hash.hex()}")
-                    nft_receipt = w3.eth.wait_for_transaction_receipt(nft_tx_hash)
-                    if nft_receipt.status == 0:
-                        logger.error("NFT mint transaction failed")
-                        try:
-                            revert_reason = w3.eth.call(
-                                {
-                                    "from": my_address,
-                                    "to": nft_address,
-                                    "data": nft_contract.encodeABI(
-                                        fn_name="mintNFT",
-                                        args=[
-                                            w3.to_checksum_address(recipient_address),
-                                            token_uri,
-                                        ],
-                                    ),
-                                },
-                                block_identifier=nft_receipt.blockNumber,
-                            )
-                        except Exception as revert_error:
-                            revert_reason = str(revert_error)
-                        return (
-                            jsonify(
-                                {
-                                    "valid": False,
-                                    "message": f"NFT mint failed: {revert_reason}",
-                                }
-                            ),
-                            500,
-                        )
-                    logger.info(f"NFT and Ether transferred to {recipient_address}")
-                    return jsonify(
-                        {"valid": True, "message": "Successfully sent NFT and Ether"}
-                    )
-                logger.error("Transaction failed without specific revert reason")
-                return jsonify({"valid": False, "message": "Transaction failed"}), 500
-            logger.info(f"NFT and Ether transferred to {recipient_address}")
-            return jsonify(
-                {"valid": True, "message": "Successfully sent NFT and Ether"}
-            )
-        else:
-            total_amount = points * 10**15
-            logger.info(f"Transfer amount for {points} points: {total_amount}")
-            nonce = w3.eth.get_transaction_count(my_address)
-            tx = {
-                "from": my_address,
-                "to": w3.to_checksum_address(recipient_address),
-                "value": total_amount,
-                "nonce": nonce,
-                "chainId": chain_id,
-                "gas": 21000,
-                "gasPrice": w3.to_wei("20", "gwei"),
-            }
-            signed_tx = w3.eth.account.sign_transaction(tx, private_key=private_key)
-            tx_hash = w3.eth.send_raw_transaction(signed_tx.raw_transaction)
-            logger.info(f"Transaction sent: {tx_hash.hex()}")
-            receipt = w3.eth.wait_for_transaction_receipt(tx_hash)
-            if receipt.status == 0:
-                logger.error("Transaction failed")
-                return jsonify({"valid": False, "message": "Transaction failed"}), 500
-            return jsonify({"valid": True, "message": "Successfully sent Ether"})
+        handler = process_transfer
+        if session_id:
+            handler = release_on_failure(process_transfer, session_id)
+        return run_payout(
+            "transfer",
+            recipient_address,
+            points,
+            handler,
+            data.get("async", False),
+        )
     except Exception as e:
-        logger.error(f"Error in /transfer: {e}", exc_info=True)
+        logger.error("Error in /transfer: %s", e, exc_info=True)
         return jsonify({"valid": False, "message": str(e)}), 500
 
 
@@ -0,0 +1,1084 @@
+import re
+import os
+import time
+import asyncio
+import logging
+from collections import OrderedDict
+
+import aiomysql
+from quart import Quart, Response, g, request, jsonify
+from quart_cors import cors
+from dotenv import load_dotenv
+from web3 import AsyncWeb3, AsyncHTTPProvider, Web3
+from web3.exceptions import TimeExhausted, TransactionNotFound
+
+from log_setup import configure_logging, parse_mapping, parse_level
+from balance_cache import BalanceCache
+from payout_queue import PayoutJob, FAILED, MINED
+from nonce_manager import NonceManager, is_nonce_error, is_already_known
+from fee_oracle import FeeOracle
+from gas_cache import GasEstimateCache
+from health import HealthChecker
+from static_assets import StaticAssets
+from grid_engine import GridEngine, PuzzlePool, category_index
+from game_sessions import SessionStore, derive_secret
+from leaderboard import Leaderboard
+from ledger import CLAIM_PURGE_INTERVAL, CLAIM_SCHEMA
+from contract_artifacts import ArtifactsMissing, load as load_artifacts
+from event_indexer import EventIndexer
+from rpc_provider import PooledHTTPProvider
+from metrics import (
+    registry,
+    async_rpc_metrics_middleware,
+    statement_label,
+    REQUEST_LATENCY,
+    SQL_LATENCY,
+    PAYOUT_DURATION,
+    PAYOUT_OUTCOMES,
+    PAYOUT_PATHS,
+    PAYOUTS_IN_FLIGHT,
+)
+
+# Async entry point with the same routes and JSON responses as server.py,
+# built on Quart, AsyncWeb3 and aiomysql so one process can keep thousands of
+# balance lookups and payout waits in flight:
+#
+#   uvicorn server_async:app --host 0.0.0.0 --port $PORT
+#
+# Not carried over from server.py:
+#
+#   SIGNER_KEYS         one payout key (PRIVATE_KEY) only: no signer pool,
+#                       operator authorisation check or signer balances
+#   NFT_MINT_MODE       awards always mint with a token URI
+#   CONTRACT_*_ETH      no contract balance cache, low-water alert or top-up;
+#                       an unfunded contract fails the award's gas estimate
+#                       rather than going straight to the split path
+#   LEDGER_BACKEND      MySQL only
+#   BALANCE_WRITE_BEHIND, PAYOUT_BATCH_WINDOW_MS
+#                       no write-behind buffer or award batching
+#   /debug routes
+#
+# Settings that would change who pays or what is minted refuse to start;
+# the others are ignored with a warning.
+
+load_dotenv()
+
+configure_logging(
+    level=os.getenv("LOG_LEVEL", "INFO"),
+    route_levels=parse_mapping(os.getenv("LOG_ROUTE_LEVELS"), parse_level),
+    sample_rates=parse_mapping(
+        os.getenv("LOG_SAMPLE_RATES", "serve_static=0.01,index=0.1,get_balance=0.1"),
+        float,
+    ),
+)
+logger = logging.getLogger(__name__)
+
+app = Quart(__name__, static_folder=None)
+app = cors(
+    app,
+    allow_origin=[
+        "https://blockchain-wordhuntgrid.onrender.com",
+        "http://localhost:3000",
+    ],
+    allow_credentials=True,
+)
+static_assets = StaticAssets(os.path.dirname(os.path.abspath(__file__)))
+
+ALCHEMY_URL = os.getenv("ALCHEMY_URL")
+if not ALCHEMY_URL:
+    logger.error("ALCHEMY_URL not set")
+    raise ValueError("ALCHEMY_URL not set")
+w3 = AsyncWeb3(AsyncHTTPProvider(ALCHEMY_URL))
+w3.middleware_onion.add(async_rpc_metrics_middleware, "metrics")
+
+# Same artifact rules as server.py.
+try:
+    contract_data = load_artifacts(strict=os.getenv("CONTRACT_ARTIFACTS_STRICT") == "1")
+except ArtifactsMissing as e:
+    logger.error("Failed to load contract artifacts: %s", e)
+    raise
+
+my_address = os.getenv("MY_ADDRESS")
+private_key = os.getenv("PRIVATE_KEY")
+nft_address = os.getenv("NFT_CONTRACT_ADDRESS")
+transfer_address = os.getenv("TRANSFER_CONTRACT_ADDRESS")
+if not all([my_address, private_key, nft_address, transfer_address]):
+    logger.error("Missing required environment variables")
+    raise ValueError(
+        "MY_ADDRESS, PRIVATE_KEY, NFT_CONTRACT_ADDRESS, or TRANSFER_CONTRACT_ADDRESS not set"
+    )
+unsupported = [
+    name
+    for name, is_set in [
+        ("SIGNER_KEYS", bool(os.getenv("SIGNER_KEYS", "").strip())),
+        ("NFT_MINT_MODE=shared", os.getenv("NFT_MINT_MODE", "uri") == "shared"),
+        ("CONTRACT_TOP_UP_ETH", float(os.getenv("CONTRACT_TOP_UP_ETH", "0")) > 0),
+        ("LEDGER_BACKEND", os.getenv("LEDGER_BACKEND", "mysql") != "mysql"),
+    ]
+    if is_set
+]
+if unsupported:
+    logger.error("Not supported by server_async, use server.py: %s", unsupported)
+    raise ValueError(f"Not supported by server_async: {', '.join(unsupported)}")
+for name in (
+    "BALANCE_WRITE_BEHIND",
+    "PAYOUT_BATCH_WINDOW_MS",
+    "CONTRACT_LOW_WATER_ETH",
+):
+    if os.getenv(name, "0") not in ("", "0"):
+        logger.warning("%s is ignored by server_async", name)
+my_address = Web3.to_checksum_address(my_address)
+nft_address = Web3.to_checksum_address(nft_address)
+transfer_address = Web3.to_checksum_address(transfer_address)
+chain_id = int(os.getenv("CHAIN_ID", 11155111))
+
+nft_contract = w3.eth.contract(
+    address=nft_address, abi=contract_data["WordHuntNFT"]["abi"]
+)
+transfer_contract = w3.eth.contract(
+    address=transfer_address, abi=contract_data["transfer"]["abi"]
+)
+
+COMPLETION_TOKEN_URI = "https://ipfs.io/ipfs/QmActualHash"
+FEE_TIERS = {
+    "transfer": os.getenv("FEE_TIER_TRANSFER", "fast"),
+    "walletTransfer": os.getenv("FEE_TIER_WALLET_TRANSFER", "standard"),
+}
+FEE_REFRESH_INTERVAL = float(os.getenv("FEE_REFRESH_INTERVAL", 12))
+FEE_BUMP_AFTER = float(os.getenv("FEE_BUMP_AFTER", 60))
+FEE_MAX_BUMPS = int(os.getenv("FEE_MAX_BUMPS", 3))
+RECEIPT_TIMEOUT = float(os.getenv("RECEIPT_TIMEOUT", 300))
+RECEIPT_POLL_INTERVAL = float(os.getenv("RECEIPT_POLL_INTERVAL", 1))
+PAYOUT_JOB_TTL = float(os.getenv("PAYOUT_JOB_TTL", 3600))
+ALLOW_CLIENT_POINTS = os.getenv("ALLOW_CLIENT_POINTS") == "1"
+
+DB_CONFIG = {
+    "host": os.getenv("HOST"),
+    "user": os.getenv("USER"),
+    "password": os.getenv("PASSWORD"),
+    "db": os.getenv("DATABASE"),
+    "port": int(os.getenv("DB_PORT", 4000)),
+}
+
+# Fed from the event loop by refresh_fees(); no thread of its own.
+fee_oracle = FeeOracle(None)
+gas_cache = GasEstimateCache(
+    ttl=float(os.getenv("GAS_ESTIMATE_TTL", 600)),
+    margin=float(os.getenv("GAS_ESTIMATE_MARGIN", 0.2)),
+)
+balance_cache = BalanceCache(
+    max_entries=int(os.getenv("BALANCE_CACHE_SIZE", 10000)),
+    ttl=float(os.getenv("BALANCE_CACHE_TTL", 30)),
+    redis_url=os.getenv("BALANCE_CACHE_REDIS_URL"),
+)
+puzzle_pool = PuzzlePool(GridEngine(), size=int(os.getenv("PUZZLE_POOL_SIZE", 16)))
+# Signed session tokens and the game_claim table, as in server.py.
+game_sessions = SessionStore(
+    os.getenv("GAME_SESSION_SECRET") or derive_secret(private_key),
+    ttl=float(os.getenv("GAME_SESSION_TTL", 900)),
+)
+payout_jobs = OrderedDict()
+payout_tasks = set()
+db_pool = None
+loop = None
+claims_ready = False
+claims_purged_at = 0.0
+
+
+class AsyncNonces:
+    # Event-loop front end for nonce_manager.NonceManager, so gaps and
+    # in-flight nonces follow the same rules as in server.py: the pending
+    # count is fetched with the async client and handed to sync(). Signing
+    # and broadcasting happen under the lock so transactions reach the node
+    # in nonce order.
+
+    def __init__(self, address):
+        self.address = address
+        self.manager = NonceManager(None, address)
+        self._lock = asyncio.Lock()
+
+    async def _sync(self):
+        self.manager.sync(await w3.eth.get_transaction_count(self.address, "pending"))
+
+    async def send(self, send_fn, max_retries=3):
+        async with self._lock:
+            last_error = None
+            for attempt in range(max_retries):
+                if self.manager.needs_sync():
+                    await self._sync()
+                nonce = self.manager.allocate()
+                try:
+                    return nonce, await send_fn(nonce)
+                except Exception as e:
+                    if not is_nonce_error(e):
+                        self.manager.release(nonce)
+                        raise
+                    logger.info("Nonce %s rejected (%s), resyncing", nonce, e)
+                    self.manager.discard(nonce)
+                    await self._sync()
+                    last_error = e
+            raise last_error
+
+    def confirm(self, nonce):
+        self.manager.confirm(nonce)
+
+    def release(self, nonce):
+        self.manager.release(nonce)
+
+
+class AsyncReceiptWatcher:
+    # Event-loop counterpart of receipt_watcher.ReceiptWatcher: one task
+    # follows new blocks while anything is pending and resolves futures
+    # keyed by transaction hash.
+
+    def __init__(self, poll_interval, timeout):
+        self.poll_interval = poll_interval
+        self.timeout = timeout
+        self.block_receipts = True
+        self._pending = {}
+        self._unchecked = set()
+        self._task = None
+        self._last_block = None
+
+    def watch(self, future, tx_hash):
+        key = bytes(tx_hash).hex()
+        self._pending[key] = future
+        self._unchecked.add(key)
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    def forget(self, future):
+        for key in [k for k, f in self._pending.items() if f is future]:
+            del self._pending[key]
+            self._unchecked.discard(key)
+
+    def _resolve(self, key, receipt):
+        future = self._pending.get(key)
+        if future is not None and not future.done():
+            future.set_result(receipt)
+        if future is not None:
+            self.forget(future)
+
+    async def _run(self):
+        self._last_block = None
+        while self._pending:
+            try:
+                await self._poll()
+            except Exception as e:
+                logger.error("Receipt watcher poll failed: %s", e)
+            await asyncio.sleep(self.poll_interval)
+
+    async def _poll(self):
+        head = await w3.eth.block_number
+        if self._last_block is None:
+            self._last_block = head - 1
+        for number in range(max(self._last_block + 1, head - 19), head + 1):
+            await self._scan_block(number)
+            self._last_block = number
+        for key in list(self._unchecked):
+            self._unchecked.discard(key)
+            if key in self._pending:
+                await self._fetch("0x" + key)
+
+    async def _scan_block(self, number):
+        if self.block_receipts:
+            try:
+                receipts = await w3.eth.get_block_receipts(number)
+            except (AttributeError, ValueError) as e:
+                logger.info(
+                    "eth_getBlockReceipts unavailable (%s), using eth_getBlock", e
+                )
+                self.block_receipts = False
+            else:
+                for receipt in receipts:
+                    self._resolve(bytes(receipt["transactionHash"]).hex(), receipt)
+                return
+        block = await w3.eth.get_block(number)
+        for tx_hash in block["transactions"]:
+            if bytes(tx_hash).hex() in self._pending:
+                await self._fetch(tx_hash)
+
+    async def _fetch(self, tx_hash):
+        try:
+            receipt = await w3.eth.get_transaction_receipt(tx_hash)
+        except TransactionNotFound:
+            return None
+        self._resolve(bytes(receipt["transactionHash"]).hex(), receipt)
+        return receipt
+
+
+nonces = AsyncNonces(my_address)
+receipt_watcher = AsyncReceiptWatcher(RECEIPT_POLL_INTERVAL, RECEIPT_TIMEOUT)
+
+
+async def refresh_fees():
+    percentiles = list(fee_oracle.history_params()[2])
+    try:
+        history = await w3.eth.fee_history(
+            fee_oracle.block_count, "latest", percentiles
+        )
+    except ValueError as e:
+        logger.info("eth_feeHistory unavailable (%s), using latest block", e)
+        block = await w3.eth.get_block("latest")
+        history = {"baseFeePerGas": [block["baseFeePerGas"]], "reward": []}
+    return fee_oracle.refresh(history)
+
+
+async def refresh_fees_forever():
+    while True:
+        await asyncio.sleep(FEE_REFRESH_INTERVAL)
+        try:
+            await refresh_fees()
+        except Exception as e:
+            logger.error("Fee history refresh failed: %s", e)
+
+
+async def current_fees(tier):
+    if fee_oracle.is_cold():
+        await refresh_fees()
+    return fee_oracle.fees(tier)
+
+
+def run_coroutine(fn, timeout=10):
+    # For HealthChecker, whose checks run on its own thread.
+    if loop is None:
+        raise RuntimeError("Event loop not started")
+    return asyncio.run_coroutine_threadsafe(fn(), loop).result(timeout)
+
+
+async def check_database():
+    async with db_pool.acquire() as connection:
+        async with connection.cursor() as cursor:
+            await cursor.execute("SELECT 1")
+            await cursor.fetchall()
+    return True
+
+
+async def fetch_balances():
+    async with db_pool.acquire() as connection:
+        async with connection.cursor() as cursor:
+            await cursor.execute("SELECT accNo, balance FROM token WHERE balance > 0")
+            return await cursor.fetchall()
+
+
+leaderboard = Leaderboard(
+    lambda: run_coroutine(fetch_balances, timeout=60),
+    refresh_interval=float(os.getenv("LEADERBOARD_REFRESH_INTERVAL", 300)),
+)
+
+# /nfts and /spends read the same local event index as server.py. Its
+# writer thread tails the chain with a blocking client of its own; one
+# process per host (either app) writes the file.
+EVENT_INDEX_START_BLOCK = os.getenv("EVENT_INDEX_START_BLOCK")
+index_w3 = Web3(PooledHTTPProvider(ALCHEMY_URL))
+event_indexer = EventIndexer(
+    index_w3,
+    index_w3.eth.contract(address=nft_address, abi=nft_contract.abi),
+    index_w3.eth.contract(address=transfer_address, abi=transfer_contract.abi),
+    os.getenv("EVENT_INDEX_PATH", "events.db"),
+    start_block=int(EVENT_INDEX_START_BLOCK) if EVENT_INDEX_START_BLOCK else None,
+    confirmations=int(os.getenv("EVENT_INDEX_CONFIRMATIONS", 3)),
+    chunk_size=int(os.getenv("EVENT_INDEX_CHUNK", 2000)),
+    max_chunk=int(os.getenv("EVENT_INDEX_MAX_CHUNK", 10000)),
+    poll_interval=float(os.getenv("EVENT_INDEX_POLL_INTERVAL", 12)),
+)
+
+health = HealthChecker(
+    {
+        "web3": lambda: run_coroutine(w3.is_connected),
+        "database": lambda: run_coroutine(check_database),
+    },
+    interval=float(os.getenv("HEALTH_CHECK_INTERVAL", 30)),
+)
+
+
+@app.before_serving
+async def start_background_work():
+    global db_pool, loop
+    loop = asyncio.get_running_loop()
+    db_pool = await aiomysql.create_pool(
+        minsize=0,
+        maxsize=int(os.getenv("DB_POOL_SIZE", 20)),
+        pool_recycle=int(float(os.getenv("DB_POOL_MAX_AGE", 1800))),
+        **DB_CONFIG,
+    )
+    app.add_background_task(refresh_fees_forever)
+
+
+@app.after_serving
+async def stop_background_work():
+    if db_pool is not None:
+        db_pool.close()
+        await db_pool.wait_closed()
+
+
+async def query(sql, params=(), commit=False):
+    # Runs one statement on a pooled connection and returns fetchone().
+    async with db_pool.acquire() as connection:
+        async with connection.cursor() as cursor:
+            with SQL_LATENCY.time(statement=statement_label(sql)):
+                await cursor.execute(sql, params)
+            result = await cursor.fetchone()
+        if commit:
+            await connection.commit()
+        return result
+
+
+@app.before_request
+async def start_request_timer():
+    registry.ensure_writer()
+    health.ensure_started()
+    leaderboard.ensure_started()
+    event_indexer.ensure_started()
+    g.request_start = time.perf_counter()
+
+
+@app.after_request
+async def record_request_latency(response):
+    start = getattr(g, "request_start", None)
+    if start is not None:
+        REQUEST_LATENCY.observe(
+            time.perf_counter() - start,
+            route=request.endpoint or "unmatched",
+            method=request.method,
+            status=response.status_code,
+        )
+    return response
+
+
+@app.route("/health", methods=["GET"])
+async def health_status():
+    status = health.status()
+    return jsonify(status), 200 if status["ready"] else 503
+
+
+@app.route("/metrics", methods=["GET"])
+async def metrics():
+    return Response(registry.render(), mimetype="text/plain; version=0.0.4")
+
+
+@app.route("/")
+async def index():
+    return send_asset("index.html")
+
+
+@app.route("/<path:path>")
+async def serve_static(path):
+    return send_asset(path)
+
+
+def send_asset(path):
+    asset, fingerprinted = static_assets.lookup(path)
+    if asset is None:
+        logger.error("File not found: %s", path)
+        return jsonify({"error": f"File {path} not found"}), 404
+    status, body, headers = static_assets.response_parts(
+        asset,
+        fingerprinted,
+        request.headers.get("Accept-Encoding"),
+        request.headers.get("If-None-Match"),
+    )
+    return Response(body, status=status, mimetype=asset.mimetype, headers=headers)
+
+
+def is_valid_ethereum_address(address):
+    if not isinstance(address, str) or not re.match(r"^0x[a-fA-F0-9]{40}$", address):
+        return False
+    try:
+        Web3.to_checksum_address(address)
+        return True
+    except ValueError:
+        return False
+
+
+async def claim_game(session_id, expires):
+    # ledger.claim_game() on the async pool.
+    global claims_ready, claims_purged_at
+    now = time.time()
+    purge = now - claims_purged_at > CLAIM_PURGE_INTERVAL
+    async with db_pool.acquire() as connection:
+        async with connection.cursor() as cursor:
+            if not claims_ready:
+                await cursor.execute(CLAIM_SCHEMA)
+            if purge:
+                await cursor.execute(
+                    "DELETE FROM game_claim WHERE expires < %s", (now,)
+                )
+            inserted = await cursor.execute(
+                "INSERT IGNORE INTO game_claim (session_id, expires) VALUES (%s, %s)",
+                (session_id, expires),
+            )
+        await connection.commit()
+    claims_ready = True
+    if purge:
+        claims_purged_at = now
+    return inserted == 1
+
+
+async def release_session(session_id):
+    session = game_sessions.get(session_id)
+    if session is None:
+        return
+    try:
+        await query(
+            "DELETE FROM game_claim WHERE session_id = %s", (session.id,), commit=True
+        )
+    except Exception as e:
+        logger.error("Could not release game session %s: %s", session.id, e)
+
+
+async def claim_points(data):
+    session_id = data.get("session_id")
+    if session_id:
+        session = game_sessions.get(session_id)
+        if session is None or not await claim_game(session.id, session.expires):
+            return None, "Unknown, expired or already claimed game session"
+        return session.points(data.get("paths")), None
+    if ALLOW_CLIENT_POINTS:
+        return data.get("points", 0), None
+    return None, "session_id is required"
+
+
+@app.route("/grid", methods=["GET"])
+async def get_grid():
+    try:
+        category = category_index(request.args.get("category"))
+    except ValueError as e:
+        return jsonify({"valid": False, "error": str(e)}), 400
+    puzzle = puzzle_pool.take(category)
+    session_id = game_sessions.create(puzzle)
+    return jsonify(
+        {
+            "valid": True,
+            "session_id": session_id,
+            "category": puzzle["category"],
+            "name": puzzle["name"],
+            "words": puzzle["words"],
+            "grid": puzzle["grid"],
+        }
+    )
+
+
+@app.route("/submitWord", methods=["POST"])
+async def submit_word():
+    data = await request.get_json(silent=True) or {}
+    try:
+        word = game_sessions.submit(data.get("session_id"), data.get("path"))
+    except KeyError:
+        return jsonify({"valid": False, "error": "Unknown or expired session"}), 404
+    return jsonify({"valid": True, "found": word is not None, "word": word})
+
+
+@app.route("/api", methods=["GET"])
+async def api_index():
+    return jsonify(
+        {
+            "message": "Welcome to the WordHuntNFT API",
+            "nft_contract_address": nft_address,
+            "transfer_contract_address": transfer_address,
+        }
+    )
+
+
+@app.route("/verifyAddress", methods=["POST"])
+async def verify_address():
+    data = await request.get_json(silent=True) or {}
+    address = data.get("address", "")
+    if not is_valid_ethereum_address(address):
+        logger.error("Invalid Ethereum address: %s", address)
+        return jsonify({"valid": False, "message": "Invalid Ethereum address"}), 400
+    return jsonify({"valid": True, "message": "Connected"})
+
+
+@app.route("/balance", methods=["POST"])
+async def get_balance():
+    data = await request.get_json(silent=True) or {}
+    address = data.get("address", "")
+    if not address or not is_valid_ethereum_address(address):
+        logger.error("Invalid Ethereum address: %s", address)
+        return jsonify({"valid": False, "error": "Invalid Ethereum address"}), 400
+    balance = balance_cache.get(address)
+    if balance is not None:
+        return jsonify({"valid": True, "balance": balance})
+    try:
+        result = await query("SELECT balance FROM token WHERE accNo = %s", (address,))
+        if result:
+            balance = result[0]
+        else:
+            balance = 0
+            await query(
+                "INSERT IGNORE INTO token (accNo, balance) VALUES (%s, %s)",
+                (address, 0),
+                commit=True,
+            )
+    except Exception as e:
+        logger.error("Error in /balance: %s", e, exc_info=True)
+        return jsonify({"valid": False, "error": str(e)}), 500
+    balance_cache.set(address, balance)
+    return jsonify({"valid": True, "balance": balance})
+
+
+@app.route("/addToBalance", methods=["POST"])
+async def add_balance():
+    data = await request.get_json(silent=True) or {}
+    address = data.get("address", "")
+    if not address or not is_valid_ethereum_address(address):
+        logger.error("Invalid Ethereum address: %s", address)
+        return jsonify({"valid": False, "error": "Invalid Ethereum address"}), 400
+    try:
+        points, error = await claim_points(data)
+    except Exception as e:
+        logger.error("Error in /addToBalance: %s", e, exc_info=True)
+        return jsonify({"valid": False, "error": str(e)}), 500
+    if error:
+        logger.error("Rejected /addToBalance for %s: %s", address, error)
+        return jsonify({"valid": False, "error": error}), 409
+    if not isinstance(points, int) or points < 0:
+        return (
+            jsonify({"valid": False, "error": "Points must be a non-negative integer"}),
+            400,
+        )
+    try:
+        async with db_pool.acquire() as connection:
+            async with connection.cursor() as cursor:
+                await cursor.execute(
+                    "INSERT INTO token (accNo, balance) VALUES (%s, %s)"
+                    " ON DUPLICATE KEY UPDATE balance = balance + VALUES(balance)",
+                    (address, points),
+                )
+                await cursor.execute(
+                    "SELECT balance FROM token WHERE accNo = %s", (address,)
+                )
+                new_balance = (await cursor.fetchone())[0]
+            await connection.commit()
+    except Exception as e:
+        logger.error("Error in /addToBalance: %s", e, exc_info=True)
+        if data.get("session_id"):
+            await release_session(data["session_id"])
+        return jsonify({"valid": False, "error": str(e)}), 500
+    balance_cache.set(address, new_balance)
+    leaderboard.update(address, new_balance)
+    logger.info("Updated balance for %s: %s", address, new_balance)
+    return jsonify({"valid": True, "balance": new_balance})
+
+
+@app.route("/leaderboard", methods=["GET"])
+async def get_leaderboard():
+    try:
+        limit = min(max(int(request.args.get("limit", 10)), 1), 100)
+        offset = max(int(request.args.get("offset", 0)), 0)
+    except ValueError:
+        return (
+            jsonify({"valid": False, "error": "limit and offset must be integers"}),
+            400,
+        )
+    if not leaderboard.ready:
+        return jsonify({"valid": False, "error": "Leaderboard is loading"}), 503
+    return jsonify(
+        {
+            "valid": True,
+            "players": len(leaderboard),
+            "leaderboard": leaderboard.top(limit, offset),
+        }
+    )
+
+
+@app.route("/rank/<address>", methods=["GET"])
+async def get_rank(address):
+    if not is_valid_ethereum_address(address):
+        return jsonify({"valid": False, "error": "Invalid Ethereum address"}), 400
+    if not leaderboard.ready:
+        return jsonify({"valid": False, "error": "Leaderboard is loading"}), 503
+    entry = leaderboard.rank(address)
+    if entry is None:
+        return jsonify({"valid": False, "error": "Address has no ranked balance"}), 404
+    return jsonify({"valid": True, **entry})
+
+
+@app.route("/nfts/<address>", methods=["GET"])
+async def get_nfts(address):
+    if not is_valid_ethereum_address(address):
+        return jsonify({"valid": False, "error": "Invalid Ethereum address"}), 400
+    indexed_block = event_indexer.checkpoint()
+    if indexed_block is None:
+        return jsonify({"valid": False, "error": "Event index is loading"}), 503
+    return jsonify(
+        {
+            "valid": True,
+            "address": address,
+            "indexed_block": indexed_block,
+            "nfts": event_indexer.nfts(address),
+        }
+    )
+
+
+@app.route("/spends/<address>", methods=["GET"])
+async def get_spends(address):
+    if not is_valid_ethereum_address(address):
+        return jsonify({"valid": False, "error": "Invalid Ethereum address"}), 400
+    try:
+        limit = min(max(int(request.args.get("limit", 50)), 1), 500)
+        offset = max(int(request.args.get("offset", 0)), 0)
+    except ValueError:
+        return (
+            jsonify({"valid": False, "error": "limit and offset must be integers"}),
+            400,
+        )
+    indexed_block = event_indexer.checkpoint()
+    if indexed_block is None:
+        return jsonify({"valid": False, "error": "Event index is loading"}), 503
+    return jsonify(
+        {
+            "valid": True,
+            "address": address,
+            "indexed_block": indexed_block,
+            **event_indexer.spends(address, limit, offset),
+        }
+    )
+
+
+def payout_tier(job):
+    return FEE_TIERS.get(job.kind, "standard")
+
+
+async def send_transaction(job, build_tx):
+    fees = await current_fees(payout_tier(job))
+    sent = {}
+
+    async def sign_and_send(nonce):
+        tx = await build_tx(
+            {"from": my_address, "nonce": nonce, "chainId": chain_id, **fees}
+        )
+        signed_tx = w3.eth.account.sign_transaction(tx, private_key=private_key)
+        sent["tx"] = tx
+        try:
+            return await w3.eth.send_raw_transaction(signed_tx.raw_transaction)
+        except Exception as e:
+            if not is_already_known(e):
+                raise
+            return signed_tx.hash
+
+    nonce, tx_hash = await nonces.send(sign_and_send)
+    job.record_tx(tx_hash)
+    logger.info("Transaction sent: %s (nonce %s)", tx_hash.hex(), nonce)
+    return sent["tx"], tx_hash
+
+
+async def wait_for_receipt(job, tx_hash, tx):
+    future = asyncio.get_running_loop().create_future()
+    receipt_watcher.watch(future, tx_hash)
+    deadline = time.monotonic() + RECEIPT_TIMEOUT
+    hashes = [tx_hash]
+    bumps = 0
+    try:
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                receipt = await asyncio.wait_for(
+                    asyncio.shield(future), min(FEE_BUMP_AFTER, remaining)
+                )
+                nonces.confirm(tx["nonce"])
+                return receipt
+            except asyncio.TimeoutError:
+                pass
+            if bumps >= FEE_MAX_BUMPS or time.monotonic() >= deadline:
+                continue
+            bumped = fee_oracle.bump(tx, payout_tier(job))
+            signed_tx = w3.eth.account.sign_transaction(bumped, private_key=private_key)
+            try:
+                replacement = await w3.eth.send_raw_transaction(
+                    signed_tx.raw_transaction
+                )
+            except Exception as e:
+                logger.info("Fee bump for nonce %s not sent: %s", tx["nonce"], e)
+                continue
+            tx = bumped
+            bumps += 1
+            hashes.append(replacement)
+            receipt_watcher.watch(future, replacement)
+            job.record_tx(replacement)
+    finally:
+        receipt_watcher.forget(future)
+    for sent_hash in hashes:
+        try:
+            await w3.eth.get_transaction(sent_hash)
+            break
+        except TransactionNotFound:
+            continue
+    else:
+        logger.info("Transaction with nonce %s was dropped", tx["nonce"])
+        nonces.release(tx["nonce"])
+    raise TimeExhausted(
+        f"Transaction {tx_hash.hex()} not mined after {RECEIPT_TIMEOUT} seconds"
+    )
+
+
+async def estimate_gas(contract_fn):
+    limit, key = gas_cache.lookup(contract_fn)
+    if limit is None:
+        limit = gas_cache.store(
+            key, await contract_fn.estimate_gas({"from": my_address})
+        )
+    return limit, key
+
+
+async def send_ether(job, recipient_address, amount):
+    async def build(params):
+        return {
+            **params,
+            "to": Web3.to_checksum_address(recipient_address),
+            "value": amount,
+            "gas": 21000,
+        }
+
+    tx, tx_hash = await send_transaction(job, build)
+    return await wait_for_receipt(job, tx_hash, tx)
+
+
+async def send_contract_call(job, contract_fn, gas, gas_key):
+    async def build(params):
+        return await contract_fn.build_transaction({**params, "gas": gas})
+
+    tx, tx_hash = await send_transaction(job, build)
+    receipt = await wait_for_receipt(job, tx_hash, tx)
+    gas_cache.check_receipt(gas_key, gas, receipt)
+    return receipt
+
+
+async def revert_reason(contract, fn_name, args, receipt):
+    try:
+        await w3.eth.call(
+            {
+                "from": my_address,
+                "to": contract.address,
+                "data": contract.encodeABI(fn_name=fn_name, args=args),
+            },
+            block_identifier=receipt.blockNumber,
+        )
+    except Exception as e:
+        return str(e)
+    return None
+
+
+async def take_balance(address):
+    # The balance, set to 0 in the same transaction.
+    async with db_pool.acquire() as connection:
+        async with connection.cursor() as cursor:
+            await cursor.execute(
+                "SELECT balance FROM token WHERE accNo = %s FOR UPDATE", (address,)
+            )
+            row = await cursor.fetchone()
+            balance = row[0] if row else 0
+            if balance:
+                await cursor.execute(
+                    "UPDATE token SET balance = %s WHERE accNo = %s", (0, address)
+                )
+        await connection.commit()
+    return balance
+
+
+async def restore_balance(address, points):
+    await query(
+        "INSERT INTO token (accNo, balance) VALUES (%s, %s)"
+        " ON DUPLICATE KEY UPDATE balance = balance + VALUES(balance)",
+        (address, points),
+        commit=True,
+    )
+    balance_cache.invalidate(address)
+    result = await query("SELECT balance FROM token WHERE accNo = %s", (address,))
+    leaderboard.update(address, result[0])
+    logger.info("Restored %s points to %s", points, address)
+
+
+async def process_wallet_transfer(job):
+    # Pays out the balance held on the server, as in server.py.
+    points = await take_balance(job.address)
+    if points <= 0:
+        return False, "No balance to transfer"
+    job.points = points
+    balance_cache.invalidate(job.address)
+    leaderboard.update(job.address, 0)
+    PAYOUT_PATHS.inc(path="ether")
+    try:
+        receipt = await send_ether(job, job.address, points * 10**15)
+    except Exception:
+        if job.tx_hashes:
+            logger.error(
+                "Payout of %s points to %s has no known outcome; balance stays 0",
+                points,
+                job.address,
+            )
+        else:
+            await restore_balance(job.address, points)
+        raise
+    if receipt.status == 0:
+        await restore_balance(job.address, points)
+        return False, "Transaction failed"
+    logger.info("Paid out %s points to %s", points, job.address)
+    return True, "Successfully sent Ether"
+
+
+async def process_transfer(job):
+    recipient_address = Web3.to_checksum_address(job.address)
+    points = job.points
+    if points != 10:
+        PAYOUT_PATHS.inc(path="ether")
+        receipt = await send_ether(job, recipient_address, points * 10**15)
+        if receipt.status == 0:
+            logger.error("Transaction failed")
+            return False, "Transaction failed"
+        return True, "Successfully sent Ether"
+
+    PAYOUT_PATHS.inc(path="award_completion")
+    args = [recipient_address, points, COMPLETION_TOKEN_URI]
+    award_call = transfer_contract.functions.awardCompletion(*args)
+    try:
+        gas, gas_key = await estimate_gas(award_call)
+    except Exception as gas_error:
+        logger.error("Gas estimation failed: %s", gas_error)
+        return False, f"Gas estimation failed: {str(gas_error)}"
+    receipt = await send_contract_call(job, award_call, gas, gas_key)
+    if receipt.status != 0:
+        logger.info("NFT and Ether transferred to %s", recipient_address)
+        return True, "Successfully sent NFT and Ether"
+
+    reason = await revert_reason(transfer_contract, "awardCompletion", args, receipt)
+    if reason is None:
+        logger.error("Transaction failed without specific revert reason")
+        return False, "Transaction failed"
+    logger.error("Transaction failed with revert reason: %s", reason)
+    PAYOUT_PATHS.inc(path="award_fallback")
+    receipt = await send_ether(job, recipient_address, points * 10**15)
+    if receipt.status == 0:
+        logger.error("Ether transfer transaction failed")
+        return False, f"Transaction failed: {reason}"
+
+    args = [recipient_address, COMPLETION_TOKEN_URI]
+    mint_call = nft_contract.functions.mintNFT(*args)
+    try:
+        gas, gas_key = await estimate_gas(mint_call)
+    except Exception as gas_error:
+        logger.error("NFT mint gas estimation failed: %s", gas_error)
+        return False, f"NFT mint failed: {str(gas_error)}"
+    receipt = await send_contract_call(job, mint_call, gas, gas_key)
+    if receipt.status == 0:
+        reason = await revert_reason(nft_contract, "mintNFT", args, receipt)
+        return False, f"NFT mint failed: {reason}"
+    logger.info("NFT and Ether transferred to %s", recipient_address)
+    return True, "Successfully sent NFT and Ether"
+
+
+async def run_handler(job, handler, session_id=None):
+    start = time.perf_counter()
+    ok, message = False, None
+    try:
+        with PAYOUTS_IN_FLIGHT.track(kind=job.kind):
+            ok, message = await handler(job)
+    except Exception as e:
+        logger.error("Payout %s failed: %s", job.id, e, exc_info=True)
+        message = str(e)
+    finally:
+        PAYOUT_OUTCOMES.inc(kind=job.kind, status=MINED if ok else FAILED)
+        PAYOUT_DURATION.observe(time.perf_counter() - start, kind=job.kind)
+        if not ok and session_id:
+            await release_session(session_id)
+    job.finish(ok, message)
+    return ok, message
+
+
+async def run_payout(kind, recipient_address, points, handler, data):
+    job = PayoutJob(kind, recipient_address, points)
+    cutoff = time.time() - PAYOUT_JOB_TTL
+    while payout_jobs and next(iter(payout_jobs.values())).created_at < cutoff:
+        payout_jobs.popitem(last=False)
+    payout_jobs[job.id] = job
+    session_id = data.get("session_id")
+    if data.get("async", False):
+        task = asyncio.get_running_loop().create_task(
+            run_handler(job, handler, session_id)
+        )
+        payout_tasks.add(task)
+        task.add_done_callback(payout_tasks.discard)
+        return (
+            jsonify(
+                {
+                    "valid": True,
+                    "message": "Payout queued",
+                    "job_id": job.id,
+                    "status": job.status,
+                }
+            ),
+            202,
+        )
+    ok, message = await run_handler(job, handler, session_id)
+    if not ok:
+        return jsonify({"valid": False, "message": message}), 500
+    return jsonify({"valid": True, "message": message})
+
+
+@app.route("/payout/<job_id>", methods=["GET"])
+async def payout_status(job_id):
+    job = payout_jobs.get(job_id)
+    if not job:
+        return jsonify({"valid": False, "message": "Unknown payout job"}), 404
+    return jsonify({"valid": job.status != FAILED, **job.to_dict()})
+
+
+@app.route("/walletTransfer", methods=["POST"])
+async def wallet_transfer():
+    # Any "points" in the request is ignored, as in server.py.
+    data = await request.get_json(silent=True) or {}
+    recipient_address = data.get("address", "")
+    if not is_valid_ethereum_address(recipient_address):
+        return jsonify({"valid": False, "message": "Invalid Ethereum address"}), 400
+    balance = balance_cache.get(recipient_address)
+    if balance is None:
+        try:
+            result = await query(
+                "SELECT balance FROM token WHERE accNo = %s", (recipient_address,)
+            )
+        except Exception as e:
+            logger.error("Error in /walletTransfer: %s", e, exc_info=True)
+            return jsonify({"valid": False, "message": str(e)}), 500
+        balance = result[0] if result else 0
+    if balance <= 0:
+        return jsonify({"valid": False, "message": "No balance to transfer"}), 400
+    return await run_payout(
+        "walletTransfer",
+        recipient_address,
+        balance,
+        process_wallet_transfer,
+        {"async": data.get("async", False)},
+    )
+
+
+@app.route("/transfer", methods=["POST"])
+async def transfer():
+    data = await request.get_json(silent=True) or {}
+    recipient_address = data.get("address", "")
+    if not is_valid_ethereum_address(recipient_address):
+        return jsonify({"valid": False, "message": "Invalid Ethereum address"}), 400
+    try:
+        points, error = await claim_points(data)
+    except Exception as e:
+        logger.error("Error in /transfer: %s", e, exc_info=True)
+        return jsonify({"valid": False, "message": str(e)}), 500
+    if error:
+        logger.error("Rejected /transfer for %s: %s", recipient_address, error)
+        return jsonify({"valid": False, "message": error}), 409
+    if not isinstance(points, int) or points <= 0:
+        if data.get("session_id"):
+            await release_session(data["session_id"])
+        return (
+            jsonify({"valid": False, "message": "Points must be a positive integer"}),
+            400,
+        )
+    return await run_payout(
+        "transfer", recipient_address, points, process_transfer, data
+    )
+
+
+if __name__ == "__main__":
+    app.run(host="0.0.0.0", port=int(os.getenv("PORT", 4000)))
@@ -0,0 +1,268 @@
+import os
+import time
+import threading
+import logging
+
+from eth_account import Account
+from hexbytes import HexBytes
+
+from nonce_manager import NonceManager
+from rpc_provider import batch, to_int
+
+logger = logging.getLogger(__name__)
+
+FUNDS_ERRORS = ("insufficient funds", "insufficient balance")
+
+
+def is_funds_error(error):
+    message = str(error).lower()
+    return any(fragment in message for fragment in FUNDS_ERRORS)
+
+
+class NoSignerAvailable(RuntimeError):
+    pass
+
+
+class Signer:
+    __slots__ = (
+        "address",
+        "private_key",
+        "nonces",
+        "in_flight",
+        "active",
+        "authorised",
+        "balance",
+        "last_used",
+        "sent",
+    )
+
+    def __init__(self, w3, private_key):
+        self.private_key = private_key
+        self.address = Account.from_key(private_key).address
+        self.nonces = NonceManager(w3, self.address)
+        self.in_flight = 0
+        self.active = True
+        self.authorised = True
+        self.balance = None
+        self.last_used = 0.0
+        self.sent = 0
+
+
+class SignerPool:
+    # Hot-wallet accounts that may all send payouts (the transfer contract's
+    # owner and its operators). Each payout transaction goes to the active
+    # signer with the fewest transactions in flight, so one stuck nonce only
+    # holds up its own signer. Each signer has its own NonceManager. A
+    # background thread reads every balance in one JSON-RPC batch and takes
+    # signers below min_balance out of rotation until they are topped up.
+    # With a contract set, each process first drops the signers that
+    # contract would refuse (check_authorised) before handing any out. Only
+    # a definite answer drops a signer; one the node couldn't answer for
+    # stays in rotation and is checked again, backing off up to
+    # check_interval, until every signer has an answer.
+
+    def __init__(
+        self, w3, private_keys, min_balance=0, check_interval=60.0, contract=None
+    ):
+        if not private_keys:
+            raise ValueError("SignerPool needs at least one private key")
+        self.w3 = w3
+        self.min_balance = min_balance
+        self.check_interval = check_interval
+        self.contract = contract
+        self.signers = [Signer(w3, key) for key in private_keys]
+        self._by_address = {signer.address: signer for signer in self.signers}
+        if len(self._by_address) != len(self.signers):
+            raise ValueError("Duplicate signer keys")
+        self._lock = threading.Lock()
+        self._start_lock = threading.Lock()
+        self._pid = None
+
+    def _ensure_worker(self):
+        if self._pid == os.getpid():
+            return
+        with self._start_lock:
+            if self._pid == os.getpid():
+                return
+            if self.contract is not None and not self._try_check_authorised():
+                threading.Thread(
+                    target=self._recheck_authorised, name="signer-auth", daemon=True
+                ).start()
+            threading.Thread(target=self._run, name="signer-pool", daemon=True).start()
+            self._pid = os.getpid()
+
+    def _try_check_authorised(self):
+        try:
+            return self.check_authorised(self.contract)
+        except Exception as e:
+            logger.error("Signer authorisation check failed: %s", e)
+            return False
+
+    def _recheck_authorised(self):
+        delay = 1.0
+        while True:
+            time.sleep(delay)
+            if self._try_check_authorised():
+                logger.info("Signer authorisation check completed")
+                return
+            delay = min(delay * 2, self.check_interval)
+
+    def _run(self):
+        while True:
+            try:
+                self.check_balances()
+            except Exception as e:
+                logger.error("Signer balance check failed: %s", e)
+            time.sleep(self.check_interval)
+
+    def check_balances(self):
+        results = batch(
+            self.w3,
+            [("eth_getBalance", [signer.address, "latest"]) for signer in self.signers],
+        )
+        for signer, result in zip(self.signers, results):
+            if isinstance(result, Exception):
+                logger.info("Balance of signer %s unknown: %s", signer.address, result)
+                continue
+            self._set_balance(signer, to_int(result))
+
+    def _set_balance(self, signer, balance):
+        with self._lock:
+            signer.balance = balance
+            active = balance >= self.min_balance
+            if active == signer.active:
+                return
+            signer.active = active
+        if active:
+            logger.info(
+                "Signer %s topped up (%s wei), back in rotation",
+                signer.address,
+                balance,
+            )
+        else:
+            logger.error(
+                "Signer %s balance %s wei is below %s, taken out of rotation",
+                signer.address,
+                balance,
+                self.min_balance,
+            )
+
+    def check_authorised(self, contract):
+        # Reads owner() and, when the contract has them, operators(address)
+        # for every signer in one batch. Signers that are neither are taken
+        # out of rotation: their payouts would revert. Returns False when
+        # the node didn't answer for every signer; those are left as they
+        # are.
+        def call(fn_name, args=()):
+            data = contract.encodeABI(fn_name=fn_name, args=list(args))
+            return ("eth_call", [{"to": contract.address, "data": data}, "latest"])
+
+        has_operators = any(
+            item.get("type") == "function" and item.get("name") == "operators"
+            for item in contract.abi
+        )
+        calls = [call("owner")]
+        if has_operators:
+            calls += [call("operators", [signer.address]) for signer in self.signers]
+        results = batch(self.w3, calls)
+        try:
+            if isinstance(results[0], Exception):
+                raise results[0]
+            owner = self.w3.codec.decode(["address"], HexBytes(results[0]))[0]
+        except Exception as e:
+            logger.error(
+                "Could not read the owner of %s, signers not checked: %s",
+                contract.address,
+                e,
+            )
+            return False
+        complete = True
+        for i, signer in enumerate(self.signers):
+            authorised = signer.address.lower() == owner.lower()
+            if not authorised and has_operators:
+                try:
+                    if isinstance(results[i + 1], Exception):
+                        raise results[i + 1]
+                    authorised = self.w3.codec.decode(
+                        ["bool"], HexBytes(results[i + 1])
+                    )[0]
+                except Exception as e:
+                    logger.error(
+                        "Operator check for signer %s failed: %s", signer.address, e
+                    )
+                    complete = False
+                    continue
+            with self._lock:
+                was_authorised, signer.authorised = signer.authorised, authorised
+            if authorised:
+                if not was_authorised:
+                    logger.info(
+                        "Signer %s is authorised on %s again",
+                        signer.address,
+                        contract.address,
+                    )
+                continue
+            logger.error(
+                "Signer %s is neither the owner of %s nor an operator,"
+                " excluded from payouts",
+                signer.address,
+                contract.address,
+            )
+        if not any(signer.authorised for signer in self.signers):
+            logger.error("No signer is authorised to pay out from %s", contract.address)
+        return complete
+
+    def deactivate(self, signer, reason):
+        # A send failed for lack of funds; the next balance check puts the
+        # signer back once it has been topped up.
+        with self._lock:
+            was_active, signer.active = signer.active, False
+        if was_active:
+            logger.error("Signer %s taken out of rotation: %s", signer.address, reason)
+
+    def acquire(self, exclude=()):
+        self._ensure_worker()
+        with self._lock:
+            candidates = [
+                signer
+                for signer in self.signers
+                if signer.active and signer.authorised and signer.address not in exclude
+            ]
+            if not candidates:
+                raise NoSignerAvailable(
+                    "No funded, authorised signer available for payouts"
+                )
+            signer = min(candidates, key=lambda s: (s.in_flight, s.last_used))
+            signer.in_flight += 1
+            signer.sent += 1
+            signer.last_used = time.monotonic()
+            return signer
+
+    def release(self, signer):
+        with self._lock:
+            signer.in_flight = max(signer.in_flight - 1, 0)
+
+    def get(self, address):
+        return self._by_address.get(address)
+
+    def snapshot(self):
+        with self._lock:
+            signers = [
+                {
+                    "address": signer.address,
+                    "active": signer.active,
+                    "authorised": signer.authorised,
+                    "in_flight": signer.in_flight,
+                    "sent": signer.sent,
+                    "balance": signer.balance,
+                    "nonce": signer.nonces.snapshot(),
+                }
+                for signer in self.signers
+            ]
+        return {
+            "min_balance": self.min_balance,
+            "active": sum(
+                1 for signer in signers if signer["active"] and signer["authorised"]
+            ),
+            "signers": signers,
+        }
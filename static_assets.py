@@ -0,0 +1,189 @@
+import os
+import re
+import gzip
+import hashlib
+import mimetypes
+import logging
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+ASSET_EXTENSIONS = {
+    ".html",
+    ".js",
+    ".css",
+    ".png",
+    ".jpg",
+    ".jpeg",
+    ".gif",
+    ".svg",
+    ".ico",
+    ".webp",
+}
+COMPRESSIBLE_EXTENSIONS = {".html", ".js", ".css", ".svg"}
+SKIP_DIRS = {"node_modules", "__pycache__", "bench"}
+# Build scripts that live next to the front end but are not part of it.
+SKIP_FILES = {"compile.js"}
+IMMUTABLE = "public, max-age=31536000, immutable"
+REVALIDATE = "no-cache"
+_REF_PATTERN = re.compile(r"""(src|href)=(["'])([^"']+)\2""")
+
+
+class Asset:
+    __slots__ = ("path", "url", "mimetype", "etag", "size", "variants")
+
+    def __init__(self, path, body, mimetype):
+        self.path = path
+        self.mimetype = mimetype
+        digest = hashlib.sha256(body).hexdigest()[:16]
+        self.etag = digest
+        self.size = len(body)
+        stem, ext = os.path.splitext(path)
+        self.url = f"{stem}.{digest[:10]}{ext}"
+        # encoding -> body; only kept when smaller than the original.
+        self.variants = {"identity": body}
+        if ext.lower() in COMPRESSIBLE_EXTENSIONS:
+            compressed = gzip.compress(body, compresslevel=9, mtime=0)
+            if len(compressed) < len(body):
+                self.variants["gzip"] = compressed
+            if brotli is not None:
+                compressed = brotli.compress(body, quality=11)
+                if len(compressed) < len(body):
+                    self.variants["br"] = compressed
+
+    def etag_for(self, encoding):
+        if encoding == "identity":
+            return f'"{self.etag}"'
+        return f'"{self.etag}-{encoding}"'
+
+    def matches(self, if_none_match):
+        if not if_none_match:
+            return False
+        if if_none_match.strip() == "*":
+            return True
+        tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+        return any(self.etag_for(encoding) in tags for encoding in self.variants)
+
+
+def accepted_encodings(header):
+    accepted = {}
+    for part in (header or "").split(","):
+        name, _, params = part.strip().partition(";")
+        if not name:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        accepted[name.strip().lower()] = q
+    return accepted
+
+
+class StaticAssets:
+    # Reads every servable file under `root` once, precomputes compressed
+    # variants and content-hash ETags, and answers requests from memory.
+    # Each asset is also reachable under a fingerprinted name
+    # (script.<hash>.js) that can be cached forever; index.html is rewritten
+    # to point at those names.
+
+    def __init__(self, root):
+        self.root = os.path.abspath(root)
+        self.assets = {}
+        self.by_url = {}
+        self.build()
+
+    def _walk(self):
+        for dirpath, dirnames, filenames in os.walk(self.root):
+            dirnames[:] = sorted(
+                d for d in dirnames if d not in SKIP_DIRS and not d.startswith(".")
+            )
+            for filename in sorted(filenames):
+                if filename in SKIP_FILES:
+                    continue
+                if os.path.splitext(filename)[1].lower() not in ASSET_EXTENSIONS:
+                    continue
+                full_path = os.path.join(dirpath, filename)
+                yield os.path.relpath(full_path, self.root).replace(os.sep, "/")
+
+    def _load(self, path, rewrite=None):
+        with open(os.path.join(self.root, path), "rb") as file:
+            body = file.read()
+        if rewrite:
+            body = rewrite(body)
+        mimetype = mimetypes.guess_type(path)[0] or "application/octet-stream"
+        return Asset(path, body, mimetype)
+
+    def _rewrite_refs(self, body):
+        def replace(match):
+            asset = self.assets.get(match.group(3))
+            if asset is None:
+                return match.group(0)
+            return f"{match.group(1)}={match.group(2)}{asset.url}{match.group(2)}"
+
+        return _REF_PATTERN.sub(replace, body.decode()).encode()
+
+    def build(self):
+        assets = {}
+        pages = []
+        for path in self._walk():
+            if path.endswith(".html"):
+                pages.append(path)
+                continue
+            assets[path] = self._load(path)
+        self.assets = assets
+        # Pages are loaded last so their references can be rewritten to the
+        # fingerprinted names of everything else.
+        for path in pages:
+            assets[path] = self._load(path, self._rewrite_refs)
+        self.by_url = {asset.url: asset for asset in assets.values()}
+        logger.info(
+            "Indexed %s static assets (brotli %s)",
+            len(assets),
+            "enabled" if brotli is not None else "unavailable",
+        )
+
+    def lookup(self, path):
+        # Returns (asset, fingerprinted)
+        asset = self.by_url.get(path)
+        if asset is not None:
+            return asset, True
+        return self.assets.get(path), False
+
+    def response_parts(self, asset, fingerprinted, accept_encoding, if_none_match):
+        # Returns (status, body, headers)
+        accepted = accepted_encodings(accept_encoding)
+        encoding = "identity"
+        for candidate in ("br", "gzip"):
+            if candidate in asset.variants and accepted.get(candidate, 0) > 0:
+                encoding = candidate
+                break
+        headers = {
+            "ETag": asset.etag_for(encoding),
+            "Cache-Control": IMMUTABLE if fingerprinted else REVALIDATE,
+            "Vary": "Accept-Encoding",
+        }
+        if asset.matches(if_none_match):
+            return 304, b"", headers
+        if encoding != "identity":
+            headers["Content-Encoding"] = encoding
+        return 200, asset.variants[encoding], headers
+
+    def listing(self):
+        return {
+            path: {
+                "url": asset.url,
+                "etag": asset.etag,
+                "size": asset.size,
+                "encodings": {
+                    encoding: len(body) for encoding, body in asset.variants.items()
+                },
+            }
+            for path, asset in sorted(self.assets.items())
+        }